@@ -7,7 +7,8 @@ from datetime import timedelta
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from src.auth import auth_api
-from src.repositories.database import db
+from src.repositories.database import db, REPLICA_BIND
+from src.repositories.migrations import run_migrations
 from src.upload import upload_api
 from src.submission import submission_api
 from src.projects import projects_api
@@ -47,6 +48,10 @@ def create_app():
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1)
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["SQLALCHEMY_DATABASE_URI"] = f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
+    # Optional read replica for analytics/export reads (see read_replica); without it those
+    # reads stay on the primary.
+    if os.getenv('DB_REPLICA_URI'):
+        app.config["SQLALCHEMY_BINDS"] = {REPLICA_BIND: os.getenv('DB_REPLICA_URI')}
     
     # Blueprint registration
     app.register_blueprint(auth_api, url_prefix='/api/auth')
@@ -61,6 +66,13 @@ def create_app():
     jwt.init_app(app)
     db.init_app(app)
 
+    # Bring the schema up to date before serving; a database that is not reachable yet
+    # must not keep the app from booting, the next start retries.
+    try:
+        run_migrations(app)
+    except Exception as e:
+        print(f"[migrations] skipped: {e}", flush=True)
+
     return app
 
 if __name__ == "__main__":
@@ -0,0 +1,473 @@
+"""
+Scaling / accuracy benchmark for src/plagiarism_detector.py.
+
+Builds synthetic Python and Java classes from seed programs, where a known subset of
+submissions are copies of another student's work with controlled obfuscations:
+  rename   - identifiers renamed consistently
+  reorder  - functions/methods in a different order
+  deadcode - unused functions and statements added
+  comments - comments removed, added and reworded
+
+Each class size runs in a fresh process so peak RSS is per run. Reported per run:
+wall time, peak RSS, candidate counts per stage, and precision/recall for the token
+channel, the AST channel, every reported pair, and pairs the admin UI flags.
+
+Usage (from backend/):
+  python -m benchmarks.plagiarism_benchmark                       # n = 100, 500, 1000, 5000
+  python -m benchmarks.plagiarism_benchmark --sizes 100,500 --languages python
+  python -m benchmarks.plagiarism_benchmark --compare benchmarks/results/<older>.json
+
+Results are written to benchmarks/results/plagiarism-<timestamp>-<git rev>.json (git-ignored),
+or to the file given with --out.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+DEFAULT_SIZES = (100, 500, 1000, 5000)
+OBFUSCATIONS = ("rename", "reorder", "deadcode", "comments")
+
+# Share of originals that get copied, and how many copies each of those gets.
+COPIED_SHARE = 0.15
+MAX_COPIES = 3
+
+# Same score the admin UI filters on: mean of token and AST similarity.
+FLAG_THRESHOLD = 0.75
+
+
+# ---------------------------------------------------------------------------
+# Seed programs
+#
+# Each snippet is one function/method. `$F` is its name, `$1`..`$4` its local names,
+# `$N` a small integer constant; every original picks its own names and constants,
+# so two independent students who solved the same sub-problem still differ.
+# `call` is how the program's main invokes it.
+# ---------------------------------------------------------------------------
+
+PY_SNIPPETS: List[Dict[str, str]] = [
+    {"code": "def $F($1):\n    $2, $3 = 0, 1\n    for _ in range($1):\n        $2, $3 = $3, $2 + $3\n    return $2\n",
+     "call": "print($F($N))"},
+    {"code": "def $F($1):\n    if $1 < 2:\n        return False\n    $2 = 2\n    while $2 * $2 <= $1:\n        if $1 % $2 == 0:\n            return False\n        $2 += 1\n    return True\n",
+     "call": "print([$x for $x in range($N * 3) if $F($x)])"},
+    {"code": "def $F($1):\n    $2 = {}\n    for $3 in $1.split():\n        $2[$3] = $2.get($3, 0) + 1\n    return sorted($2.items(), key=lambda $4: -$4[1])\n",
+     "call": "print($F(\"a b a c b a\"))"},
+    {"code": "def $F($1, $2):\n    $3, $4 = 0, len($1) - 1\n    while $3 <= $4:\n        $x = ($3 + $4) // 2\n        if $1[$x] == $2:\n            return $x\n        if $1[$x] < $2:\n            $3 = $x + 1\n        else:\n            $4 = $x - 1\n    return -1\n",
+     "call": "print($F(list(range($N * 2)), $N))"},
+    {"code": "def $F($1):\n    $2 = list($1)\n    for $3 in range(len($2)):\n        for $4 in range(len($2) - 1 - $3):\n            if $2[$4] > $2[$4 + 1]:\n                $2[$4], $2[$4 + 1] = $2[$4 + 1], $2[$4]\n    return $2\n",
+     "call": "print($F([$N, 3, 9, 1, 7]))"},
+    {"code": "def $F($1):\n    $2 = []\n    $3 = {')': '(', ']': '[', '}': '{'}\n    for $4 in $1:\n        if $4 in '([{':\n            $2.append($4)\n        elif $4 in $3:\n            if not $2 or $2.pop() != $3[$4]:\n                return False\n    return not $2\n",
+     "call": "print($F(\"([]{})\"))"},
+    {"code": "def $F($1):\n    $2 = 0\n    while $1 > 0:\n        $2 += $1 % 10\n        $1 //= 10\n    return $2\n",
+     "call": "print($F($N * 12345))"},
+    {"code": "def $F($1, $2):\n    while $2:\n        $1, $2 = $2, $1 % $2\n    return $1\n",
+     "call": "print($F($N * 6, 84))"},
+    {"code": "def $F($1):\n    $2 = [[0] * $1 for _ in range($1)]\n    for $3 in range($1):\n        for $4 in range($1):\n            $2[$3][$4] = ($3 + 1) * ($4 + 1)\n    return $2\n",
+     "call": "print($F($N % 5 + 2))"},
+    {"code": "def $F($1):\n    $2 = ''\n    for $3 in $1:\n        if $3.isalpha():\n            $4 = ord('a') if $3.islower() else ord('A')\n            $2 += chr(($4 + (ord($3) - $4 + $N) % 26))\n        else:\n            $2 += $3\n    return $2\n",
+     "call": "print($F(\"Hello World\"))"},
+    {"code": "def $F($1):\n    $2 = sum($1) / len($1)\n    $3 = sum(($4 - $2) ** 2 for $4 in $1) / len($1)\n    return $2, $3 ** 0.5\n",
+     "call": "print($F([$N, 4, 8, 15, 16, 23, 42]))"},
+    {"code": "class $F:\n    def __init__(self):\n        self.$1 = []\n\n    def push(self, $2):\n        self.$1.append($2)\n\n    def pop(self):\n        return self.$1.pop() if self.$1 else None\n\n    def size(self):\n        return len(self.$1)\n",
+     "call": "$x = $F()\n$x.push($N)\nprint($x.pop(), $x.size())"},
+]
+
+JAVA_SNIPPETS: List[Dict[str, str]] = [
+    {"code": "static long $F(int $1) {\n    long $2 = 0, $3 = 1;\n    for (int i = 0; i < $1; i++) {\n        long t = $2 + $3;\n        $2 = $3;\n        $3 = t;\n    }\n    return $2;\n}\n",
+     "call": "System.out.println($F($N));"},
+    {"code": "static boolean $F(int $1) {\n    if ($1 < 2) return false;\n    for (int $2 = 2; $2 * $2 <= $1; $2++) {\n        if ($1 % $2 == 0) return false;\n    }\n    return true;\n}\n",
+     "call": "System.out.println($F($N * 7 + 1));"},
+    {"code": "static java.util.Map<String, Integer> $F(String $1) {\n    java.util.Map<String, Integer> $2 = new java.util.HashMap<>();\n    for (String $3 : $1.split(\" \")) {\n        $2.put($3, $2.getOrDefault($3, 0) + 1);\n    }\n    return $2;\n}\n",
+     "call": "System.out.println($F(\"a b a c b a\"));"},
+    {"code": "static int $F(int[] $1, int $2) {\n    int $3 = 0, $4 = $1.length - 1;\n    while ($3 <= $4) {\n        int mid = ($3 + $4) / 2;\n        if ($1[mid] == $2) return mid;\n        if ($1[mid] < $2) $3 = mid + 1;\n        else $4 = mid - 1;\n    }\n    return -1;\n}\n",
+     "call": "System.out.println($F(new int[]{1, 3, 5, 7, 9, 11}, $N));"},
+    {"code": "static void $F(int[] $1) {\n    for (int $2 = 0; $2 < $1.length; $2++) {\n        for (int $3 = 0; $3 < $1.length - 1 - $2; $3++) {\n            if ($1[$3] > $1[$3 + 1]) {\n                int $4 = $1[$3];\n                $1[$3] = $1[$3 + 1];\n                $1[$3 + 1] = $4;\n            }\n        }\n    }\n}\n",
+     "call": "int[] $x = {$N, 3, 9, 1, 7};\n$F($x);\nSystem.out.println(java.util.Arrays.toString($x));"},
+    {"code": "static boolean $F(String $1) {\n    java.util.Deque<Character> $2 = new java.util.ArrayDeque<>();\n    for (char $3 : $1.toCharArray()) {\n        if ($3 == '(' || $3 == '[') {\n            $2.push($3);\n        } else if ($3 == ')' || $3 == ']') {\n            if ($2.isEmpty()) return false;\n            char $4 = $2.pop();\n            if (($3 == ')' && $4 != '(') || ($3 == ']' && $4 != '[')) return false;\n        }\n    }\n    return $2.isEmpty();\n}\n",
+     "call": "System.out.println($F(\"([])\"));"},
+    {"code": "static int $F(int $1) {\n    int $2 = 0;\n    while ($1 > 0) {\n        $2 += $1 % 10;\n        $1 /= 10;\n    }\n    return $2;\n}\n",
+     "call": "System.out.println($F($N * 12345));"},
+    {"code": "static int $F(int $1, int $2) {\n    while ($2 != 0) {\n        int $3 = $1 % $2;\n        $1 = $2;\n        $2 = $3;\n    }\n    return $1;\n}\n",
+     "call": "System.out.println($F($N * 6, 84));"},
+    {"code": "static int[][] $F(int $1) {\n    int[][] $2 = new int[$1][$1];\n    for (int $3 = 0; $3 < $1; $3++) {\n        for (int $4 = 0; $4 < $1; $4++) {\n            $2[$3][$4] = ($3 + 1) * ($4 + 1);\n        }\n    }\n    return $2;\n}\n",
+     "call": "System.out.println($F($N % 5 + 2).length);"},
+    {"code": "static String $F(String $1) {\n    StringBuilder $2 = new StringBuilder();\n    for (char $3 : $1.toCharArray()) {\n        if (Character.isLetter($3)) {\n            char $4 = Character.isLowerCase($3) ? 'a' : 'A';\n            $2.append((char) ($4 + ($3 - $4 + $N) % 26));\n        } else {\n            $2.append($3);\n        }\n    }\n    return $2.toString();\n}\n",
+     "call": "System.out.println($F(\"Hello World\"));"},
+    {"code": "static double $F(int[] $1) {\n    double $2 = 0;\n    for (int $3 : $1) $2 += $3;\n    $2 /= $1.length;\n    double $4 = 0;\n    for (int $3 : $1) $4 += ($3 - $2) * ($3 - $2);\n    return Math.sqrt($4 / $1.length);\n}\n",
+     "call": "System.out.println($F(new int[]{$N, 4, 8, 15, 16, 23, 42}));"},
+    {"code": "static String $F(String $1) {\n    StringBuilder $2 = new StringBuilder();\n    int $3 = 1;\n    for (int $4 = 1; $4 <= $1.length(); $4++) {\n        if ($4 < $1.length() && $1.charAt($4) == $1.charAt($4 - 1)) {\n            $3++;\n        } else {\n            $2.append($1.charAt($4 - 1)).append($3);\n            $3 = 1;\n        }\n    }\n    return $2.toString();\n}\n",
+     "call": "System.out.println($F(\"aaabccdddd\"));"},
+]
+
+NAME_WORDS = (
+    "value", "count", "total", "index", "item", "result", "data", "temp", "acc", "num",
+    "left", "right", "cur", "prev", "nxt", "buf", "key", "word", "text", "size",
+    "stack", "queue", "arr", "lst", "grid", "row", "col", "pos", "val", "res",
+)
+FN_WORDS = ("compute", "calc", "get", "find", "make", "build", "check", "solve", "do", "run", "process", "handle")
+FN_NOUNS = ("fib", "prime", "freq", "search", "sort", "balance", "digits", "gcd", "table", "shift", "stats", "stack", "encode")
+COMMENT_WORDS = ("helper", "loop over input", "compute result", "edge case", "main logic", "TODO cleanup",
+                 "return answer", "iterate", "update state", "check bounds")
+
+PLACEHOLDERS = ("$F", "$1", "$2", "$3", "$4", "$x")
+
+
+# ---------------------------------------------------------------------------
+# Corpus generation
+# ---------------------------------------------------------------------------
+
+
+def _fresh_names(rng: random.Random, language: str) -> Dict[str, str]:
+    verb, noun = rng.choice(FN_WORDS), rng.choice(FN_NOUNS)
+    fn = f"{verb}_{noun}" if language == "python" else f"{verb}{noun.capitalize()}"
+    names = {"$F": f"{fn}{rng.randint(0, 99)}"}
+    for ph in PLACEHOLDERS[1:]:
+        name = names["$F"]
+        while name in names.values():
+            name = f"{rng.choice(NAME_WORDS)}{rng.randint(0, 99)}"
+        names[ph] = name
+    return names
+
+
+def _new_program(rng: random.Random, language: str) -> Dict[str, Any]:
+    """
+    An independent student's program: a few seed snippets with its own names/constants.
+    """
+    pool = PY_SNIPPETS if language == "python" else JAVA_SNIPPETS
+    picks = rng.sample(range(len(pool)), rng.randint(3, 5))
+    parts = []
+    for idx in picks:
+        names = _fresh_names(rng, language)
+        if language == "python" and pool[idx]["code"].startswith("class "):
+            names["$F"] = names["$F"].title().replace("_", "")
+        parts.append({"snippet": idx, "names": names, "const": rng.randint(2, 40)})
+    comments = [rng.choice(COMMENT_WORDS) for _ in range(rng.randint(1, 4))]
+    return {"language": language, "parts": parts, "comments": comments, "dead": []}
+
+
+def _obfuscate(rng: random.Random, program: Dict[str, Any], kinds: List[str]) -> Dict[str, Any]:
+    copy = json.loads(json.dumps(program))
+    if "rename" in kinds:
+        for part in copy["parts"]:
+            fresh = _fresh_names(rng, copy["language"])
+            for ph in PLACEHOLDERS:
+                if rng.random() < 0.8:
+                    part["names"][ph] = fresh[ph]
+            if copy["language"] == "python" and (PY_SNIPPETS[part["snippet"]]["code"].startswith("class ")):
+                part["names"]["$F"] = part["names"]["$F"].title().replace("_", "")
+    if "reorder" in kinds and len(copy["parts"]) > 1:
+        original_order = list(copy["parts"])
+        while copy["parts"] == original_order:
+            rng.shuffle(copy["parts"])
+    if "deadcode" in kinds:
+        copy["dead"] = [rng.randint(1, 99) for _ in range(rng.randint(1, 3))]
+    if "comments" in kinds:
+        copy["comments"] = [rng.choice(COMMENT_WORDS) + " " + rng.choice(COMMENT_WORDS) for _ in range(rng.randint(0, 6))]
+    return copy
+
+
+def _fill(template: str, names: Dict[str, str], const: int) -> str:
+    out = template.replace("$N", str(const))
+    for ph in PLACEHOLDERS:
+        out = out.replace(ph, names[ph])
+    return out
+
+
+def _with_comments(rng: random.Random, lines: List[str], comments: List[str], marker: str) -> List[str]:
+    out = list(lines)
+    for text in comments:
+        pos = rng.randint(0, len(out))
+        indent = ""
+        if pos < len(out):
+            stripped = out[pos].lstrip()
+            indent = out[pos][: len(out[pos]) - len(stripped)]
+        out.insert(pos, f"{indent}{marker} {text}")
+    return out
+
+
+def render(program: Dict[str, Any], seed: int) -> str:
+    rng = random.Random(seed)
+    language = program["language"]
+    if language == "python":
+        blocks = [_fill(PY_SNIPPETS[p["snippet"]]["code"], p["names"], p["const"]) for p in program["parts"]]
+        blocks += [f"def unused_helper{d}(v):\n    w = v * {d}\n    return w - {d}\n" for d in program["dead"]]
+        main = ["def main():"]
+        for p in program["parts"]:
+            call = _fill(PY_SNIPPETS[p["snippet"]]["call"], p["names"], p["const"])
+            main += ["    " + ln for ln in call.split("\n")]
+        main += [f"    spare{d} = {d}" for d in program["dead"]]
+        body = "\n".join(blocks) + "\n" + "\n".join(main) + "\n\n\nmain()\n"
+        return "\n".join(_with_comments(rng, body.split("\n"), program["comments"], "#")) + "\n"
+
+    blocks = [_fill(JAVA_SNIPPETS[p["snippet"]]["code"], p["names"], p["const"]) for p in program["parts"]]
+    blocks += [f"static int unusedHelper{d}(int v) {{\n    int w = v * {d};\n    return w - {d};\n}}\n" for d in program["dead"]]
+    main = ["public static void main(String[] args) {"]
+    for p in program["parts"]:
+        call = _fill(JAVA_SNIPPETS[p["snippet"]]["call"], p["names"], p["const"])
+        main += ["    " + ln for ln in call.split("\n")]
+    main += [f"    int spare{d} = {d};" for d in program["dead"]]
+    main += ["}"]
+    inner = "\n".join(blocks) + "\n" + "\n".join(main)
+    body = "public class Main {\n" + "\n".join("    " + ln if ln else ln for ln in inner.split("\n")) + "\n}\n"
+    return "\n".join(_with_comments(rng, body.split("\n"), program["comments"], "//")) + "\n"
+
+
+def generate_corpus(root: str, language: str, n: int, seed: int) -> Tuple[List[Dict[str, Any]], Dict[int, Tuple[int, List[str]]]]:
+    """
+    Writes n submissions under root (one directory per student, like real uploads).
+
+    Returns (detector file entries, truth) where truth[user_id] = (cluster id, obfuscations
+    applied to that copy; [] for originals).
+    """
+    rng = random.Random(seed)
+    programs: List[Tuple[Dict[str, Any], int, List[str]]] = []
+    cluster = 0
+    while len(programs) < n:
+        original = _new_program(rng, language)
+        programs.append((original, cluster, []))
+        if rng.random() < COPIED_SHARE:
+            for _ in range(rng.randint(1, MAX_COPIES)):
+                if len(programs) >= n:
+                    break
+                kinds = [k for k in OBFUSCATIONS if rng.random() < 0.5] or [rng.choice(OBFUSCATIONS)]
+                programs.append((_obfuscate(rng, original, kinds), cluster, kinds))
+        cluster += 1
+
+    rng.shuffle(programs)
+    entries: List[Dict[str, Any]] = []
+    truth: Dict[int, Tuple[int, List[str]]] = {}
+    filename = "main.py" if language == "python" else "Main.java"
+    for uid, (program, cid, kinds) in enumerate(programs):
+        sub_dir = os.path.join(root, f"student{uid:05d}")
+        os.makedirs(sub_dir, exist_ok=True)
+        path = os.path.join(sub_dir, filename)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(render(program, seed * 100003 + uid))
+        entries.append({"user_id": uid, "name": f"Student {uid}", "class_id": "1", "submission_id": uid, "filepath": path})
+        truth[uid] = (cid, kinds)
+    return entries, truth
+
+
+# ---------------------------------------------------------------------------
+# Scoring
+# ---------------------------------------------------------------------------
+
+
+def _truth_pairs(truth: Dict[int, Tuple[int, List[str]]]) -> Set[Tuple[int, int]]:
+    members: Dict[int, List[int]] = {}
+    for uid, (cid, _) in truth.items():
+        members.setdefault(cid, []).append(uid)
+    pairs: Set[Tuple[int, int]] = set()
+    for uids in members.values():
+        uids.sort()
+        for i in range(len(uids)):
+            for j in range(i + 1, len(uids)):
+                pairs.add((uids[i], uids[j]))
+    return pairs
+
+
+def _precision_recall(found: Set[Tuple[int, int]], expected: Set[Tuple[int, int]]) -> Dict[str, Any]:
+    tp = len(found & expected)
+    return {
+        "found": len(found),
+        "true_positives": tp,
+        "precision": round(tp / len(found), 4) if found else None,
+        "recall": round(tp / len(expected), 4) if expected else None,
+    }
+
+
+def evaluate(pairs: List[Dict[str, Any]], truth: Dict[int, Tuple[int, List[str]]], threshold: float) -> Dict[str, Any]:
+    expected = _truth_pairs(truth)
+
+    def key(p: Dict[str, Any]) -> Tuple[int, int]:
+        a, b = int(p["a"]["user_id"]), int(p["b"]["user_id"])
+        return (a, b) if a < b else (b, a)
+
+    channels = {
+        "token": {key(p) for p in pairs if p["similarity_token"] >= threshold},
+        "ast": {key(p) for p in pairs if p["similarity_ast"] >= threshold},
+        "reported": {key(p) for p in pairs},
+        "flagged": {key(p) for p in pairs if (p["similarity_token"] + p["similarity_ast"]) / 2 >= FLAG_THRESHOLD},
+    }
+
+    # Recall split by the obfuscations applied to the copy in each true pair.
+    by_kind: Dict[str, Dict[str, Any]] = {}
+    for kind in OBFUSCATIONS:
+        subset = {pr for pr in expected if kind in truth[pr[0]][1] or kind in truth[pr[1]][1]}
+        if not subset:
+            continue
+        by_kind[kind] = {
+            "pairs": len(subset),
+            **{ch: round(len(found & subset) / len(subset), 4) for ch, found in channels.items()},
+        }
+
+    return {
+        "true_pairs": len(expected),
+        "channels": {ch: _precision_recall(found, expected) for ch, found in channels.items()},
+        "recall_by_obfuscation": by_kind,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+
+def _peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is KiB on Linux. Children covers the fingerprinting process pool.
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024.0
+    return {"self": round(own, 1), "children": round(children, 1)}
+
+
+def run_single(language: str, n: int, seed: int, threshold: float, workers: Optional[int], keep: bool) -> Dict[str, Any]:
+    from src.plagiarism_detector import detect_plagiarism
+
+    root = tempfile.mkdtemp(prefix=f"plagbench-{language}-{n}-")
+    try:
+        entries, truth = generate_corpus(root, language, n, seed)
+        stats: Dict[str, int] = {}
+        started = time.perf_counter()
+        result = detect_plagiarism(entries, language=language, workers=workers, stats=stats)
+        seconds = time.perf_counter() - started
+        return {
+            "language": language,
+            "n": n,
+            "seed": seed,
+            "seconds": round(seconds, 3),
+            "peak_rss_mb": _peak_rss_mb(),
+            "stats": stats,
+            **evaluate(result["pairs"], truth, threshold),
+        }
+    finally:
+        if keep:
+            print(f"corpus kept at {root}", file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def _run_isolated(args: argparse.Namespace, language: str, n: int) -> Dict[str, Any]:
+    cmd = [
+        sys.executable, "-m", "benchmarks.plagiarism_benchmark", "--worker",
+        "--languages", language, "--sizes", str(n), "--seed", str(args.seed), "--threshold", str(args.threshold),
+    ]
+    if args.workers is not None:
+        cmd += ["--workers", str(args.workers)]
+    if args.keep:
+        cmd.append("--keep")
+    proc = subprocess.run(cmd, cwd=BACKEND_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"language": language, "n": n, "error": proc.stderr.strip().splitlines()[-1:] or ["failed"]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _git_rev() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True)
+        return out.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def _summary_line(r: Dict[str, Any]) -> str:
+    if "error" in r:
+        return f"{r['language']:>6} n={r['n']:<5} ERROR {r['error']}"
+    ch = r["channels"]
+    fmt = lambda v: "  -  " if v is None else f"{v:.3f}"
+    return (
+        f"{r['language']:>6} n={r['n']:<5} {r['seconds']:>9.2f}s  rss={r['peak_rss_mb']['self']:>7.1f}MB"
+        f"  cand={r['stats'].get('candidates', 0):>7}"
+        f"  token P/R={fmt(ch['token']['precision'])}/{fmt(ch['token']['recall'])}"
+        f"  ast P/R={fmt(ch['ast']['precision'])}/{fmt(ch['ast']['recall'])}"
+        f"  flagged P/R={fmt(ch['flagged']['precision'])}/{fmt(ch['flagged']['recall'])}"
+    )
+
+
+def compare(current: Dict[str, Any], previous_path: str) -> None:
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    old = {(r["language"], r["n"]): r for r in previous.get("results", []) if "error" not in r}
+    print(f"\nvs {os.path.basename(previous_path)} ({previous.get('git_rev')}):")
+    for r in current["results"]:
+        o = old.get((r["language"], r["n"]))
+        if o is None or "error" in r:
+            continue
+        dt = r["seconds"] - o["seconds"]
+        drss = r["peak_rss_mb"]["self"] - o["peak_rss_mb"]["self"]
+        dcand = r["stats"].get("candidates", 0) - o["stats"].get("candidates", 0)
+        drec = {
+            ch: (r["channels"][ch]["recall"] or 0) - (o["channels"][ch]["recall"] or 0)
+            for ch in ("token", "ast", "flagged")
+        }
+        print(
+            f"{r['language']:>6} n={r['n']:<5} time {dt:+.2f}s  rss {drss:+.1f}MB  candidates {dcand:+d}  "
+            + "  ".join(f"{ch} recall {v:+.3f}" for ch, v in drec.items())
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Plagiarism detector scaling/accuracy benchmark")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument("--languages", default="python,java")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--threshold", type=float, default=0.75, help="per-channel positive threshold")
+    parser.add_argument("--workers", type=int, default=None, help="detector fingerprinting processes")
+    parser.add_argument("--out", default=None, help="result file (default: benchmarks/results/...)")
+    parser.add_argument("--compare", default=None, help="earlier result file to diff against")
+    parser.add_argument("--keep", action="store_true", help="keep generated corpora")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    languages = [s.strip().lower() for s in args.languages.split(",") if s.strip()]
+
+    if args.worker:
+        print(json.dumps(run_single(languages[0], sizes[0], args.seed, args.threshold, args.workers, args.keep)))
+        return 0
+
+    from src.plagiarism_detector import DETECTOR_VERSION
+
+    report: Dict[str, Any] = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_rev": _git_rev(),
+        "detector_version": DETECTOR_VERSION,
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "params": {"seed": args.seed, "threshold": args.threshold, "workers": args.workers,
+                   "copied_share": COPIED_SHARE, "max_copies": MAX_COPIES},
+        "results": [],
+    }
+    for language in languages:
+        for n in sizes:
+            r = _run_isolated(args, language, n)
+            report["results"].append(r)
+            print(_summary_line(r), flush=True)
+
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"plagiarism-{stamp}-{report['git_rev']}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nsaved {out}")
+
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,6 @@ from flask import Blueprint
 from flask import request
 from flask import make_response
 from src.services.authentication_service import PAMAuthenticationService
-from src.repositories.models import Users
 from flask_jwt_extended import create_access_token
 from src.jwt_manager import jwt
 from src.repositories.user_repository import UserRepository
@@ -37,11 +36,13 @@ def get_user_role(user_repo: UserRepository = Provide[Container.user_repo]):
 # a protected route is accessed. This should return any python object on a
 # successful lookup, or None if the lookup failed for any reason (for example
 # if the user has been deleted from the database).
+# The result is a cached, read-only UserIdentity rather than a Users row, so polling pages
+# don't pay a DB round trip per request (see UserRepository.get_identity).
 @jwt.user_lookup_loader
-def user_lookup_callback(_jwt_header, jwt_data):
+@inject
+def user_lookup_callback(_jwt_header, jwt_data, user_repo: UserRepository = Provide[Container.user_repo]):
     identity = jwt_data["sub"]
-    user = Users.query.filter_by(Id=identity).one_or_none()
-    return user
+    return user_repo.get_identity(identity)
 
 
 @auth_api.route('/login', methods=['POST'])
@@ -1,10 +1,14 @@
-from flask import Blueprint, request, jsonify
+from http import HTTPStatus
+
+from flask import Blueprint, request, jsonify, make_response
 from flask_jwt_extended import jwt_required, current_user
 from dependency_injector.wiring import inject, Provide
 from container import Container
 
+from src.constants import ADMIN_ROLE
 from src.repositories.class_repository import ClassRepository
-from src.services import class_service
+from src.repositories.user_repository import UserRepository
+from src.services import class_service, roster_import
 
 class_api = Blueprint('class_api', __name__)
 
@@ -56,3 +60,45 @@ def get_class_name_from_id(class_id, class_repository: ClassRepository = Provide
         "name": class_repository.get_class_name_withId(class_id)
     }]
     return jsonify(class_name)
+
+@class_api.route('/roster/import', methods=['POST'])
+@jwt_required()
+@inject
+def import_roster(class_repository: ClassRepository = Provide[Container.class_repo],
+                  user_repository: UserRepository = Provide[Container.user_repo]):
+    """
+    Bulk-import students into one class (see services.roster_import).
+
+    Either multipart/form-data with a CSV `file`, `class_id` and optional `dry_run`, or JSON
+    {"class_id": ..., "students": [{...}, ...], "dry_run": false}.
+    Responds 200 with the per-row report, 400 with the same report when any row failed
+    validation, or 409 when a concurrent change to the same accounts made the write fail
+    (nothing is written in either case).
+    """
+    if current_user.Role != ADMIN_ROLE:
+        return make_response({'message': 'Access Denied'}, HTTPStatus.UNAUTHORIZED)
+
+    upload = request.files.get('file')
+    payload = request.form if upload else (request.get_json(silent=True) or {})
+    try:
+        class_id = int(payload.get('class_id'))
+    except (TypeError, ValueError):
+        return make_response({'message': 'Invalid class_id'}, HTTPStatus.BAD_REQUEST)
+    if class_id not in {int(c.Id) for c in class_repository.get_classes()}:
+        return make_response({'message': 'Class not found'}, HTTPStatus.NOT_FOUND)
+    dry_run = str(payload.get('dry_run', '')).strip().lower() in ('1', 'true', 'yes', 'on')
+
+    try:
+        if upload:
+            rows = roster_import.parse_csv(upload.read().decode('utf-8'))
+        else:
+            rows = roster_import.parse_json(payload.get('students'))
+        if not rows:
+            return make_response({'message': 'No students to import'}, HTTPStatus.BAD_REQUEST)
+        report = roster_import.import_roster(class_id, rows, class_repository, user_repository, dry_run=dry_run)
+    except (UnicodeDecodeError, ValueError) as e:
+        return make_response({'message': str(e)}, HTTPStatus.BAD_REQUEST)
+
+    if report['conflict']:
+        return make_response(jsonify(report), HTTPStatus.CONFLICT)
+    return make_response(jsonify(report), HTTPStatus.OK if report['ok'] else HTTPStatus.BAD_REQUEST)
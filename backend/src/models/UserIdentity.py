@@ -0,0 +1,31 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class UserIdentity:
+    """
+    Detached, read-only snapshot of a Users row, used as flask_jwt_extended's current_user.
+    Attribute names match Users so endpoints read it the same way.
+    """
+    Id: int
+    Username: Optional[str]
+    Firstname: Optional[str]
+    Lastname: Optional[str]
+    Email: Optional[str]
+    StudentNumber: Optional[str]
+    Role: int
+    IsLocked: bool
+
+    @classmethod
+    def from_user(cls, user) -> "UserIdentity":
+        return cls(
+            Id=int(user.Id),
+            Username=user.Username,
+            Firstname=user.Firstname,
+            Lastname=user.Lastname,
+            Email=user.Email,
+            StudentNumber=user.StudentNumber,
+            Role=int(user.Role or 0),
+            IsLocked=bool(user.IsLocked),
+        )
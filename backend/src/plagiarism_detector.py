@@ -1,22 +1,78 @@
 # src/services/plagiarism_detector.py
 
 import ast
+import hashlib
+import heapq
+import logging
 import os
 import re
+import time
 import javalang
-from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
-from difflib import SequenceMatcher
+import numpy as np
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 # External packages:
 #  - datasketch: MinHash + LSH for fast near-duplicate detection on token shingles
-#  - scikit-learn: character n-gram TF-IDF (for a recall-oriented candidate set)
+#  - scikit-learn: hashed character n-gram TF-IDF (for a recall-oriented candidate set)
 from datasketch import MinHash, MinHashLSH
-from sklearn.feature_extraction.text import TfidfVectorizer
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
 
 ALLOWED_SOURCE_EXTS: Set[str] = {".py", ".java"}
-FILE_MARKER_RE = re.compile(r"^\s*//\s*=====\s*.+?\s*=====\s*$")
+FILE_MARKER_RE = re.compile(r"^\s*//\s*=====\s*(.+?)\s*=====\s*$")
 IDENT_RE = re.compile(r"^[A-Za-z_][A-Za-z_0-9]*$")
 
+logger = logging.getLogger(__name__)
+
+# Below this many documents a process pool costs more than it saves.
+PARALLEL_MIN_DOCS = 16
+
+# Part of the persisted report key: bump whenever scoring changes so stored reports are not reused.
+DETECTOR_VERSION = 10
+
+# Greedy String Tiling: shortest token run that counts as a copied tile. Tiles run over the
+# raw lexical tokens, where every renamed identifier ends a run, so this has to stay short
+# enough for the runs between renames to count (at 8, renamed copies scored near 0).
+GST_MIN_MATCH = 4
+_KR_BASE = 1_000_003
+_KR_MOD = (1 << 61) - 1
+
+# Winnowing (MOSS-style) over the structural token stream: k-gram hashes, one kept per
+# window. Any shared run of WINNOW_K + WINNOW_WINDOW - 1 tokens yields a shared fingerprint.
+WINNOW_K = 10
+WINNOW_WINDOW = 6
+# Fingerprints found in more than WINNOW_MAX_DF of the class (and at least WINNOW_MIN_DF_CAP
+# documents) are boilerplate (teacher code is already stripped by the base fingerprint) and
+# are not walked for candidates. The cap has to follow class size: on a shared assignment a
+# copied pair's fingerprints are often also in many honest solutions.
+WINNOW_MAX_DF = 0.50
+WINNOW_MIN_DF_CAP = 32
+# Each document keeps at most this many winnowing candidates (its highest overlaps), so the
+# pairs the channel hands to scoring grow linearly with class size, not quadratically.
+WINNOW_PAIRS_PER_DOC = 32
+# Candidate if the fingerprint sets' resemblance (shared / union) reaches this.
+WINNOW_MIN_OVERLAP = 0.35
+
+# Pairs scoring at least this (mean of token and AST similarity, the score the admin UI
+# lists pairs by) link their students into one collusion group.
+GROUP_THRESHOLD = 0.75
+
+# Character n-gram TF-IDF is hashed into this many columns (no vocabulary is kept), and
+# documents are vectorized / compared this many at a time.
+TFIDF_FEATURES = 1 << 20
+TFIDF_CHUNK = 256
+
+# Anytime mode fingerprints at least this many documents and scores at least this many
+# candidates per call, so resuming always makes progress.
+ANYTIME_MIN_FINGERPRINTS = 50
+ANYTIME_MIN_SCORED = 50
+
+# progress(stage, fraction_done_within_stage)
+ProgressFn = Callable[[str, float], None]
+
 def detect_plagiarism(
     file_entries: List[Dict[str, Any]],
     *,
@@ -29,6 +85,20 @@ def detect_plagiarism(
     tfidf_candidate_threshold: float = 0.92,
     # Inclusion rule: report pair if ANY signal >= report_threshold
     report_threshold: float = 0.60,
+    # Processes used for per-document parsing/fingerprinting (None = all cores, 1 = serial)
+    workers: Optional[int] = None,
+    # Optional progress(stage, fraction) callback for background runs
+    progress: Optional[ProgressFn] = None,
+    # Teacher-provided code to ignore (see build_base_fingerprint)
+    base: Optional[Dict[str, Any]] = None,
+    # Optional dict filled with candidate counts per stage (benchmarks / diagnostics)
+    stats: Optional[Dict[str, int]] = None,
+    # Anytime mode: stop scoring after this many seconds and return best-so-far pairs
+    time_budget: Optional[float] = None,
+    # 'resume' state of an earlier incomplete run over the same entries
+    resume: Optional[Dict[str, Any]] = None,
+    # submission_id -> fingerprint, reused and filled in (see build_fingerprint)
+    fingerprints: Optional[Dict[int, Dict[str, Any]]] = None,
 ) -> Dict[str, Any]:
     """
     Two-signal plagiarism detector.
@@ -37,13 +107,26 @@ def detect_plagiarism(
        - Simple regex tokenizer shared by all languages.
        - Identifiers are kept AS-IS; literals are normalized.
        - Shingle tokens and use MinHash LSH to generate candidates.
-       - Scoring uses order-sensitive token SequenceMatcher
+       - Scoring uses order-sensitive Greedy String Tiling coverage
 
     2) AST Similarity (language-specific, rename-robust):
        - Python: true AST via `ast` -> node-type n-grams (IDs/consts collapsed).
        - Java: `javalang` AST
        - If parsing fails, falls back to a rename-robust structural token channel (identifiers collapsed to ID).
 
+    Starter code / the teacher solution can be passed as `base` so shared code is ignored
+    by every channel before candidate generation and scoring.
+
+    Anytime mode: with a `time_budget` (seconds), fingerprinting stops when the budget runs
+    out (after at least ANYTIME_MIN_FINGERPRINTS documents); otherwise the cheap candidate
+    channels run in full, candidates are scored in order of estimated similarity (best of
+    MinHash, winnowing and TF-IDF estimates) and scoring stops when the budget runs out
+    (after at least ANYTIME_MIN_SCORED candidates). The result is then marked incomplete
+    and carries a 'resume' state; passing it back as `resume` (same entries) continues
+    where the earlier run stopped. Fingerprints are not part of that state: pass the same
+    `fingerprints` dict (kept by the caller, e.g. on disk) to both runs so documents
+    fingerprinted before the stop are not parsed again.
+
     Returns:
       {
         'pairs': [
@@ -51,155 +134,773 @@ def detect_plagiarism(
             'a': {...}, 'b': {...},
             'similarity_token': float,
             'similarity_ast': float,
-            'overlap_snippet_a': str,
-            'overlap_snippet_b': str,
           }, ...
-        ]
+        ],
+        'groups': [...see collusion_groups()...],
+        'complete': bool,  # False if the time budget ran out before every document was
+                           # fingerprinted or every candidate was scored
+        'scored': int, 'candidates': int,
+        'resume': {...},   # only when incomplete
       }
+    Matched regions for one pair are computed on demand by matched_regions().
     """
-    # Load code (supports per-submission single file OR directory of files).
-    # We keep a combined display string (like the UI) AND per-file parts (for AST parsing).
-    docs: List[str] = []
-    parts_by_doc: List[List[Tuple[str, str]]] = []
-    for e in file_entries:
-        text, parts = read_source_entry(str(e.get("filepath", "") or ""))
-        docs.append(text)
-        parts_by_doc.append(parts)
-
+    deadline = time.monotonic() + float(time_budget) if time_budget else None
     n = len(file_entries)
-
-    # Resolve language preference: explicit arg > extension heuristic
-    lang = (language or "").strip().lower()
-    if not lang:
-        exts: Set[str] = set()
-        for e in file_entries:
-            p = str(e.get("filepath", "") or "")
-            try:
-                if os.path.isdir(p):
-                    for fn in os.listdir(p):
-                        _, ext = os.path.splitext(fn)
-                        if ext.lower() in ALLOWED_SOURCE_EXTS:
-                            exts.add(ext.lower())
-                else:
-                    _, ext = os.path.splitext(p)
-                    if ext:
-                        exts.add(ext.lower())
-            except Exception:
-                continue
-        lang = "java" if ".java" in exts else "python"
+    lang = resolve_language(file_entries, language)
+
+    # Load code (supports per-submission single file OR directory of files) and build
+    # every per-document signal once: lexical/structural shingles, MinHash, AST n-grams.
+    known = fingerprints if fingerprints is not None else {}
+    sid = [int(e["submission_id"]) for e in file_entries]
+    missing = [e for e, s in zip(file_entries, sid) if s not in known]
+    built = build_fingerprints(
+        missing,
+        lang=lang,
+        token_shingle_size=token_shingle_size,
+        minhash_perm=minhash_perm,
+        workers=workers,
+        progress=progress,
+        base=base,
+        deadline=deadline,
+    )
+    for e, fp in zip(missing, built):
+        known[int(e["submission_id"])] = fp
+    if len(built) < len(missing):
+        # Budget spent while fingerprinting: nothing is ranked or scored yet.
+        if stats is not None:
+            stats.update(documents=n, fingerprinted=n - len(missing) + len(built))
+        return {
+            "pairs": [],
+            "groups": [],
+            "complete": False,
+            "scored": 0,
+            "candidates": 0,
+            "resume": {"pending": None, "pairs": [], "stats": {}},
+        }
+    fingerprints_list = [known[s] for s in sid]
+
+    if resume and resume.get("pending") is not None:
+        # Candidates were generated and ranked by the earlier run; only scoring is left.
+        index_of = {int(e["submission_id"]): i for i, e in enumerate(file_entries)}
+        ordered = [
+            (index_of[a], index_of[b], float(cos))
+            for a, b, cos in resume.get("pending", [])
+            if a in index_of and b in index_of
+        ]
+        results: List[Dict[str, Any]] = list(resume.get("pairs", []))
+        counts = dict(resume.get("stats", {}))
+    else:
+        ordered, counts = rank_candidates(
+            fingerprints_list,
+            minhash_perm=minhash_perm,
+            lsh_threshold_token=lsh_threshold_token,
+            tfidf_candidate_threshold=tfidf_candidate_threshold,
+            report_threshold=report_threshold,
+            progress=progress,
+        )
+        results = []
 
     # -------------------------------
-    # TOKEN CHANNEL (language-agnostic; rename-sensitive)
+    # Score (most promising first) and collect results
     # -------------------------------
-    lex_token_lists: List[List[str]] = [simple_lex_tokens(src) for src in docs]
-    lex_shingle_sets: List[Set[str]] = [set(make_shingles(toks, token_shingle_size)) for toks in lex_token_lists]
+    scored = 0
+    for i, j, cos in ordered:
+        if deadline is not None and scored >= ANYTIME_MIN_SCORED and time.monotonic() >= deadline:
+            break
+        if scored % 50 == 0:
+            _report(progress, "scoring", scored / len(ordered))
+        scored += 1
+        token_sim, ast_sim = score_pair(fingerprints_list[i], fingerprints_list[j])
+
+        if max(token_sim, ast_sim, cos) < report_threshold:  # cos: auxiliary
+            continue
 
-    # Rename-robust "structure" channel (no keyword lists; identifiers collapse to ID)
-    struct_token_lists: List[List[str]] = [structuralize_tokens(toks) for toks in lex_token_lists]
-    struct_shingle_sets: List[Set[str]] = [set(make_shingles(toks, token_shingle_size)) for toks in struct_token_lists]
+        results.append(pair_record(file_entries[i], file_entries[j], token_sim, ast_sim))
+
+    # Sort by strongest signal; prefer higher AST on ties
+    results.sort(key=pair_sort_key, reverse=True)
+    _report(progress, "scoring", 1.0)
+
+    total = int(counts.get("candidates", len(ordered)))
+    done = total - len(ordered) + scored
+    if stats is not None:
+        stats.update(counts, documents=n, reported=len(results), scored=done)
+
+    out: Dict[str, Any] = {
+        "pairs": results,
+        "groups": collusion_groups(results),
+        "complete": scored == len(ordered),
+        "scored": done,
+        "candidates": total,
+    }
+    if scored < len(ordered):
+        out["resume"] = {
+            "pending": [[sid[i], sid[j], cos] for i, j, cos in ordered[scored:]],
+            "pairs": results,
+            "stats": counts,
+        }
+    return out
 
-    minhashes_lex: List[MinHash] = []
-    for sset in lex_shingle_sets:
-        mh = MinHash(num_perm=minhash_perm)
-        for sh in sset:
-            mh.update(sh.encode("utf-8"))
-        minhashes_lex.append(mh)
 
+def rank_candidates(
+    fingerprints: List[Dict[str, Any]],
+    *,
+    minhash_perm: int = 128,
+    lsh_threshold_token: float = 0.80,
+    tfidf_candidate_threshold: float = 0.92,
+    report_threshold: float = 0.60,
+    progress: Optional[ProgressFn] = None,
+) -> Tuple[List[Tuple[int, int, float]], Dict[str, int]]:
+    """
+    Candidate generation (the cheap channels) for detect_plagiarism.
+
+    Returns ([(i, j, tfidf cosine), ...] ordered by estimated similarity, highest first,
+             candidate counts per channel).
+    """
+    n = len(fingerprints)
+    estimate: Dict[Tuple[int, int], float] = {}
+
+    # -------------------------------
+    # TOKEN CHANNEL (language-agnostic; rename-sensitive)
+    # -------------------------------
+    _report(progress, "candidates", 0.0)
     # Candidate generation must be inclusive enough to match what the UI highlights.
     effective_lsh_thresh = min(float(lsh_threshold_token), float(report_threshold))
     lsh_lex = MinHashLSH(threshold=effective_lsh_thresh, num_perm=minhash_perm)
-    for idx, mh in enumerate(minhashes_lex):
-        lsh_lex.insert(str(idx), mh)
+    for idx, fp in enumerate(fingerprints):
+        lsh_lex.insert(str(idx), fp["minhash"])
 
-    candidates: Set[Tuple[int, int]] = set()
     for i in range(n):
-        for j_str in lsh_lex.query(minhashes_lex[i]):
+        for j_str in lsh_lex.query(fingerprints[i]["minhash"]):
             j = int(j_str)
             if j > i:
-                candidates.add((i, j))
+                estimate[(i, j)] = float(fingerprints[i]["minhash"].jaccard(fingerprints[j]["minhash"]))
+    n_lsh = len(estimate)
+
+    # -------------------------------
+    # WINNOWING CANDIDATES (rename-robust pull-in)
+    # Fingerprints of the structural token stream go into an inverted index; only pairs
+    # that share enough (non-boilerplate) fingerprints are scored, so the cost follows the
+    # number of shared fingerprints instead of n^2.
+    # -------------------------------
+    for ij, overlap in WinnowIndex(fingerprints).candidates().items():
+        estimate[ij] = max(estimate.get(ij, 0.0), overlap)
+    n_winnow = len(estimate)
 
     # -------------------------------
     # TF-IDF character n-grams (cross-language)
     # -------------------------------
-    tfidf = TfidfVectorizer(analyzer="char", ngram_range=(4, 6), min_df=1)
-    tfidf_mat = tfidf.fit_transform([normalize_for_tfidf(s) for s in docs])
-    cos_mat = (tfidf_mat * tfidf_mat.T).toarray()
+    tfidf_mat = char_tfidf_matrix(fp["text"] for fp in fingerprints)
 
     # Be inclusive in candidateing: any pair that could clear report_threshold
     effective_cos_thresh = min(tfidf_candidate_threshold, report_threshold)
-    for i in range(n):
-        row = cos_mat[i]
-        for j in range(i + 1, n):
-            if row[j] >= effective_cos_thresh:
-                candidates.add((i, j))
+    cos = tfidf_cosines(tfidf_mat, effective_cos_thresh, set(estimate))
+    for ij, c in cos.items():
+        estimate[ij] = max(estimate.get(ij, 0.0), c)
 
-    # -------------------------------
-    # AST CHANNEL (language-specific; rename-robust)
-    # -------------------------------
+    ordered = sorted(estimate, key=lambda ij: (-estimate[ij], ij))
+    counts = {
+        "candidates_lsh": n_lsh,
+        "candidates_winnow": n_winnow - n_lsh,
+        "candidates_tfidf": len(estimate) - n_winnow,
+        "candidates": len(estimate),
+    }
+    return [(i, j, cos.get((i, j), 0.0)) for i, j in ordered], counts
+
+
+def char_tfidf_matrix(texts: Iterable[str], chunk_size: int = TFIDF_CHUNK) -> sparse.csr_matrix:
+    """
+    L2-normalized character 4-6-gram TF-IDF rows (smoothed IDF, like TfidfVectorizer's
+    defaults), with n-grams hashed into TFIDF_FEATURES columns instead of a vocabulary.
+
+    Documents are vectorized a chunk at a time and document frequencies are accumulated in
+    the same pass, so memory depends on the number of non-zeros, not on the vocabulary.
+    """
+    vectorizer = HashingVectorizer(
+        analyzer="char", ngram_range=(4, 6), n_features=TFIDF_FEATURES, alternate_sign=False, norm=None
+    )
+    df = np.zeros(TFIDF_FEATURES, dtype=np.int64)
+    chunks: List[sparse.csr_matrix] = []
+    batch: List[str] = []
+
+    def flush() -> None:
+        counts = vectorizer.transform(batch)
+        df[:] += np.bincount(counts.indices, minlength=TFIDF_FEATURES)
+        chunks.append(counts)
+        batch.clear()
+
+    for text in texts:
+        batch.append(normalize_for_tfidf(text))
+        if len(batch) >= chunk_size:
+            flush()
+    if batch:
+        flush()
+    if not chunks:
+        return sparse.csr_matrix((0, TFIDF_FEATURES))
+
+    counts = sparse.vstack(chunks, format="csr")
+    n = counts.shape[0]
+    idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+    counts.data *= idf[counts.indices]
+    return normalize(counts, norm="l2", copy=False)
+
+
+def tfidf_cosines(
+    mat: sparse.csr_matrix,
+    threshold: float,
+    include: Set[Tuple[int, int]],
+    chunk_size: int = TFIDF_CHUNK,
+) -> Dict[Tuple[int, int], float]:
+    """
+    Cosine similarity of every pair (i < j) at or above `threshold`, plus of the pairs in
+    `include`. Rows are compared a block at a time, so no n x n matrix is ever held.
+    """
+    n = mat.shape[0]
+    wanted: Dict[int, List[int]] = {}
+    for i, j in include:
+        wanted.setdefault(i, []).append(j)
+
+    out: Dict[Tuple[int, int], float] = {}
+    for start in range(0, n, chunk_size):
+        block = (mat[start:start + chunk_size] @ mat.T).toarray()
+        rows, cols = np.nonzero(block >= threshold)
+        for r, j in zip(rows.tolist(), cols.tolist()):
+            if j > start + r:
+                out[(start + r, j)] = float(block[r, j])
+        for i in range(start, min(start + chunk_size, n)):
+            for j in wanted.get(i, ()):
+                out[(i, j)] = float(block[i - start, j])
+    return out
+
+
+def _report(progress: Optional[ProgressFn], stage: str, fraction: float) -> None:
+    if progress is not None:
+        progress(stage, fraction)
+
+
+def resolve_language(file_entries: List[Dict[str, Any]], language: Optional[str] = None) -> str:
+    """
+    Resolve language preference: explicit arg > extension heuristic.
+    """
+    lang = (language or "").strip().lower()
+    if lang:
+        return lang
+    exts: Set[str] = set()
+    for e in file_entries:
+        p = str(e.get("filepath", "") or "")
+        try:
+            if os.path.isdir(p):
+                for fn in os.listdir(p):
+                    _, ext = os.path.splitext(fn)
+                    if ext.lower() in ALLOWED_SOURCE_EXTS:
+                        exts.add(ext.lower())
+            else:
+                _, ext = os.path.splitext(p)
+                if ext:
+                    exts.add(ext.lower())
+        except Exception:
+            continue
+    return "java" if ".java" in exts else "python"
+
+
+def build_fingerprint(
+    entry: Dict[str, Any],
+    *,
+    lang: str,
+    token_shingle_size: int = 5,
+    minhash_perm: int = 128,
+    base: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Per-document stage of the detector. Everything here depends on one submission only,
+    so the result can be cached or persisted and later compared against other documents.
+
+    If a project `base` fingerprint (see build_base_fingerprint) is given, teacher-provided
+    code is removed first: matching shingles and AST n-grams are dropped, tokens covered
+    by a base shingle are left out of the token stream, and base lines are left out of the
+    TF-IDF text.
+
+    Shingles and AST n-grams are stored as sorted, unique uint64 hash arrays
+    (see shingle_hashes / hash_strings); compare them with jaccard().
+
+    Returns:
+      {
+        'text': combined source text (minus base lines),
+        'lex_tokens': [...], 'lex_shingles': uint64[...],
+        'struct_shingles': uint64[...], 'ast': uint64[...],
+        'winnow': uint64[...], 'winnow_pos': int32[...] (index into lex_tokens),
+        'minhash': MinHash over lex_shingles,
+      }
+    """
+    text, parts = read_source_entry(str(entry.get("filepath", "") or ""))
+
+    # Lexical channel (rename-sensitive)
+    lex_tokens = simple_lex_tokens(text)
+    lex_positional = shingle_hashes(lex_tokens, token_shingle_size)
+
+    # Rename-robust "structure" channel (no keyword lists; identifiers collapse to ID)
+    struct_shingles = np.unique(shingle_hashes(structuralize_tokens(lex_tokens), token_shingle_size))
+
+    # AST channel: parse each source file separately and union n-grams.
+    # This fixes the common failure case where multiple Java files were concatenated.
     if lang == "java":
-        # Parse each source file separately and union n-grams.
-        # This fixes the common failure case where multiple Java files were concatenated.
-        ast_sets: List[Set[str]] = [ast_node_ngrams_java_multi(parts) for parts in parts_by_doc]
+        ast_set = hash_strings(ast_node_ngrams_java_multi(parts))
     else:
-        ast_sets = [ast_node_ngrams_py_multi(parts) for parts in parts_by_doc]
+        ast_set = hash_strings(ast_node_ngrams_py_multi(parts))
+
+    lex_shingles = np.unique(lex_positional)
+    if base:
+        lex_tokens = _strip_base_tokens(lex_tokens, lex_positional, base["lex_shingles"], token_shingle_size)
+        lex_shingles = np.setdiff1d(lex_shingles, base["lex_shingles"], assume_unique=True)
+        struct_shingles = np.setdiff1d(struct_shingles, base["struct_shingles"], assume_unique=True)
+        ast_set = np.setdiff1d(ast_set, base["ast"], assume_unique=True)
+        text = "\n".join(ln for ln in text.split("\n") if _base_line_key(ln) not in base["lines"])
+
+    winnow, winnow_pos = winnow_fingerprints(lex_tokens)
+    return {
+        "text": text,
+        "lex_tokens": lex_tokens,
+        "lex_shingles": lex_shingles,
+        "struct_shingles": struct_shingles,
+        "ast": ast_set,
+        "winnow": winnow,
+        "winnow_pos": winnow_pos,
+        "minhash": minhash_of(lex_shingles, minhash_perm),
+    }
+
+
+def build_base_fingerprint(
+    paths: Sequence[str],
+    *,
+    lang: str,
+    token_shingle_size: int = 5,
+) -> Optional[Dict[str, Any]]:
+    """
+    Fingerprint of teacher-provided code for a project (solution directory, starter and
+    additional files). Directories contribute every source file they contain; non-source
+    files (e.g. input data) are ignored. Returns None when nothing usable was found.
+    """
+    lex_parts: List[np.ndarray] = []
+    struct_parts: List[np.ndarray] = []
+    ast_parts: List[np.ndarray] = []
+    lines: Set[str] = set()
+    for path in paths:
+        path = str(path or "")
+        if not path or not os.path.exists(path):
+            continue
+        if not os.path.isdir(path) and os.path.splitext(path)[1].lower() not in ALLOWED_SOURCE_EXTS:
+            continue
+        text, parts = read_source_entry(path)
+        tokens = simple_lex_tokens(text)
+        lex_parts.append(shingle_hashes(tokens, token_shingle_size))
+        struct_parts.append(shingle_hashes(structuralize_tokens(tokens), token_shingle_size))
+        ast_parts.append(hash_strings(ast_node_ngrams_java_multi(parts) if lang == "java" else ast_node_ngrams_py_multi(parts)))
+        lines |= {k for k in (_base_line_key(ln) for ln in text.split("\n")) if k}
 
-    # -------------------------------
-    # AST/STRUCT-BASED CANDIDATEING (rename-robust pull-in)
-    # Ensure pairs with high AST overlap are scored even if tokens differ.
-    # If AST isn't available (parse fails), structural tokens still pull in candidates.
-    # -------------------------------
-    for i in range(n):
-        for j in range(i + 1, n):
-            ast_sim_ij = jaccard(ast_sets[i], ast_sets[j])
-            struct_sim_ij = jaccard(struct_shingle_sets[i], struct_shingle_sets[j])
-            if max(ast_sim_ij, struct_sim_ij) >= report_threshold:
-                candidates.add((i, j))
+    lex_shingles = _union(lex_parts)
+    ast_set = _union(ast_parts)
+    if not (lex_shingles.size or ast_set.size):
+        return None
+    return {"lex_shingles": lex_shingles, "struct_shingles": _union(struct_parts), "ast": ast_set, "lines": lines}
 
-    # -------------------------------
-    # Score and collect results
-    # -------------------------------
-    results: List[Dict[str, Any]] = []
-    for i, j in sorted(candidates):
-        # Token similarity should match what AdminPlagiarism visually highlights:
-        # use sequence-based overlap on lexical tokens (order-sensitive like the viewer),
-        # and keep shingle-Jaccard as a stabilizer for very short submissions.
-        token_sim_seq = token_sequence_similarity(lex_token_lists[i], lex_token_lists[j])
-        token_sim_set = jaccard(lex_shingle_sets[i], lex_shingle_sets[j])
-        token_sim = max(token_sim_seq, token_sim_set)  # rename-sensitive
-
-        # AST similarity is rename-robust; if parsing fails, fall back to structural-token shingles.
-        ast_sim_raw = jaccard(ast_sets[i], ast_sets[j])
-        ast_sim_fallback = jaccard(struct_shingle_sets[i], struct_shingle_sets[j])
-        ast_sim = max(ast_sim_raw, ast_sim_fallback)
-
-        cos = float(cos_mat[i][j])  # auxiliary
-
-        if max(token_sim, ast_sim, cos) < report_threshold:
-            continue
 
-        snip_a, snip_b = best_overlap_snippets(docs[i], docs[j])
-        results.append(
-            {
-                "a": pick(file_entries[i], "user_id", "name", "class_id", "submission_id"),
-                "b": pick(file_entries[j], "user_id", "name", "class_id", "submission_id"),
-                "similarity_token": float(token_sim),
-                "similarity_ast": float(ast_sim),
-                "overlap_snippet_a": snip_a,
-                "overlap_snippet_b": snip_b,
-            }
-        )
+def base_digest(base: Optional[Dict[str, Any]]) -> str:
+    """
+    Stable short id of a base fingerprint, for keys of stored reports.
+    """
+    if not base:
+        return ""
+    h = hashlib.sha256()
+    for name in ("lex_shingles", "struct_shingles", "ast"):
+        h.update(np.ascontiguousarray(base[name], dtype=np.uint64).tobytes())
+        h.update(b"\1")
+    for item in sorted(base["lines"]):
+        h.update(item.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+def _strip_base_tokens(tokens: List[str], positional: np.ndarray, base_shingles: np.ndarray, k: int) -> List[str]:
+    # Drop every token that sits inside a shingle also present in the base code.
+    # positional[i] is the hash of the shingle starting at token i.
+    hits = np.flatnonzero(np.isin(positional, base_shingles, assume_unique=False))
+    if not hits.size:
+        return tokens
+    covered = np.zeros(len(tokens) + 1, dtype=np.int32)
+    np.add.at(covered, hits, 1)
+    np.add.at(covered, np.minimum(hits + max(k, 1), len(tokens)), -1)
+    keep = np.cumsum(covered[:-1]) == 0
+    return [t for t, ok in zip(tokens, keep) if ok]
+
+
+def _base_line_key(line: str) -> str:
+    # Whitespace-normalized line; very short lines ("}", "else:") are too common to suppress.
+    key = re.sub(r"\s+", " ", line).strip()
+    return key if len(key) >= 8 and not FILE_MARKER_RE.match(line) else ""
+
+
+def build_fingerprints(
+    file_entries: List[Dict[str, Any]],
+    *,
+    lang: str,
+    token_shingle_size: int = 5,
+    minhash_perm: int = 128,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressFn] = None,
+    base: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Fingerprint every entry, in input order. Parsing (javalang especially) dominates a run,
+    so documents are spread over a process pool in chunks; small batches stay serial.
+    Each fingerprint depends only on its own file, so results match the serial path exactly.
 
-    # Sort by strongest signal; prefer higher AST on ties
-    results.sort(
-        key=lambda r: (
-            max(r["similarity_token"], r["similarity_ast"]),
-            r["similarity_ast"],
-            r["similarity_token"],
-        ),
-        reverse=True,
+    With a `deadline` (time.monotonic() value) fingerprinting stops once it has passed and
+    at least ANYTIME_MIN_FINGERPRINTS documents are done; the result is then the
+    fingerprints of a prefix of `file_entries`.
+    """
+    n = len(file_entries)
+    if not n:
+        return []
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(int(workers), n))
+
+    jobs = [(e, lang, token_shingle_size, minhash_perm, base) for e in file_entries]
+    if workers <= 1 or n < PARALLEL_MIN_DOCS:
+        return _collect(map(_fingerprint_job, jobs), n, progress, deadline)
+
+    chunksize = max(1, n // (workers * 4))
+    if deadline is not None:
+        # Small chunks, so stopping does not wait for large in-flight chunks to finish.
+        chunksize = min(chunksize, 4)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            out = _collect(pool.map(_fingerprint_job, jobs, chunksize=chunksize), n, progress, deadline)
+            if len(out) < n:
+                pool.shutdown(wait=False, cancel_futures=True)
+            return out
+    except Exception as e:
+        # e.g. no fork/semaphore support in the current environment
+        logger.warning(f"[plagiarism] process pool unavailable, fingerprinting serially: {e}")
+        return _collect(map(_fingerprint_job, jobs), n, progress, deadline)
+
+
+def _collect(
+    results: Any, n: int, progress: Optional[ProgressFn], deadline: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for fp in results:
+        out.append(fp)
+        if len(out) % 10 == 0:
+            _report(progress, "fingerprinting", len(out) / n)
+        if deadline is not None and len(out) >= ANYTIME_MIN_FINGERPRINTS and len(out) < n and time.monotonic() >= deadline:
+            return out
+    _report(progress, "fingerprinting", 1.0)
+    return out
+
+
+def _fingerprint_job(job: Tuple[Dict[str, Any], str, int, int, Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    # Module-level so it can be pickled into worker processes.
+    entry, lang, token_shingle_size, minhash_perm, base = job
+    return build_fingerprint(entry, lang=lang, token_shingle_size=token_shingle_size, minhash_perm=minhash_perm, base=base)
+
+
+def score_pair(fa: Dict[str, Any], fb: Dict[str, Any]) -> Tuple[float, float]:
+    """
+    Returns (token_similarity, ast_similarity) for two fingerprints.
+    """
+    # Token similarity should match what AdminPlagiarism visually highlights:
+    # use sequence-based overlap on lexical tokens (order-sensitive like the viewer),
+    # and keep shingle-Jaccard as a stabilizer for very short submissions.
+    token_sim_seq = token_sequence_similarity(fa["lex_tokens"], fb["lex_tokens"])
+    token_sim_set = jaccard(fa["lex_shingles"], fb["lex_shingles"])
+    token_sim = max(token_sim_seq, token_sim_set)  # rename-sensitive
+
+    # AST similarity is rename-robust; if parsing fails, fall back to structural-token shingles.
+    ast_sim_raw = jaccard(fa["ast"], fb["ast"])
+    ast_sim_fallback = jaccard(fa["struct_shingles"], fb["struct_shingles"])
+    ast_sim = max(ast_sim_raw, ast_sim_fallback)
+    return float(token_sim), float(ast_sim)
+
+
+def pair_record(
+    entry_a: Dict[str, Any],
+    entry_b: Dict[str, Any],
+    token_sim: float,
+    ast_sim: float,
+) -> Dict[str, Any]:
+    return {
+        "a": pick(entry_a, "user_id", "name", "class_id", "submission_id"),
+        "b": pick(entry_b, "user_id", "name", "class_id", "submission_id"),
+        "similarity_token": float(token_sim),
+        "similarity_ast": float(ast_sim),
+    }
+
+
+def pair_sort_key(r: Dict[str, Any]) -> Tuple[float, float, float]:
+    return (
+        max(r["similarity_token"], r["similarity_ast"]),
+        r["similarity_ast"],
+        r["similarity_token"],
     )
 
-    return {"pairs": results}
+
+def pair_score(r: Dict[str, Any]) -> float:
+    return (r["similarity_token"] + r["similarity_ast"]) / 2
+
+
+def collusion_groups(pairs: List[Dict[str, Any]], threshold: float = GROUP_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Cluster submissions connected by pairs with pair_score >= threshold (union-find over
+    those edges), so a ring of students sharing code shows up once instead of as n^2 pairs.
+
+    Returns (largest group first):
+      [{'members': [{user_id, name, class_id, submission_id}, ...],
+        'pairs': int, 'max_score': float, 'mean_score': float}, ...]
+    """
+    parent: Dict[int, int] = {}
+    members: Dict[int, Dict[str, Any]] = {}
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    edges: List[Tuple[int, float]] = []
+    for r in pairs:
+        score = pair_score(r)
+        if score < threshold:
+            continue
+        a, b = int(r["a"]["submission_id"]), int(r["b"]["submission_id"])
+        for sid, side in ((a, r["a"]), (b, r["b"])):
+            if sid not in parent:
+                parent[sid] = sid
+                members[sid] = side
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+        edges.append((a, score))
+
+    groups: Dict[int, Dict[str, Any]] = {}
+    for sid in parent:
+        g = groups.setdefault(find(sid), {"members": [], "pairs": 0, "max_score": 0.0, "mean_score": 0.0})
+        g["members"].append(members[sid])
+    for a, score in edges:
+        g = groups[find(a)]
+        g["pairs"] += 1
+        g["max_score"] = max(g["max_score"], score)
+        g["mean_score"] += score
+
+    out = list(groups.values())
+    for g in out:
+        g["members"].sort(key=lambda m: (str(m.get("name", "")), int(m["submission_id"])))
+        g["mean_score"] = g["mean_score"] / g["pairs"]
+    out.sort(key=lambda g: (-len(g["members"]), -g["max_score"]))
+    return out
+
+
+def minhash_of(hashes: np.ndarray, num_perm: int = 128) -> MinHash:
+    """
+    MinHash of a uint64 hash array, computed directly from the integers (same permutation
+    scheme as MinHash.update_batch, without a Python call per item).
+    """
+    mh = MinHash(num_perm=num_perm, hashfunc=_hash32, permutations=_permutations(num_perm))
+    hv = np.asarray(hashes, dtype=np.uint64) & _MAX_HASH32
+    a, b = mh.permutations
+    for start in range(0, hv.size, _MINHASH_CHUNK):
+        chunk = hv[start:start + _MINHASH_CHUNK, np.newaxis]
+        phv = (chunk * a + b) % _MERSENNE_PRIME & _MAX_HASH32
+        mh.hashvalues = np.minimum(mh.hashvalues, phv.min(axis=0))
+    return mh
+
+
+def _hash32(item: Any) -> int:
+    # MinHash hashfunc for already-hashed integer items; module-level so MinHash pickles.
+    return int(item) & 0xFFFFFFFF
+
+
+@lru_cache(maxsize=None)
+def _permutations(num_perm: int) -> np.ndarray:
+    # Generating permutations per MinHash is slow; they only depend on (seed, num_perm).
+    return MinHash(num_perm=num_perm).permutations
+
+
+# -------- Hashed shingles --------
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH32 = np.uint64(0xFFFFFFFF)
+_MINHASH_CHUNK = 4096
+_ROLL_MULT = np.uint64(0x100000001B3)
+_EMPTY_HASHES = np.zeros(0, dtype=np.uint64)
+
+
+@lru_cache(maxsize=1 << 16)
+def _hash_str(s: str) -> int:
+    # Stable across processes (unlike hash()), so fingerprints can be persisted.
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer: spreads rolled hashes over all 64 bits (MinHash uses the low 32).
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def shingle_hashes(tokens: Sequence[str], k: int) -> np.ndarray:
+    """
+    64-bit hash of every k-token shingle, in token order (position i = tokens[i:i+k]).
+    np.unique() of the result is the document's shingle set.
+    """
+    if not tokens:
+        return _EMPTY_HASHES
+    th = np.fromiter((_hash_str(t) for t in tokens), dtype=np.uint64, count=len(tokens))
+    if k <= 1:
+        return _mix64(th)
+    n = len(th) - k + 1
+    if n <= 0:
+        return _EMPTY_HASHES
+    with np.errstate(over="ignore"):
+        h = th[:n].copy()
+        for j in range(1, k):
+            h = h * _ROLL_MULT + th[j:j + n]
+        return _mix64(h)
+
+
+def hash_strings(items: Set[str]) -> np.ndarray:
+    """
+    Sorted unique uint64 hashes of a set of strings (e.g. AST n-grams).
+    """
+    if not items:
+        return _EMPTY_HASHES
+    return np.unique(np.fromiter((_hash_str(s) for s in items), dtype=np.uint64, count=len(items)))
+
+
+def _union(arrays: List[np.ndarray]) -> np.ndarray:
+    return np.unique(np.concatenate(arrays)) if arrays else _EMPTY_HASHES
+
+
+# -------- Winnowing --------
+
+
+def winnow(hashes: np.ndarray, window: int = WINNOW_WINDOW) -> np.ndarray:
+    """
+    Robust winnowing (Schleimer et al.): in every window of `window` consecutive k-gram
+    hashes keep the minimum (rightmost on ties), each selected position once.
+    Returns the selected positions, ascending.
+    """
+    if not hashes.size:
+        return np.zeros(0, dtype=np.int32)
+    if hashes.size <= window:
+        return np.array([hashes.size - 1 - int(np.argmin(hashes[::-1]))], dtype=np.int32)
+    windows = np.lib.stride_tricks.sliding_window_view(hashes, window)
+    picked = np.arange(windows.shape[0]) + (window - 1 - np.argmin(windows[:, ::-1], axis=1))
+    keep = np.ones(picked.size, dtype=bool)
+    keep[1:] = picked[1:] != picked[:-1]
+    return picked[keep].astype(np.int32)
+
+
+def winnow_fingerprints(lex_tokens: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Winnowed fingerprints of a token stream, computed on the rename-robust structural
+    tokens. Returns (hashes, token positions); position p covers lex_tokens[p:p+WINNOW_K].
+    """
+    kgrams = shingle_hashes(structuralize_tokens(lex_tokens), WINNOW_K)
+    pos = winnow(kgrams)
+    return kgrams[pos], pos
+
+
+class WinnowIndex:
+    """
+    Inverted index: winnow fingerprint -> posting list of (document, token position).
+
+    Fingerprints that occur in too many documents (loops, getters, boilerplate) are dropped
+    from candidate generation, and only documents that co-occur in a posting list are ever
+    compared, so the work is proportional to the number of shared fingerprints. Shared
+    counts come from a sparse document x fingerprint product taken a block of documents at
+    a time, and each document keeps only its best pairs_per_doc partners.
+    """
+
+    def __init__(
+        self,
+        fingerprints: Sequence[Dict[str, Any]],
+        *,
+        max_df: float = WINNOW_MAX_DF,
+        min_df_cap: int = WINNOW_MIN_DF_CAP,
+        pairs_per_doc: int = WINNOW_PAIRS_PER_DOC,
+    ) -> None:
+        n = len(fingerprints)
+        self.sizes = np.array([np.unique(fp["winnow"]).size for fp in fingerprints], dtype=np.int64)
+        self.df_cap = max(int(min_df_cap), int(max_df * n))
+        self.pairs_per_doc = int(pairs_per_doc)
+        self.postings: Dict[int, List[Tuple[int, int]]] = {}
+        for doc, fp in enumerate(fingerprints):
+            for h, p in zip(fp["winnow"].tolist(), fp["winnow_pos"].tolist()):
+                self.postings.setdefault(h, []).append((doc, p))
+
+    def _incidence(self) -> sparse.csr_matrix:
+        # documents x kept fingerprints, 1 where the document has the fingerprint
+        rows: List[int] = []
+        cols: List[int] = []
+        n_cols = 0
+        for posting in self.postings.values():
+            docs = {d for d, _ in posting}
+            if len(docs) < 2 or len(docs) > self.df_cap:
+                continue
+            rows.extend(docs)
+            cols.extend([n_cols] * len(docs))
+            n_cols += 1
+        data = np.ones(len(rows), dtype=np.int32)
+        return sparse.csr_matrix((data, (rows, cols)), shape=(len(self.sizes), n_cols))
+
+    def shared_counts(self, chunk_size: int = TFIDF_CHUNK) -> Dict[Tuple[int, int], int]:
+        """
+        For every document pair sharing at least one non-boilerplate fingerprint: the number
+        of distinct fingerprints they share.
+        """
+        mat = self._incidence()
+        mat_t = mat.T.tocsr()
+        counts: Dict[Tuple[int, int], int] = {}
+        for start in range(0, mat.shape[0], chunk_size):
+            block = (mat[start:start + chunk_size] @ mat_t).tocoo()
+            for r, j, c in zip(block.row.tolist(), block.col.tolist(), block.data.tolist()):
+                if j > start + r:
+                    counts[(start + r, j)] = int(c)
+        return counts
+
+    def candidates(self, min_overlap: float = WINNOW_MIN_OVERLAP) -> Dict[Tuple[int, int], float]:
+        """
+        Pairs (i < j) whose fingerprint sets overlap by at least `min_overlap` (Jaccard),
+        with that overlap; a pair is kept while it is among the pairs_per_doc best of
+        either document.
+        """
+        per_doc: Dict[int, List[Tuple[float, int, int]]] = {}
+        for (i, j), shared in self.shared_counts().items():
+            union = self.sizes[i] + self.sizes[j] - shared
+            if union and shared / union >= min_overlap:
+                overlap = float(shared / union)
+                per_doc.setdefault(i, []).append((overlap, i, j))
+                per_doc.setdefault(j, []).append((overlap, i, j))
+        out: Dict[Tuple[int, int], float] = {}
+        for pairs in per_doc.values():
+            for overlap, i, j in heapq.nlargest(self.pairs_per_doc, pairs):
+                out[(i, j)] = overlap
+        return out
+
+
+def winnow_matches(fa: Dict[str, Any], fb: Dict[str, Any]) -> List[Tuple[int, int]]:
+    """
+    Token positions (pos_a, pos_b) of fingerprints two documents share; each covers
+    WINNOW_K tokens from that position. Used to highlight rename-obfuscated copies.
+    """
+    first_b: Dict[int, int] = {}
+    for h, p in zip(fb["winnow"].tolist(), fb["winnow_pos"].tolist()):
+        first_b.setdefault(h, p)
+    return [(p, first_b[h]) for h, p in zip(fa["winnow"].tolist(), fa["winnow_pos"].tolist()) if h in first_b]
 
 
 # ---------------------------
@@ -252,18 +953,107 @@ def read_source_entry(path: str) -> Tuple[str, List[Tuple[str, str]]]:
     return ("\n\n".join(combined_chunks), parts)
 
 
-def token_sequence_similarity(a: Sequence[str], b: Sequence[str]) -> float:
+def token_sequence_similarity(a: Sequence[str], b: Sequence[str], min_match: int = 0) -> float:
     """
-    Order-sensitive similarity aligned with the UI's diff highlighting.
-    Uses difflib.SequenceMatcher ratio on lexical token sequences.
+    Order-sensitive similarity aligned with the UI's diff highlighting:
+    share of both token streams covered by Greedy String Tiling tiles (2 * covered / total).
+    Unlike a longest-common-subsequence ratio, reordered copied blocks still count in full.
     """
     if not a or not b:
         return 0.0
-    # Avoid pathological quadratic behavior on extremely large submissions
-    max_len = 20000
-    aa = list(a[:max_len])
-    bb = list(b[:max_len])
-    return SequenceMatcher(a=aa, b=bb, autojunk=False).ratio()
+    tiles = greedy_string_tiling(a, b, min_match or GST_MIN_MATCH)
+    covered = sum(length for _, _, length in tiles)
+    return 2.0 * covered / (len(a) + len(b))
+
+
+def greedy_string_tiling(a: Sequence[str], b: Sequence[str], min_match: int = 0) -> List[Tuple[int, int, int]]:
+    """
+    Running-Karp-Rabin Greedy String Tiling (Wise; as used by JPlag).
+
+    Repeatedly finds the longest common runs of not-yet-tiled tokens (at least `min_match`
+    long) and marks them as tiles, longest first, so each token belongs to at most one tile.
+    Candidate runs are found through Karp-Rabin hashes of `min_match`-token windows, which
+    keeps the expected cost near-linear in the token count.
+
+    Returns tiles as (start_in_a, start_in_b, length), in the order they were marked.
+    """
+    m = int(min_match or GST_MIN_MATCH)
+    if len(a) < m or len(b) < m:
+        return []
+
+    # Intern tokens so hashing and comparisons work on small ints.
+    vocab: Dict[str, int] = {}
+    ia = [vocab.setdefault(t, len(vocab) + 1) for t in a]
+    ib = [vocab.setdefault(t, len(vocab) + 1) for t in b]
+    marked_a = bytearray(len(ia))
+    marked_b = bytearray(len(ib))
+
+    # Window hashes never change, only which windows are still fully unmarked.
+    hashes_a = _rolling_hashes(ia, m)
+    table_b: Dict[int, List[int]] = {}
+    for j, h in enumerate(_rolling_hashes(ib, m)):
+        table_b.setdefault(h, []).append(j)
+
+    tiles: List[Tuple[int, int, int]] = []
+    while True:
+        max_match = m
+        matches: List[Tuple[int, int, int]] = []
+        for i, h in enumerate(hashes_a):
+            if marked_a[i] or h not in table_b:
+                continue
+            for j in table_b[h]:
+                if marked_b[j]:
+                    continue
+                # Only extend from the left edge of a run; inner starts give shorter copies.
+                if i and j and ia[i - 1] == ib[j - 1] and not marked_a[i - 1] and not marked_b[j - 1]:
+                    continue
+                k = 0
+                while (
+                    i + k < len(ia)
+                    and j + k < len(ib)
+                    and ia[i + k] == ib[j + k]
+                    and not marked_a[i + k]
+                    and not marked_b[j + k]
+                ):
+                    k += 1
+                if k > max_match:
+                    max_match = k
+                    matches = [(i, j, k)]
+                elif k == max_match:
+                    matches.append((i, j, k))
+
+        if not matches:
+            break
+
+        for i, j, k in matches:
+            # An earlier tile of the same length may already occlude this one.
+            if any(marked_a[i:i + k]) or any(marked_b[j:j + k]):
+                continue
+            marked_a[i:i + k] = b"\x01" * k
+            marked_b[j:j + k] = b"\x01" * k
+            tiles.append((i, j, k))
+
+    return tiles
+
+
+def _rolling_hashes(seq: Sequence[int], m: int) -> List[int]:
+    """
+    Karp-Rabin hashes of every length-m window of seq (window i covers seq[i:i+m]).
+    """
+    n = len(seq)
+    if n < m:
+        return []
+    mod = _KR_MOD
+    base = _KR_BASE
+    top = pow(base, m - 1, mod)
+    h = 0
+    for x in seq[:m]:
+        h = (h * base + x) % mod
+    out = [h]
+    for i in range(m, n):
+        h = ((h - seq[i - m] * top) * base + seq[i]) % mod
+        out.append(h)
+    return out
 
 
 def structuralize_tokens(tokens: Sequence[str]) -> List[str]:
@@ -311,13 +1101,14 @@ def normalize_for_tfidf(s: str) -> str:
     return s
 
 
-def jaccard(a: Set[str], b: Set[str]) -> float:
-    if not a and not b:
-        return 0.0
-    if not a or not b:
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Jaccard similarity of two sorted unique hash arrays.
+    """
+    if not a.size or not b.size:
         return 0.0
-    inter = len(a & b)
-    union = len(a | b)
+    inter = np.intersect1d(a, b, assume_unique=True).size
+    union = a.size + b.size - inter
     return inter / union if union else 0.0
 
 
@@ -331,23 +1122,64 @@ def make_shingles(tokens: Sequence[str], k: int) -> List[str]:
 # -------- LANGUAGE-INDEPENDENT LEXICAL TOKENIZATION --------
 
 
+# Applied in order by both tokenizers below; keep them in one place so they cannot drift.
+_LEX_REWRITES: List[Tuple[re.Pattern, str]] = [
+    # Remove comments (keep spacing approximately)
+    (re.compile(r"/\*.*?\*/", re.S), ""),  # Java block comments
+    (re.compile(r"//.*"), ""),  # Java single-line
+    (re.compile(r"#.*"), ""),  # Python single-line
+    # Normalize string and number literals
+    (re.compile(r'\"(?:\\.|[^"])*\"|\'(?:\\.|[^\'])*\''), "STRING"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "NUMBER"),
+]
+# Split into identifiers/operators/punctuation
+_LEX_TOKEN_RE = re.compile(r"[A-Za-z_][A-Za-z_0-9]*|==|!=|<=|>=|&&|\|\||[-+*/%(){}\[\],.;:<>]")
+
+
 def simple_lex_tokens(src: str) -> List[str]:
     """
     Simple regex tokenizer shared by all languages.
     Identifiers are kept AS-IS (rename-sensitive). Literals are normalized.
     """
-    # Remove comments (keep spacing approximately)
-    src = re.sub(r"/\*.*?\*/", "", src, flags=re.S)  # Java block comments
-    src = re.sub(r"//.*", "", src)  # Java single-line
-    src = re.sub(r"#.*", "", src)  # Python single-line
+    for pattern, repl in _LEX_REWRITES:
+        src = pattern.sub(repl, src)
+    return _LEX_TOKEN_RE.findall(src)
 
-    # Normalize string and number literals
-    src = re.sub(r'\"(?:\\.|[^"])*\"|\'(?:\\.|[^\'])*\'', "STRING", src)
-    src = re.sub(r"\b\d+(?:\.\d+)?\b", "NUMBER", src)
 
-    # Split into identifiers/operators/punctuation
-    pattern = r"[A-Za-z_][A-Za-z_0-9]*|==|!=|<=|>=|&&|\|\||[-+*/%(){}\[\],.;:<>]"
-    return re.findall(pattern, src)
+def simple_lex_tokens_with_lines(src: str) -> Tuple[List[str], List[int]]:
+    """
+    Same tokens as simple_lex_tokens, plus the 0-based line in `src` each token came from.
+    Every rewrite carries a per-character map back to original lines, so comment removal
+    and literal normalization produce exactly the same token stream.
+    """
+    lines: List[int] = []
+    line = 0
+    for ch in src:
+        lines.append(line)
+        if ch == "\n":
+            line += 1
+
+    for pattern, repl in _LEX_REWRITES:
+        out: List[str] = []
+        out_lines: List[int] = []
+        pos = 0
+        for m in pattern.finditer(src):
+            out.append(src[pos:m.start()])
+            out_lines.extend(lines[pos:m.start()])
+            out.append(repl)
+            out_lines.extend([lines[m.start()] if m.start() < len(lines) else line] * len(repl))
+            pos = m.end()
+        out.append(src[pos:])
+        out_lines.extend(lines[pos:])
+        src = "".join(out)
+        lines = out_lines
+
+    tokens: List[str] = []
+    token_lines: List[int] = []
+    for m in _LEX_TOKEN_RE.finditer(src):
+        tokens.append(m.group(0))
+        token_lines.append(lines[m.start()])
+    return tokens, token_lines
 
 
 # -------- PYTHON AST N-GRAMS (rename-robust) --------
@@ -444,41 +1276,96 @@ def ast_node_ngrams_java(src: str, n: int = 3) -> Set[str]:
     return set(make_shingles(seq, n))
 
 
-# -------- Overlap snippet (teacher convenience) --------
+# -------- Matched regions (pair detail view) --------
 
 
-def best_overlap_snippets(a: str, b: str, context_lines: int = 5, min_match_chars: int = 160) -> Tuple[str, str]:
+def matched_regions(path_a: str, path_b: str, min_match: int = 0) -> Dict[str, Any]:
     """
-    Find a *contiguous* overlapping region that corresponds to what the UI highlights.
-    Uses SequenceMatcher on whitespace-normalized lines (order-sensitive).
+    All Greedy String Tiling matches between two submissions, mapped back to files and
+    1-based line ranges on both sides. Tiles that cross a file boundary are split.
+    Shared winnowing fingerprints are mapped the same way; unlike tiles they survive
+    identifier renaming.
 
-    Important: if the best overlap is too small, return empty snippets so the UI
-    doesn't filter the pair out due to short overlap snippets.
+    Returns:
+      {
+        'similarity_token': float,
+        'regions': [
+          {'tokens': int,
+           'a': {'file': str, 'start_line': int, 'end_line': int},
+           'b': {'file': str, 'start_line': int, 'end_line': int}}, ...
+        ],  # longest first
+        'fingerprints': [{'a': {...}, 'b': {...}}, ...],  # same sides, in order of a
+      }
     """
-    a_lines = (a or "").replace("\r\n", "\n").split("\n")
-    b_lines = (b or "").replace("\r\n", "\n").split("\n")
-
-    def norm_line(ln: str) -> str:
-        if FILE_MARKER_RE.match(ln or ""):
-            return ""
-        return re.sub(r"\s+", " ", ln).strip()
+    text_a, _ = read_source_entry(path_a)
+    text_b, _ = read_source_entry(path_b)
+    toks_a, lines_a = simple_lex_tokens_with_lines(text_a)
+    toks_b, lines_b = simple_lex_tokens_with_lines(text_b)
+    map_a = _file_line_map(text_a)
+    map_b = _file_line_map(text_b)
+    where_a = [map_a[ln] for ln in lines_a]
+    where_b = [map_b[ln] for ln in lines_b]
+
+    regions: List[Dict[str, Any]] = []
+    for i, j, k in greedy_string_tiling(toks_a, toks_b, min_match or GST_MIN_MATCH):
+        start = 0
+        for t in range(1, k + 1):
+            at_end = t == k
+            if at_end or where_a[i + t][0] != where_a[i + t - 1][0] or where_b[j + t][0] != where_b[j + t - 1][0]:
+                regions.append({
+                    "tokens": t - start,
+                    "a": _region_side(where_a[i + start], where_a[i + t - 1]),
+                    "b": _region_side(where_b[j + start], where_b[j + t - 1]),
+                })
+                start = t
+
+    regions.sort(key=lambda r: (-r["tokens"], r["a"]["file"], r["a"]["start_line"]))
+    covered = sum(r["tokens"] for r in regions)
+    total = len(toks_a) + len(toks_b)
+
+    wa, pa = winnow_fingerprints(toks_a)
+    wb, pb = winnow_fingerprints(toks_b)
+    fingerprints: List[Dict[str, Any]] = []
+    seen: Set[Tuple[Any, ...]] = set()
+    for p, q in winnow_matches({"winnow": wa, "winnow_pos": pa}, {"winnow": wb, "winnow_pos": pb}):
+        span = {"a": _span_side(where_a, p, WINNOW_K), "b": _span_side(where_b, q, WINNOW_K)}
+        key = tuple(span["a"].values()) + tuple(span["b"].values())
+        if key not in seen:  # neighbouring fingerprints often cover the same lines
+            seen.add(key)
+            fingerprints.append(span)
+    return {
+        "similarity_token": (2.0 * covered / total) if total else 0.0,
+        "regions": regions,
+        "fingerprints": fingerprints,
+    }
+
+
+def _file_line_map(text: str) -> List[Tuple[str, int]]:
+    """
+    For each line of a read_source_entry() combined text: (file name, 1-based line in that file).
+    """
+    out: List[Tuple[str, int]] = []
+    current = ""
+    file_line = 0
+    for ln in text.split("\n"):
+        m = FILE_MARKER_RE.match(ln)
+        if m:
+            current = m.group(1)
+            file_line = 0
+            out.append((current, 0))
+            continue
+        file_line += 1
+        out.append((current, file_line))
+    return out
 
-    a_norm = [norm_line(ln) for ln in a_lines]
-    b_norm = [norm_line(ln) for ln in b_lines]
 
-    sm = SequenceMatcher(a=a_norm, b=b_norm, autojunk=False)
-    m = sm.find_longest_match(0, len(a_norm), 0, len(b_norm))
-    if not m or m.size <= 0:
-        return ("", "")
+def _region_side(first: Tuple[str, int], last: Tuple[str, int]) -> Dict[str, Any]:
+    return {"file": first[0], "start_line": first[1], "end_line": last[1]}
 
-    match_chars = 0
-    for k in range(m.size):
-        match_chars += len(a_norm[m.a + k] or "")
-    if match_chars < int(min_match_chars):
-        return ("", "")
 
-    a_start = max(0, m.a - context_lines)
-    a_end = min(len(a_lines), m.a + m.size + context_lines)
-    b_start = max(0, m.b - context_lines)
-    b_end = min(len(b_lines), m.b + m.size + context_lines)
-    return ("\n".join(a_lines[a_start:a_end]), "\n".join(b_lines[b_start:b_end]))
\ No newline at end of file
+def _span_side(where: List[Tuple[str, int]], start: int, length: int) -> Dict[str, Any]:
+    # Line range of tokens [start, start + length), clipped to the file `start` is in.
+    last = min(start + length, len(where)) - 1
+    while last > start and where[last][0] != where[start][0]:
+        last -= 1
+    return _region_side(where[start], where[last])
@@ -25,6 +25,7 @@ from injector import inject
 from flask_jwt_extended import jwt_required
 from flask_jwt_extended import current_user
 from src.repositories.project_repository import ProjectRepository
+from src.repositories.pagination import NEXT_CURSOR_HEADER, InvalidCursor, keyset_page, page_limit
 from src.services.dataService import all_submissions 
 from src.models.ProjectJson import ProjectJson
 from src.constants import ADMIN_ROLE
@@ -37,7 +38,7 @@ import itertools
 import importlib.util
 from werkzeug.utils import secure_filename
 from urllib.parse import quote
-from sqlalchemy import func
+from sqlalchemy import func, or_
 
 projects_api = Blueprint('projects_api', __name__)
 
@@ -90,6 +91,27 @@ def count_practice_unique_users(project_id: int) -> int:
         pass
     return 0
 
+def project_summaries(projects, project_repo: ProjectRepository, submission_repo: SubmissionRepository) -> list[dict]:
+    """
+    Dashboard rows for a list of projects. Submitter counts and practice flags for all of
+    them come from two grouped queries instead of three queries per project.
+    """
+    ids = [int(p.Id) for p in projects]
+    counts = submission_repo.get_submitter_counts_by_project(ids)
+    practice_enabled = project_repo.get_practice_enabled_project_ids(ids)
+    return [
+        {
+            "Id": proj.Id,
+            "Name": proj.Name,
+            "Start": proj.Start.strftime("%x %X"),
+            "End": proj.End.strftime("%x %X"),
+            "TotalSubmissions": counts.get(int(proj.Id), {}).get("graded", 0),
+            "PracticeTotalSubmissions": counts.get(int(proj.Id), {}).get("practice", 0),
+            "PracticeProblemsEnabled": int(proj.Id) in practice_enabled,
+        }
+        for proj in projects
+    ]
+
 def project_root() -> str:
     return "/tabot-files/project-files"
 
@@ -160,23 +182,8 @@ def all_projects(project_repo: ProjectRepository = Provide[Container.project_rep
             'message': 'Access Denied'
         }
         return make_response(message, HTTPStatus.UNAUTHORIZED)
-    data = project_repo.get_all_projects()
-    new_projects = []
-    thisdic = submission_repo.get_total_submission_for_all_projects()
-    for proj in data:
-
-        practice_total = count_practice_unique_users(int(proj.Id))
-
-        new_projects.append(json.dumps({
-            "Id": proj.Id,
-            "Name": proj.Name,
-            "Start": proj.Start.strftime("%x %X"),
-            "End": proj.End.strftime("%x %X"),
-            "TotalSubmissions": int(thisdic.get(proj.Id, 0) or 0),
-            "PracticeTotalSubmissions": int(practice_total),
-            "PracticeProblemsEnabled": project_repo.get_practice_problems_enabled(proj.Id),
-        }))
-    return jsonify(new_projects)
+    # Plain objects, serialized once by jsonify (rows used to be json.dumps strings inside it).
+    return jsonify(project_summaries(project_repo.get_all_projects(), project_repo, submission_repo))
 
 @projects_api.route('/set_practice_problems_enabled', methods=['POST'])
 @jwt_required()
@@ -263,7 +270,6 @@ def list_practice_problems_student(project_repo: ProjectRepository = Provide[Con
     # rewarded: bonus charge already granted for that practice problem
     rewarded_ids = set()
     try:
-        PracticeBonusAwards.__table__.create(db.engine, checkfirst=True)
         rewarded_rows = (
             db.session.query(PracticeBonusAwards.PracticeProblemId)
             .filter(
@@ -410,27 +416,193 @@ def run_plagiarism(user_repo: UserRepository = Provide[Container.user_repo], sub
     
     input_json = request.get_json()
     projectid = input_json['project_id']
+    force = parse_bool(input_json.get('force', False))
+    # summary: leave out the pairs of a finished report; read them from /plagiarism-report-stream
+    summary = parse_bool(input_json.get('summary', False))
+    # time_budget: seconds; return best-so-far pairs when spent (complete=false), the next run refines
+    time_budget = max(0, parse_int(input_json.get('time_budget', ''), 0)) or None
 
     # Fetch language from projects DB and pass it through
     proj = project_repo.get_selected_project(projectid)
     language = getattr(proj, "Language", "") if proj else ""
 
-    from src.services.dataService import run_local_plagiarism
-    result = run_local_plagiarism(projectid, submission_repo, user_repo, project_repo, language=language)
+    # Runs in the background; an unchanged class gets its stored report straight away.
+    from src.services.dataService import start_plagiarism_job
+    result = start_plagiarism_job(projectid, submission_repo, user_repo, project_repo, language=language, force=force, summary=summary, time_budget=time_budget)
+
+    status = HTTPStatus.OK if result.get("status") == "done" else HTTPStatus.ACCEPTED
+    return make_response(result, status)
+
+@projects_api.route('/plagiarism-pair', methods=['GET'])
+@jwt_required()
+@inject
+def plagiarism_pair(submission_repo: SubmissionRepository = Provide[Container.submission_repo]):
+    """
+    Matched regions for one reported pair, computed when an admin opens it.
+    Query: as=<submission id>, bs=<submission id>
+    Returns: { a, b, similarity_token, regions: [{ tokens, a: {file, start_line, end_line}, b: {...} }] }
+    """
+    if current_user.Role != ADMIN_ROLE:
+        return make_response({'message': 'Access Denied'}, HTTPStatus.UNAUTHORIZED)
 
-    return make_response(result, HTTPStatus.OK)
+    sa = parse_int(request.args.get("as", ""), 0)
+    sb = parse_int(request.args.get("bs", ""), 0)
+    if sa <= 0 or sb <= 0:
+        return make_response({'message': 'Missing submission ids'}, HTTPStatus.BAD_REQUEST)
+
+    from src.services.dataService import plagiarism_pair_detail
+    detail = plagiarism_pair_detail(sa, sb, submission_repo)
+    if detail is None:
+        return make_response({'message': 'Submission not found'}, HTTPStatus.NOT_FOUND)
+    return make_response(detail, HTTPStatus.OK)
+
+@projects_api.route('/plagiarism-history/archive', methods=['POST'])
+@jwt_required()
+@inject
+def archive_plagiarism_history(user_repo: UserRepository = Provide[Container.user_repo], submission_repo: SubmissionRepository = Provide[Container.submission_repo], project_repo: ProjectRepository = Provide[Container.project_repo]):
+    """
+    Archive a project's latest submissions into the historical plagiarism corpus (background job).
+    Body: { project_id, lineage? }   (lineage defaults to class + assignment name)
+    """
+    if current_user.Role != ADMIN_ROLE:
+        return make_response({'message': 'Access Denied'}, HTTPStatus.UNAUTHORIZED)
+
+    input_json = request.get_json() or {}
+    pid = parse_int(input_json.get('project_id', ''), 0)
+    lineage = (input_json.get('lineage') or '').strip().lower() or None
+    if pid <= 0 or not project_repo.get_selected_project(pid):
+        return make_response({'message': 'Missing or unknown project_id'}, HTTPStatus.BAD_REQUEST)
+
+    from src.services import plagiarism_history
+    if lineage and not plagiarism_history.is_valid_lineage(lineage):
+        return make_response({'message': 'Invalid lineage'}, HTTPStatus.BAD_REQUEST)
+
+    from src.services.dataService import start_history_archive_job
+    result = start_history_archive_job(pid, submission_repo, user_repo, project_repo, lineage=lineage)
+    return make_response(result, HTTPStatus.ACCEPTED)
+
+@projects_api.route('/plagiarism-history/run', methods=['POST'])
+@jwt_required()
+@inject
+def run_plagiarism_history(user_repo: UserRepository = Provide[Container.user_repo], submission_repo: SubmissionRepository = Provide[Container.submission_repo], project_repo: ProjectRepository = Provide[Container.project_repo]):
+    """
+    Compare a project's latest submissions against past terms of the same assignment (background job).
+    Body: { project_id, lineage?, force? }
+    Poll /plagiarism-job with the returned job_id; finished jobs carry { lineage, pairs }.
+    """
+    if current_user.Role != ADMIN_ROLE:
+        return make_response({'message': 'Access Denied'}, HTTPStatus.UNAUTHORIZED)
+
+    input_json = request.get_json() or {}
+    pid = parse_int(input_json.get('project_id', ''), 0)
+    lineage = (input_json.get('lineage') or '').strip().lower() or None
+    force = parse_bool(input_json.get('force', False))
+    if pid <= 0 or not project_repo.get_selected_project(pid):
+        return make_response({'message': 'Missing or unknown project_id'}, HTTPStatus.BAD_REQUEST)
+
+    from src.services import plagiarism_history
+    if lineage and not plagiarism_history.is_valid_lineage(lineage):
+        return make_response({'message': 'Invalid lineage'}, HTTPStatus.BAD_REQUEST)
+
+    from src.services.dataService import start_history_job
+    result = start_history_job(pid, submission_repo, user_repo, project_repo, lineage=lineage, force=force)
+    status = HTTPStatus.OK if result.get("status") == "done" else HTTPStatus.ACCEPTED
+    return make_response(result, status)
+
+@projects_api.route('/plagiarism-job', methods=['GET'])
+@jwt_required()
+def plagiarism_job():
+    """
+    Poll a background plagiarism run started by /run-plagiarism.
+    Query: job_id=<id returned by /run-plagiarism>, summary=<bool> (optional)
+    Returns: { job_id, status: queued|running|done|failed, stage, progress, error,
+               pairs + groups (when done; with summary=true: pair_count + groups) }
+    """
+    if current_user.Role != ADMIN_ROLE:
+        return make_response({'message': 'Access Denied'}, HTTPStatus.UNAUTHORIZED)
+
+    from src.services import plagiarism_jobs
+    job_id = (request.args.get("job_id", "") or "").strip()
+    if not plagiarism_jobs.is_valid_key(job_id):
+        return make_response({'message': 'Invalid job_id'}, HTTPStatus.BAD_REQUEST)
+
+    summary = parse_bool(request.args.get("summary", False))
+    job = plagiarism_jobs.get_job(job_id, include_pairs=not summary)
+    if job is None:
+        return make_response({'message': 'Job not found'}, HTTPStatus.NOT_FOUND)
+    return make_response(job, HTTPStatus.OK)
+
+@projects_api.route('/plagiarism-report-stream', methods=['GET'])
+@jwt_required()
+def plagiarism_report_stream():
+    """
+    Pairs of a finished plagiarism run as NDJSON, strongest first, so large classes can be
+    rendered before the whole report has been sent.
+    Query: job_id=<id returned by /run-plagiarism>
+    Returns: one { type: "summary", groups, pair_count, ... } line, then { type: "pair", a, b, similarity_token, similarity_ast } lines
+    """
+    if current_user.Role != ADMIN_ROLE:
+        return make_response({'message': 'Access Denied'}, HTTPStatus.UNAUTHORIZED)
+
+    from src.services import plagiarism_jobs
+    job_id = (request.args.get("job_id", "") or "").strip()
+    if not plagiarism_jobs.is_valid_key(job_id):
+        return make_response({'message': 'Invalid job_id'}, HTTPStatus.BAD_REQUEST)
+
+    lines = plagiarism_jobs.stream_report(job_id)
+    if lines is None:
+        return make_response({'message': 'Report not found'}, HTTPStatus.NOT_FOUND)
+    # X-Accel-Buffering: let a fronting nginx pass lines through as they are produced
+    return Response(lines, mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
     
+@projects_api.route('/plagiarism-report', methods=['GET'])
+@jwt_required()
+@inject
+def plagiarism_report(user_repo: UserRepository = Provide[Container.user_repo], submission_repo: SubmissionRepository = Provide[Container.submission_repo], project_repo: ProjectRepository = Provide[Container.project_repo]):
+    """
+    Read the project's continuously updated pair table (see services/plagiarism_index.py).
+    The index is built from the latest submissions on first use (or after the teacher's
+    solution/additional files change) by a background job; after that uploads keep it current.
+    Query: project_id=<int>, since=<ISO time> (optional, limits 'alerts')
+    Returns: { "pairs": [...], "alerts": [...] }, or 202 with the index job
+             ({ job_id, status, ... }, poll /plagiarism-job) while the index is being built
+    """
+    if current_user.Role != ADMIN_ROLE:
+        return make_response({'message': 'Access Denied'}, HTTPStatus.UNAUTHORIZED)
+
+    pid = parse_int(request.args.get("project_id", ""), 0)
+    if pid <= 0:
+        return make_response({'message': 'Missing project_id'}, HTTPStatus.BAD_REQUEST)
+
+    from src.services import plagiarism_index
+    from src.services.dataService import collect_plagiarism_entries, project_plagiarism_base_digest, start_plagiarism_index_job
+    proj = project_repo.get_selected_project(pid)
+    language = getattr(proj, "Language", "") if proj else ""
+    # The class's submissions are only read when the language has to be guessed from them
+    # or the index has to be (re)built; the base digest is stored per solution version.
+    entries = None if language else collect_plagiarism_entries(pid, submission_repo, user_repo, project_repo)
+    base, digest = project_plagiarism_base_digest(pid, project_repo, entries, language)
+    if not plagiarism_index.index_exists(pid, digest):
+        if entries is None:
+            entries = collect_plagiarism_entries(pid, submission_repo, user_repo, project_repo)
+        # Fingerprinting the whole class can take minutes: build in the background like /run-plagiarism.
+        job = start_plagiarism_index_job(pid, entries, language=language, base=base, digest=digest)
+        return make_response(job, HTTPStatus.ACCEPTED)
+
+    since = (request.args.get("since", "") or "").strip() or None
+    return make_response(plagiarism_index.get_index_report(pid, since=since), HTTPStatus.OK)
+
 @projects_api.route('/projects-by-user', methods=['GET'])
 @jwt_required()
 @inject
 def get_projects_by_user(project_repo: ProjectRepository = Provide[Container.project_repo], submission_repo: SubmissionRepository = Provide[Container.submission_repo]):
     projects= project_repo.get_all_projects()
+    latest = submission_repo.get_most_recent_submissions_by_user(current_user.Id)
     student_submissions={}
     for project in projects:
-        subs = submission_repo.get_most_recent_submission_by_project(project.Id, [current_user.Id])
-        class_name = project_repo.get_className_by_projectId(project.Id)
-        if current_user.Id in subs: 
-            sub = subs[current_user.Id]
+        sub = latest.get(project.Id)
+        if sub is not None:
+            class_name = project_repo.get_className_by_projectId(project.Id)
             student_submissions[project.Name]=[sub.Id, 0, sub.Time.strftime("%x %X"), class_name, str(project.ClassId)]
     return jsonify(student_submissions)
 
@@ -438,7 +610,12 @@ def get_projects_by_user(project_repo: ProjectRepository = Provide[Container.pro
 @jwt_required()
 def past_submissions():
     """
-    Student past submissions grouped by project.
+    Student past submissions grouped by project, one keyset page of projects (oldest
+    start first, projects without a start date before the rest) at a time: ?limit=
+    (default 50, max 200) and ?cursor= from the previous page's X-Next-Cursor header, which
+    is absent on the last page.
+    ?id= narrows the list to the project with that id or the project of the student's
+    submission with that id (one request for pages that only know a route id).
     Returns:
       [
         {
@@ -453,26 +630,29 @@ def past_submissions():
         return jsonify([])
 
     # Projects where this student has ANY submissions (main or practice)
-    proj_ids = [
-        int(r[0])
-        for r in (
-            db.session.query(Submissions.Project)
-            .filter(Submissions.User == uid)
-            .distinct()
-            .all()
+    projects_q = Projects.query.filter(
+        Projects.Id.in_(db.session.query(Submissions.Project).filter(Submissions.User == uid))
+    )
+    only_id = parse_int(request.args.get("id", ""), 0)
+    if only_id > 0:
+        projects_q = projects_q.filter(or_(
+            Projects.Id == only_id,
+            Projects.Id.in_(db.session.query(Submissions.Project).filter(Submissions.Id == only_id, Submissions.User == uid)),
+        ))
+    try:
+        projects, next_cursor = keyset_page(
+            projects_q,
+            [Projects.Start, Projects.Id],
+            lambda p: (p.Start, p.Id),
+            request.args.get("cursor"),
+            page_limit(request.args.get("limit"), default=50, maximum=200),
         )
-        if r and r[0] is not None
-    ]
+    except InvalidCursor:
+        return make_response({'message': 'Invalid cursor'}, HTTPStatus.BAD_REQUEST)
+    proj_ids = [int(p.Id) for p in projects]
     if not proj_ids:
         return jsonify([])
 
-    projects = (
-        Projects.query
-        .filter(Projects.Id.in_(proj_ids))
-        .order_by(Projects.Start.asc(), Projects.Id.asc())
-        .all()
-    )
-
     class_ids = {int(getattr(p, "ClassId", 0) or 0) for p in (projects or [])}
     class_ids.discard(0)
     class_name_by_id = {}
@@ -575,7 +755,11 @@ def past_submissions():
             "practices": practices_by_project.get(pid, []),
         })
 
-    return jsonify(out)
+    resp = jsonify(out)
+    if next_cursor:
+        resp.headers[NEXT_CURSOR_HEADER] = next_cursor
+    resp.headers["Access-Control-Expose-Headers"] = NEXT_CURSOR_HEADER
+    return resp
 
 @projects_api.route('/create_project', methods=['POST'])
 @jwt_required()
@@ -833,6 +1017,11 @@ def edit_project(project_repo: ProjectRepository = Provide[Container.project_rep
         path, assignmentdesc_path, json.dumps(add_names), practice_enabled   
     )
 
+    # Teacher code changed: the stored plagiarism base fingerprint is stale.
+    if needs_new_version or solution_changed or additional_file_changed:
+        from src.services import plagiarism_index
+        plagiarism_index.forget_base(pid)
+
     # Recompute testcase outputs **against the path we just wrote**, so we don't depend on
     # any cached ORM objects or delayed reads.
     try:
@@ -1273,23 +1462,8 @@ def remove_testcase(project_repo: ProjectRepository = Provide[Container.project_
 @inject
 def get_projects_by_class_id(project_repo: ProjectRepository = Provide[Container.project_repo], submission_repo: SubmissionRepository = Provide[Container.submission_repo]):
     data = project_repo.get_projects_by_class_id(request.args.get('id'))
-    
-    new_projects = []
-    thisdic = submission_repo.get_total_submission_for_all_projects()
-    for proj in data:
-
-        practice_total = count_practice_unique_users(int(proj.Id))
-
-        new_projects.append(json.dumps({
-            "Id": proj.Id,
-            "Name": proj.Name,
-            "Start": proj.Start.strftime("%x %X"),
-            "End": proj.End.strftime("%x %X"),
-            "TotalSubmissions": int(thisdic.get(proj.Id, 0) or 0),
-            "PracticeTotalSubmissions": int(practice_total),
-            "PracticeProblemsEnabled": project_repo.get_practice_problems_enabled(proj.Id),
-        }))
-    return jsonify(new_projects)
+    # Rows stay JSON strings here: the admin project pages and office hours JSON.parse each one.
+    return jsonify([json.dumps(row) for row in project_summaries(data, project_repo, submission_repo)])
 
 @projects_api.route('/practice_submission_counts', methods=['GET'])
 @jwt_required()
@@ -1439,14 +1613,10 @@ def edit_practice_project_files(project_repo: ProjectRepository = Provide[Contai
             add_names.append(orig_name)
 
     # Persist practice-only paths
-    pp.solutionpath = base_dir
-    pp.AsnDescriptionPath = desc_path
-    pp.AdditionalFilePath = json.dumps(add_names)
-    pp.Language = getattr(proj, "Language", "") or pp.Language
-    pp.Enabled = True
     try:
-        from src.repositories.database import db
-        db.session.commit()
+        project_repo.update_practice_problem_files(
+            ppid, base_dir, desc_path, json.dumps(add_names), getattr(proj, "Language", ""),
+        )
     except Exception:
         return make_response({'message': 'Failed to save practice paths'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
@@ -1489,10 +1659,8 @@ def rename_practice_problem(project_repo: ProjectRepository = Provide[Container.
     if not pp or int(getattr(pp, "ProjectId", 0) or 0) != int(pid):
         return make_response({'message': 'Practice problem not found'}, HTTPStatus.NOT_FOUND)
 
-    pp.Name = name
     try:
-        from src.repositories.database import db
-        db.session.commit()
+        project_repo.rename_practice_problem(ppid, name)
     except Exception:
         return make_response({'message': 'Failed to rename practice problem'}, HTTPStatus.INTERNAL_SERVER_ERROR)
 
@@ -1,10 +1,12 @@
-from typing import Dict, List
+from typing import Any, Dict, List
 from src.repositories.database import db
+from src.repositories.metadata_cache import CLASS_METADATA_TTL_S, cached, snapshot
 from .models import ClassAssignments, Classes, Labs, LectureSections, Users
-from sqlalchemy import desc, and_
+from sqlalchemy import desc, and_, insert, update
 
 from ..models.LabJson import LabJson
 from ..models.LectureSectionsJson import LectureSectionsJson
+from .user_repository import invalidate_class_roster, invalidate_user_identity
 
 
 class ClassRepository():
@@ -15,7 +17,7 @@ class ClassRepository():
         
         return class_id
     def get_class_name_withId(self, class_id):
-        class_name = Classes.query.filter(Classes.Id==class_id).first().Name
+        class_name = cached("class_name_by_id", int(class_id), lambda: Classes.query.filter(Classes.Id==class_id).first().Name, ttl=CLASS_METADATA_TTL_S)
         return class_name
 
     def get_lecture_id_withName(self,lectureName):
@@ -27,15 +29,16 @@ class ClassRepository():
         lab_id = Labs.query.filter(Labs.Id==labName).first().Id
         return lab_id
     def get_classes(self) -> List[Classes]:
-        """[Get all the current classes]"""
-        classes = Classes.query.order_by(desc(Classes.Name)).all()
-        return classes
+        """[Get all the current classes, as read-only cached snapshots]"""
+        classes = cached("classes", None, lambda: tuple(snapshot(c) for c in Classes.query.order_by(desc(Classes.Name)).all()), ttl=CLASS_METADATA_TTL_S)
+        return list(classes)
     
     def create_assignments(self, class_id: int, lab_id:int, user_id: int, lecture_id: int):
         """[Creates a new entry in the ClassAssignments table]"""
         class_assignment = ClassAssignments(ClassId=class_id,LabId=lab_id,UserId=user_id,LectureId=lecture_id)
         db.session.add(class_assignment)
         db.session.commit()
+        invalidate_class_roster(class_id)
 
         
     def get_assigned_student_classes(self, user_id: int) -> [Classes]:
@@ -49,7 +52,7 @@ class ClassRepository():
 
     def get_labs(self) -> Dict[int, List[LabJson]]:
         """[Once given a class, get all the labs for that class]"""
-        labs = Labs.query.all()
+        labs = cached("labs", None, lambda: tuple(snapshot(lab) for lab in Labs.query.all()), ttl=CLASS_METADATA_TTL_S)
 
         labs_dict = {}
         for lab in labs:
@@ -65,7 +68,11 @@ class ClassRepository():
 
     def get_lecture_sections(self) -> Dict[int, List[LectureSectionsJson]]:
         """[loop through classes, get all the labs for that class]"""
-        lecture_sections = LectureSections.query.all()
+        lecture_sections = cached(
+            "lecture_sections", None,
+            lambda: tuple(snapshot(section) for section in LectureSections.query.all()),
+            ttl=CLASS_METADATA_TTL_S,
+        )
 
         labs_dict = {}
         for lecture_section in lecture_sections:
@@ -86,7 +93,104 @@ class ClassRepository():
         class_assignment = ClassAssignments(ClassId=class_id,LabId=lab_id,LectureId=lecture_id,UserId=user_id,)
         db.session.add(class_assignment)
         db.session.commit()
+        invalidate_class_roster(class_id)
         return "ok"
-    
-
 
+    def upsert_roster(self, class_id: int, students: List[Dict[str, Any]], dry_run: bool = False) -> Dict[str, List[str]]:
+        """
+        Create or update students and their assignment to one class in a single transaction:
+        new Users and ClassAssignments rows go in as multi-row INSERTs, changed ones as
+        executemany UPDATEs by primary key.
+
+        Args:
+            class_id (int): The class imported into.
+            students (List[Dict[str, Any]]): Validated rows (see services.roster_import) with
+                username, first_name, last_name, email, student_number, lecture_id, lab_id.
+                Usernames must be unique and must not belong to non-student accounts.
+            dry_run (bool): Work out the outcomes without writing anything.
+
+        Returns:
+            Dict[str, List[str]]: username -> ["created"] (new account), or for an existing
+            account "enrolled" (added to the class) and/or "updated" (profile, lecture or lab
+            changed), or ["unchanged"].
+
+        Raises:
+            IntegrityError: Another request created one of the usernames since they were
+                looked up; the transaction has been rolled back.
+        """
+        class_id = int(class_id)
+        by_name = {s["username"]: s for s in students}
+        existing = {u.Username: u for u in Users.query.filter(Users.Username.in_(by_name)).all()}
+        assigned = {
+            a.UserId: a
+            for a in ClassAssignments.query.filter(
+                ClassAssignments.ClassId == class_id,
+                ClassAssignments.UserId.in_([u.Id for u in existing.values()]),
+            ).all()
+        } if existing else {}
+
+        outcomes: Dict[str, List[str]] = {}
+        new_users: List[Dict[str, Any]] = []
+        user_updates: List[Dict[str, Any]] = []
+        assignment_updates: List[Dict[str, Any]] = []
+        for name, s in by_name.items():
+            profile = {
+                "Firstname": s["first_name"],
+                "Lastname": s["last_name"],
+                "Email": s["email"],
+                "StudentNumber": s["student_number"],
+            }
+            user = existing.get(name)
+            if user is None:
+                new_users.append({"Username": name, "Role": 0, "IsLocked": False, **profile})
+                outcomes[name] = ["created"]
+                continue
+
+            statuses = []
+            assignment = assigned.get(user.Id)
+            if assignment is None:
+                statuses.append("enrolled")
+            changed = any(getattr(user, k) != v for k, v in profile.items())
+            if changed:
+                user_updates.append({"Id": user.Id, **profile})
+            if assignment is not None and (assignment.LectureId, assignment.LabId) != (s["lecture_id"], s["lab_id"]):
+                assignment_updates.append({
+                    "UserId": user.Id, "ClassId": class_id,
+                    "LectureId": s["lecture_id"], "LabId": s["lab_id"],
+                })
+                changed = True
+            if changed:
+                statuses.append("updated")
+            outcomes[name] = statuses or ["unchanged"]
+
+        if dry_run:
+            return outcomes
+
+        try:
+            if new_users:
+                db.session.execute(insert(Users), new_users)
+            if user_updates:
+                db.session.execute(update(Users), user_updates)
+            # Ids of the new accounts, read back inside the same transaction.
+            ids = dict(
+                db.session.query(Users.Username, Users.Id).filter(Users.Username.in_(by_name)).all()
+            )
+            new_assignments = [
+                {"UserId": ids[name], "ClassId": class_id,
+                 "LectureId": s["lecture_id"], "LabId": s["lab_id"]}
+                for name, s in by_name.items()
+                if ids[name] not in assigned
+            ]
+            if new_assignments:
+                db.session.execute(insert(ClassAssignments), new_assignments)
+            if assignment_updates:
+                db.session.execute(update(ClassAssignments), assignment_updates)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        invalidate_class_roster(class_id)
+        for row in user_updates:
+            invalidate_user_identity(row["Id"])
+        return outcomes
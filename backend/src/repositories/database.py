@@ -1,3 +1,54 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+
+# SQLALCHEMY_BINDS key of the optional read replica (DB_REPLICA_URI, see create_app).
+REPLICA_BIND = "replica"
+
+_read_replica: ContextVar[bool] = ContextVar("read_replica", default=False)
+
+
+class RoutingSession(Session):
+    """
+    Sends SELECTs issued inside read_replica() to the replica engine when one is configured.
+    Flushes and any other statement (UPDATE, DELETE, DDL) always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _read_replica.get() and not self._flushing:
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None and getattr(clause, "is_select", False):
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def read_replica() -> Iterator[None]:
+    """
+    Run the reads in this block (or decorated function) against the read replica, or the
+    primary if none is set.
+
+    Only for read-only analytics and exports: the replica may lag behind the primary, so
+    rows read here must not be modified and written back.
+    """
+    token = _read_replica.set(True)
+    try:
+        yield
+    finally:
+        _read_replica.reset(token)
+
+
+@contextmanager
+def read_primary() -> Iterator[None]:
+    """Run the reads in this block against the primary, even inside read_replica()."""
+    token = _read_replica.set(False)
+    try:
+        yield
+    finally:
+        _read_replica.reset(token)
+
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy(session_options={"class_": RoutingSession})
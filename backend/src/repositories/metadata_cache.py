@@ -0,0 +1,121 @@
+"""
+Read-through cache for admin-edited metadata: projects, practice problems, testcases and
+classes with their labs and lecture sections.
+
+All entries share one global version, kept as a counter in VERSION_FILE. Every write to
+that metadata calls bump_version() after committing. Each worker compares the file's stat
+(inode, mtime, size) with what it saw when it filled its cache, so picking up another
+worker's invalidation costs one stat() per lookup and drops the whole cache at once.
+
+Classes, labs and lecture sections have no edit endpoints, so nothing in the app bumps the
+version for them; they are cached with a TTL (CLASS_METADATA_TTL_S) instead, so a fix made
+directly in the database (or a re-seed) shows up within that long. To apply one at once,
+call bump_version() (e.g. from `flask shell`).
+
+Cached values must be immutable (see snapshot()), never live ORM instances: they outlive
+the request and session they were loaded in.
+"""
+
+import fcntl
+import os
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import inspect as sa_inspect
+
+from src.repositories.database import read_primary
+
+VERSION_FILE = "/tabot-files/project-files/metadata-version"
+MAX_ENTRIES = 4096
+# Lifetime of entries no write path invalidates (see the module docstring).
+CLASS_METADATA_TTL_S = 300
+
+# (namespace, key) -> (value, expiry on time.monotonic(), or None for no expiry)
+_cache: Dict[Tuple[str, Hashable], Tuple[Any, Optional[float]]] = {}
+_seen: Optional[Tuple[int, int, int]] = None
+_lock = threading.Lock()
+_MISSING = object()
+
+
+def _signature() -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(VERSION_FILE)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def cached(namespace: str, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+    """
+    Return the cached value for (namespace, key), calling loader() on a miss. Loaders always
+    read the primary so a lagging replica can't be cached under the current version.
+    With a ttl (seconds) the entry is also reloaded once it is that old.
+    """
+    global _seen
+    sig = _signature()
+    with _lock:
+        if sig != _seen:
+            _cache.clear()
+            _seen = sig
+        hit = _cache.get((namespace, key), _MISSING)
+    if hit is not _MISSING:
+        value, expires = hit
+        if expires is None or time.monotonic() < expires:
+            return value
+
+    with read_primary():
+        value = loader()
+    with _lock:
+        # Skip the store if the version moved while loading; the next lookup reloads.
+        if _seen == sig:
+            if len(_cache) >= MAX_ENTRIES:
+                _cache.clear()
+            _cache[(namespace, key)] = (value, time.monotonic() + ttl if ttl is not None else None)
+    return value
+
+
+def bump_version() -> int:
+    """
+    Invalidate cached metadata in every worker. Call after the write has been committed.
+    Returns the new version.
+    """
+    os.makedirs(os.path.dirname(VERSION_FILE), exist_ok=True)
+    with open(f"{VERSION_FILE}.lock", "a+") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(VERSION_FILE, "r", encoding="utf-8") as f:
+                    version = int(f.read().strip() or 0)
+            except (OSError, ValueError):
+                version = 0
+            version += 1
+            tmp = f"{VERSION_FILE}.tmp.{os.getpid()}"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(str(version))
+            # A new inode on every bump, so readers see the change even within one mtime tick.
+            os.replace(tmp, VERSION_FILE)
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+    with _lock:
+        _cache.clear()
+    return version
+
+
+@lru_cache(maxsize=None)
+def _row_type(model: type):
+    fields = [attr.key for attr in sa_inspect(model).column_attrs]
+    return namedtuple(f"{model.__name__}Row", fields)
+
+
+def snapshot(obj: Any) -> Any:
+    """
+    Immutable, session-free copy of an ORM row with the same column attribute names
+    (relationships are not included). None stays None.
+    """
+    if obj is None:
+        return None
+    row_type = _row_type(type(obj))
+    return row_type(*(getattr(obj, f) for f in row_type._fields))
@@ -0,0 +1,120 @@
+"""
+Versioned schema migrations.
+
+init-db/init.sql creates a fresh database; MIGRATIONS bring an existing one up to date.
+run_migrations() is called once from create_app(): every migration whose version is not
+recorded in SchemaVersions yet is applied in order and then recorded. On MySQL a named
+lock (GET_LOCK) keeps gunicorn workers that boot together from racing each other.
+
+Migrations must be safe to re-run against a database that already has the change (a
+fresh init.sql database already has every index below), so they check before creating.
+"""
+
+from datetime import datetime
+from typing import Callable, List, Sequence, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from src.repositories.database import db
+from src.repositories.submission_repository import PracticeBonusAwards
+
+LOCK_NAME = "tabot_schema_migrations"
+LOCK_TIMEOUT_S = 60
+
+
+class SchemaVersions(db.Model):
+    __tablename__ = "SchemaVersions"
+    Version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    Description = db.Column(db.String(255), nullable=False)
+    AppliedAt = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# (table, index name, columns). Each one backs a query the repositories run per request;
+# tests/test_hot_query_plans.py checks that MySQL actually picks them up.
+HOT_PATH_INDEXES: List[Tuple[str, str, Sequence[str]]] = [
+    # Latest / counted submissions per project, split by graded vs practice, newest first.
+    ("Submissions", "sub_project_practice_user_time_idx", ("Project", "IsPractice", "User", "Time")),
+    # Office-hours queue per project and a student's own questions.
+    ("OHVisits", "oh_project_dismissed_idx", ("ProjectId", "dismissed")),
+    ("OHVisits", "oh_student_project_idx", ("StudentId", "ProjectId")),
+    # FastPass balance and redemptions, always looked up per student per class.
+    ("SubmissionCharges", "charges_user_class_idx", ("UserId", "ClassId")),
+    ("SubmissionChargeRedeptions", "redeem_user_class_project_idx", ("UserId", "ClassId", "ProjectId", "Type")),
+    # Testcases of a project, optionally narrowed to one practice problem.
+    ("Testcases", "tc_project_practice_idx", ("ProjectId", "PracticeProblemId")),
+]
+
+
+def _ensure_index(conn: Connection, table: str, name: str, columns: Sequence[str]) -> None:
+    inspector = inspect(conn)
+    if not inspector.has_table(table):
+        return
+    if name in {ix["name"] for ix in inspector.get_indexes(table)}:
+        return
+    quote = conn.dialect.identifier_preparer.quote
+    cols = ", ".join(quote(c) for c in columns)
+    conn.execute(text(f"CREATE INDEX {quote(name)} ON {quote(table)} ({cols})"))
+
+
+def _create_practice_bonus_awards(conn: Connection) -> None:
+    # Used to be created lazily on every practice-problem request.
+    PracticeBonusAwards.__table__.create(conn, checkfirst=True)
+
+
+def _create_hot_path_indexes(conn: Connection) -> None:
+    for table, name, columns in HOT_PATH_INDEXES:
+        _ensure_index(conn, table, name, columns)
+
+
+# Append only; never renumber or edit a migration that has shipped.
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "create PracticeBonusAwards", _create_practice_bonus_awards),
+    (2, "hot-path composite indexes", _create_hot_path_indexes),
+]
+
+
+def _acquire_lock(conn: Connection) -> bool:
+    if conn.dialect.name != "mysql":
+        return True
+    return bool(conn.execute(text("SELECT GET_LOCK(:name, :timeout)"), {"name": LOCK_NAME, "timeout": LOCK_TIMEOUT_S}).scalar())
+
+
+def _release_lock(conn: Connection) -> None:
+    if conn.dialect.name == "mysql":
+        conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+
+
+def pending_migrations(conn: Connection) -> List[Tuple[int, str, Callable[[Connection], None]]]:
+    SchemaVersions.__table__.create(conn, checkfirst=True)
+    applied = {int(v) for (v,) in conn.execute(db.select(SchemaVersions.Version))}
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def run_migrations(app) -> List[int]:
+    """
+    Apply every pending migration. Returns the versions applied by this call (empty when
+    the schema was already current, e.g. another worker got there first).
+    """
+    applied: List[int] = []
+    with app.app_context():
+        with db.engine.connect() as conn:
+            if not _acquire_lock(conn):
+                raise RuntimeError(f"could not acquire schema migration lock within {LOCK_TIMEOUT_S}s")
+            try:
+                # Re-read under the lock: a worker that waited finds nothing left to do.
+                pending = pending_migrations(conn)
+                conn.commit()
+                for version, description, migrate in pending:
+                    # MySQL commits DDL implicitly, so the version row is recorded right after.
+                    migrate(conn)
+                    conn.execute(
+                        db.insert(SchemaVersions).values(Version=version, Description=description, AppliedAt=datetime.utcnow())
+                    )
+                    conn.commit()
+                    applied.append(version)
+                    print(f"[migrations] applied {version}: {description}", flush=True)
+            finally:
+                _release_lock(conn)
+                conn.commit()
+    return applied
@@ -0,0 +1,149 @@
+"""
+Keyset (seek) pagination for list endpoints.
+
+A page is read with WHERE (k1, k2, ...) > (last k1, last k2, ...) (or < for newest-first)
+ORDER BY k1, k2, ... LIMIT n, so every page costs the same index range scan no matter how
+deep the client has paged, unlike OFFSET. The keys must end in a unique column (usually
+Id) so ties on Time or Start are still ordered. Leading keys may be NULL: like MySQL's
+ORDER BY, NULLs sort before every value ascending and after every value descending.
+
+The client gets an opaque cursor holding the last row's keys and sends it back for the
+next page; endpoints pass it in the X-Next-Cursor response header, which is absent on
+the last page.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, false, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    """A cursor that was not produced by encode_cursor, or not for this listing."""
+
+
+def _encode_value(value: Any) -> List[Any]:
+    if value is None:
+        return ["n", None]
+    if isinstance(value, bool):
+        return ["i", int(value)]
+    if isinstance(value, int):
+        return ["i", value]
+    if isinstance(value, datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, date):
+        return ["d", value.isoformat()]
+    return ["s", str(value)]
+
+
+def _decode_value(tagged: Any) -> Any:
+    tag, raw = tagged
+    if tag == "n":
+        return None
+    if tag == "i":
+        return int(raw)
+    if tag == "dt":
+        return datetime.fromisoformat(raw)
+    if tag == "d":
+        return date.fromisoformat(raw)
+    if tag == "s":
+        return str(raw)
+    raise ValueError(tag)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str], arity: int) -> Optional[Tuple[Any, ...]]:
+    """
+    Keys held by a cursor, or None for a missing/empty one (first page).
+    Raises InvalidCursor when the token is malformed or holds the wrong number of keys.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = tuple(_decode_value(v) for v in json.loads(raw.decode("utf-8")))
+    except Exception as exc:
+        raise InvalidCursor("malformed cursor") from exc
+    if len(values) != arity:
+        raise InvalidCursor("cursor does not match this listing")
+    return values
+
+
+def page_limit(raw: Any, default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    """Client-supplied page size, falling back to default and clamped to [1, maximum]."""
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        limit = default
+    return min(max(1, limit), maximum)
+
+
+def _same(col: Any, value: Any):
+    return col.is_(None) if value is None else col == value
+
+
+def _past(col: Any, value: Any, descending: bool):
+    # Rows whose `col` sorts after `value`, with NULLs first ascending / last descending.
+    if value is None:
+        return false() if descending else col.isnot(None)
+    if descending:
+        return or_(col < value, col.is_(None))
+    return col > value
+
+
+def seek_after(columns: Sequence[Any], values: Sequence[Any], descending: bool = False):
+    """
+    WHERE clause for the rows after `values` in (columns) order, spelled out as
+    c1 > v1 OR (c1 = v1 AND c2 > v2) ... so MySQL can use a range scan on the index.
+    A NULL key compares as IS NULL / IS NOT NULL (see the module docstring).
+    """
+    clauses = []
+    for i, col in enumerate(columns):
+        step = _past(col, values[i], descending)
+        clauses.append(and_(*[_same(columns[j], values[j]) for j in range(i)], step))
+    return or_(*clauses)
+
+
+def keyset_page(
+    query,
+    columns: Sequence[Any],
+    key: Callable[[Any], Sequence[Any]],
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    One page of `query` ordered by `columns`, after `cursor`.
+
+    Args:
+        query: An unordered ORM query.
+        columns: Keyset columns, ending in a unique one.
+        key: Extracts a result row's values for `columns`.
+        cursor: The previous page's next cursor, or None for the first page.
+        limit: Page size (already clamped by page_limit).
+        descending: Newest/highest first.
+
+    Returns:
+        Tuple[List[Any], Optional[str]]: The rows and the cursor of the next page (None on
+        the last page).
+    """
+    after = decode_cursor(cursor, len(columns))
+    if after is not None:
+        query = query.filter(seek_after(columns, after, descending))
+    order = [col.desc() if descending else col.asc() for col in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
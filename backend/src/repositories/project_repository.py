@@ -3,11 +3,12 @@ import os
 import random
 import shutil
 import subprocess
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Set
 from flask import send_file
 from sqlalchemy.sql.expression import asc
 from .models import Projects, PracticeProblems, StudentGrades, Submissions, Testcases, Classes
 from src.repositories.database import db
+from src.repositories.metadata_cache import CLASS_METADATA_TTL_S, bump_version, cached, snapshot
 from sqlalchemy import desc, and_, func
 from datetime import datetime
 from pyston import PystonClient,File
@@ -58,7 +59,34 @@ class ProjectRepository():
         )
 
     def get_practice_problem(self, practice_problem_id: int) -> Optional[PracticeProblems]:
-        return PracticeProblems.query.filter(PracticeProblems.Id == int(practice_problem_id)).first()
+        """Read-only, cached snapshot of a practice problem (see metadata_cache.snapshot)."""
+        ppid = int(practice_problem_id)
+        return cached(
+            "practice_problem", ppid,
+            lambda: snapshot(PracticeProblems.query.filter(PracticeProblems.Id == ppid).first()),
+        )
+
+    def update_practice_problem_files(self, practice_problem_id: int, solution_path: str, description_path: str, additional_file_path: str, language: str) -> bool:
+        pp = PracticeProblems.query.filter(PracticeProblems.Id == int(practice_problem_id)).first()
+        if not pp:
+            return False
+        pp.solutionpath = solution_path
+        pp.AsnDescriptionPath = description_path
+        pp.AdditionalFilePath = additional_file_path
+        pp.Language = language or pp.Language
+        pp.Enabled = True
+        db.session.commit()
+        bump_version()
+        return True
+
+    def rename_practice_problem(self, practice_problem_id: int, name: str) -> bool:
+        pp = PracticeProblems.query.filter(PracticeProblems.Id == int(practice_problem_id)).first()
+        if not pp:
+            return False
+        pp.Name = name
+        db.session.commit()
+        bump_version()
+        return True
 
     def create_practice_problem(self, project_id: int, *, name: str = "") -> int:
         proj = Projects.query.filter(Projects.Id == int(project_id)).first()
@@ -84,6 +112,7 @@ class ProjectRepository():
         )
         db.session.add(pp)
         db.session.commit()
+        bump_version()
         return int(pp.Id)
 
     def get_current_project(self) -> Optional[Projects]:
@@ -124,10 +153,13 @@ class ProjectRepository():
             project_id (int): [The Project ID]
 
         Returns:
-            Project: [a project object]
+            Project: [a read-only, cached snapshot of the project (see metadata_cache.snapshot)]
         """
-        project= Projects.query.filter(Projects.Id == project_id).first()
-        return project
+        try:
+            pid = int(project_id)
+        except (TypeError, ValueError):
+            return None
+        return cached("project", pid, lambda: snapshot(Projects.query.filter(Projects.Id == pid).first()))
 
 
     def get_projects_by_class_id(self,class_id: int) -> int:
@@ -172,6 +204,7 @@ class ProjectRepository():
             db.session.add(pp)
             db.session.commit()
 
+        bump_version()
         return project.Id
 
     def set_practice_problems_enabled(self, project_id: int, enabled: bool):
@@ -185,6 +218,7 @@ class ProjectRepository():
                 self.create_practice_problem(int(project_id), name="Practice Problem 1")
         # No global disable cascade here. UI can hide access when toggle off.
         db.session.commit()
+        bump_version()
 
     def get_practice_problems_enabled(self, project_id: int) -> bool:
         q = PracticeProblems.query.filter(
@@ -192,6 +226,24 @@ class ProjectRepository():
             PracticeProblems.Enabled == True,
         ).first()
         return bool(q)
+
+    def get_practice_enabled_project_ids(self, project_ids: List[int]) -> Set[int]:
+        """
+        Batched get_practice_problems_enabled: the subset of project_ids with at least one
+        enabled practice problem, in one query.
+        """
+        if not project_ids:
+            return set()
+        rows = (
+            db.session.query(PracticeProblems.ProjectId)
+            .filter(
+                PracticeProblems.ProjectId.in_([int(pid) for pid in project_ids]),
+                PracticeProblems.Enabled == True,
+            )
+            .distinct()
+            .all()
+        )
+        return {int(r[0]) for r in rows}
         
     def get_project(self, project_id:int, practice_problem_id: Optional[int] = None) -> Projects:
         project_data = Projects.query.filter(Projects.Id == project_id).first()
@@ -247,27 +299,25 @@ class ProjectRepository():
         project.AdditionalFilePath = additional_file_path
 
         db.session.commit()
+        bump_version()
 
         self.set_practice_problems_enabled(project_id, bool(practice_problems_enabled))
         
     def get_testcases(self, project_id: int, practice_problem_id: Optional[int] = None) -> Dict[int, list]:
-        q = Testcases.query.filter(Testcases.ProjectId == int(project_id))
-        if practice_problem_id:
-            q = q.filter(Testcases.PracticeProblemId == int(practice_problem_id))
-        else:
-            q = q.filter(Testcases.PracticeProblemId.is_(None))
-        testcases = q.all()
-        testcase_info: Dict[int, list] = {}
-        for test in testcases:
-            testcase_data = []
-            testcase_data.append(test.Id)          
-            testcase_data.append(test.Name)        
-            testcase_data.append(test.Description) 
-            testcase_data.append(test.input)       
-            testcase_data.append(test.Output) 
-            testcase_data.append(bool(getattr(test, "Hidden", False)))     
-            testcase_info[test.Id] = testcase_data
-        return testcase_info
+        def load():
+            q = Testcases.query.filter(Testcases.ProjectId == int(project_id))
+            if practice_problem_id:
+                q = q.filter(Testcases.PracticeProblemId == int(practice_problem_id))
+            else:
+                q = q.filter(Testcases.PracticeProblemId.is_(None))
+            return tuple(
+                (test.Id, test.Name, test.Description, test.input, test.Output, bool(getattr(test, "Hidden", False)))
+                for test in q.all()
+            )
+
+        rows = cached("testcases", (int(project_id), int(practice_problem_id or 0)), load)
+        # Fresh lists per call; the cached rows stay immutable.
+        return {row[0]: list(row) for row in rows}
 
     def add_or_update_testcase(
         self,
@@ -355,13 +405,21 @@ class ProjectRepository():
             testcase.Practice = bool(practice_problem_id)
 
         db.session.commit()
+        bump_version()
 
     def remove_testcase(self, testcase_id: int):
         testcase = Testcases.query.filter(Testcases.Id == testcase_id).first()
         db.session.delete(testcase)
         db.session.commit()
+        bump_version()
 
     def testcases_to_json(self, project_id: int, practice_problem_id: Optional[int] = None) -> str:
+        return cached(
+            "testcases_json", (int(project_id), int(practice_problem_id or 0)),
+            lambda: self._testcases_to_json(project_id, practice_problem_id),
+        )
+
+    def _testcases_to_json(self, project_id: int, practice_problem_id: Optional[int] = None) -> str:
         testcase_holder: Dict[int, list] = {}
         proj = Projects.query.filter(Projects.Id == project_id).first()
         add_field = getattr(proj, "AdditionalFilePath", "") if proj else ""
@@ -403,35 +461,35 @@ class ProjectRepository():
         except (TypeError, ValueError):
             return ""
 
-        project = Projects.query.filter(Projects.Id == pid).first()
+        project = self.get_selected_project(pid)
         if project is None:
             return ""
 
-        class_obj = Classes.query.filter(Classes.Id == project.ClassId).first()
-        if class_obj is None:
-            return ""
+        def load():
+            class_obj = Classes.query.filter(Classes.Id == project.ClassId).first()
+            return class_obj.Name if class_obj is not None else ""
 
-        return class_obj.Name
+        return cached("class_name", project.ClassId, load, ttl=CLASS_METADATA_TTL_S)
 
     def get_class_id_by_name(self, class_name):
-        class_id = Classes.query.filter(Classes.Name==class_name).first().Id
+        class_id = cached("class_id_by_name", class_name, lambda: Classes.query.filter(Classes.Name==class_name).first().Id, ttl=CLASS_METADATA_TTL_S)
         return class_id
 
     def get_project_path(self, project_id, practice_problem_id: Optional[int] = None):
-        project = Projects.query.filter(Projects.Id==project_id).first()
+        project = self.get_selected_project(project_id)
         if not project:
             return ""
         if practice_problem_id:
-            pp = PracticeProblems.query.filter(PracticeProblems.Id == int(practice_problem_id)).first()
+            pp = self.get_practice_problem(int(practice_problem_id))
             return (pp.solutionpath if (pp and pp.solutionpath) else "")
         return project.solutionpath
 
     def get_project_desc_path(self, project_id, practice_problem_id: Optional[int] = None):
-        project = Projects.query.filter(Projects.Id == project_id).first()
+        project = self.get_selected_project(project_id)
         if not project:
             return ""
         if practice_problem_id:
-            pp = PracticeProblems.query.filter(PracticeProblems.Id == int(practice_problem_id)).first()
+            pp = self.get_practice_problem(int(practice_problem_id))
             return (pp.AsnDescriptionPath if (pp and pp.AsnDescriptionPath) else "")
         return project.AsnDescriptionPath
 
@@ -1,11 +1,14 @@
 from collections import defaultdict
 import json
 import os
-from src.repositories.database import db
-from .models import StudentGrades, OHVisits, StudentSuggestions, StudentUnlocks, SubmissionChargeRedeptions, SubmissionCharges, Submissions, Projects, Users, SubmissionManualErrors
-from sqlalchemy import desc, and_
+import numpy as np
+from src.repositories.database import db, read_replica
+from .models import StudentGrades, OHVisits, StudentSuggestions, StudentUnlocks, SubmissionChargeRedeptions, SubmissionCharges, Submissions, Projects, Users, SubmissionManualErrors, ClassAssignments
+from .pagination import keyset_page
+from sqlalchemy import desc, and_, case, func
 from sqlalchemy.exc import IntegrityError
-from typing import Dict, List, Tuple
+from sqlalchemy.orm import aliased
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 
 class PracticeBonusAwards(db.Model):
@@ -174,18 +177,35 @@ class SubmissionRepository():
         Returns:
         - A dictionary where the keys are project IDs and the values are the total number of unique submissions for that project.
         """
-        thisdic={}
-        project_ids = Projects.query.with_entities(Projects.Id).all()
-        for proj in project_ids:
-            count = (
-                Submissions.query.with_entities(Submissions.User)
-                .filter(Submissions.Project == proj[0], Submissions.IsPractice == False)
-                .distinct()
-                .count()
-            )
-            thisdic[proj[0]]=count
+        thisdic = {proj[0]: 0 for proj in Projects.query.with_entities(Projects.Id).all()}
+        for pid, stats in self.get_submitter_counts_by_project().items():
+            if pid in thisdic:
+                thisdic[pid] = stats["graded"]
         return thisdic
 
+    def get_submitter_counts_by_project(self, project_ids: Optional[List[int]] = None) -> Dict[int, Dict[str, int]]:
+        """
+        Distinct submitters per project, graded and practice, in one grouped query.
+
+        Args:
+            project_ids (Optional[List[int]]): Limit to these projects (all projects if None).
+
+        Returns:
+            Dict[int, Dict[str, int]]: {project_id: {"graded": <users>, "practice": <users>}};
+            projects without submissions are absent.
+        """
+        if project_ids is not None and not project_ids:
+            return {}
+        graded = func.count(func.distinct(case((Submissions.IsPractice == False, Submissions.User))))
+        practice = func.count(func.distinct(case((Submissions.IsPractice == True, Submissions.User))))
+        q = db.session.query(Submissions.Project, graded, practice)
+        if project_ids is not None:
+            q = q.filter(Submissions.Project.in_([int(pid) for pid in project_ids]))
+        return {
+            int(pid): {"graded": int(g or 0), "practice": int(p or 0)}
+            for pid, g, p in q.group_by(Submissions.Project).all()
+        }
+
     def get_most_recent_submission_by_project(self, project_id: int, user_ids: List[int]) -> Dict[int, Submissions]:
         """
         Returns a dictionary containing the most recent submission for each user in a given project.
@@ -198,26 +218,140 @@ class SubmissionRepository():
             Dict[int, Submissions]: A dictionary where the keys are user IDs and the values are the most recent submission for each user.
         """
 
-        holder = (
-            Submissions.query
-            .filter(and_(
+        if not user_ids:
+            return {}
+        # Groupwise max: one MAX(Time) per user, joined back to fetch that row. Served by the
+        # (Project, IsPractice, User, Time) index, so cost follows users, not submissions.
+        latest = (
+            db.session.query(Submissions.User.label("user_id"), func.max(Submissions.Time).label("max_time"))
+            .filter(
                 Submissions.Project == project_id,
                 Submissions.User.in_(user_ids),
-                Submissions.IsPractice == False
-            ))
-            .order_by(desc(Submissions.Time))
+                Submissions.IsPractice == False,
+            )
+            .group_by(Submissions.User)
+            .subquery()
+        )
+        rows = (
+            Submissions.query
+            .join(latest, and_(Submissions.User == latest.c.user_id, Submissions.Time == latest.c.max_time))
+            .filter(Submissions.Project == project_id, Submissions.IsPractice == False)
             .all()
         )
+        return self._latest_by(rows, "User")
 
-        bucket={}
-        for obj in holder:
-            if obj.User in bucket:
-                if bucket[obj.User].Time < obj.Time:
-                    bucket[obj.User] = obj
-                else:
-                    pass
-            else:
-                bucket[obj.User] = obj
+    def get_most_recent_submissions_by_user(self, user_id: int) -> Dict[int, Submissions]:
+        """
+        Returns the most recent (non-practice) submission of one user in every project they submitted to.
+
+        Args:
+            user_id (int): The user whose submissions to look up.
+
+        Returns:
+            Dict[int, Submissions]: A dictionary where the keys are project IDs and the values are the user's most recent submission in that project.
+        """
+        latest = (
+            db.session.query(Submissions.Project.label("project_id"), func.max(Submissions.Time).label("max_time"))
+            .filter(Submissions.User == user_id, Submissions.IsPractice == False)
+            .group_by(Submissions.Project)
+            .subquery()
+        )
+        rows = (
+            Submissions.query
+            .join(latest, and_(Submissions.Project == latest.c.project_id, Submissions.Time == latest.c.max_time))
+            .filter(Submissions.User == user_id, Submissions.IsPractice == False)
+            .all()
+        )
+        return self._latest_by(rows, "Project")
+
+    @read_replica()
+    def get_project_grid(
+        self,
+        project_id: int,
+        class_id: int,
+        practice: bool = False,
+        practice_problem_id: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns one row per student (Role 0) of a class for the admin project page, in a single query.
+
+        Args:
+            project_id (int): The project shown.
+            class_id (int): The project's class; its ClassAssignments define the roster.
+            practice (bool): Count and show practice submissions instead of graded ones.
+            practice_problem_id (Optional[int]): With practice, narrow to one practice problem.
+
+        Returns:
+            List[Dict[str, Any]]: Rows ordered by user id with keys user_id, lastname, firstname,
+            student_number, is_locked, attempts, submission_id, time, is_passing, has_grade and
+            grade. Submission fields are None for students who never submitted. Lecture and lab
+            come from UserRepository's cached class roster.
+        """
+        scope = [Submissions.Project == project_id, Submissions.IsPractice == bool(practice)]
+        if practice and practice_problem_id is not None:
+            scope.append(Submissions.PracticeProblemId == int(practice_problem_id))
+
+        stats = (
+            db.session.query(
+                Submissions.User.label("user_id"),
+                func.count(Submissions.Id).label("attempts"),
+                func.max(Submissions.Time).label("max_time"),
+            )
+            .filter(*scope)
+            .group_by(Submissions.User)
+            .subquery()
+        )
+        latest = aliased(Submissions)
+        latest_scope = [latest.Project == project_id, latest.IsPractice == bool(practice)]
+        if practice and practice_problem_id is not None:
+            latest_scope.append(latest.PracticeProblemId == int(practice_problem_id))
+
+        rows = (
+            db.session.query(
+                Users.Id, Users.Lastname, Users.Firstname, Users.StudentNumber, Users.IsLocked,
+                stats.c.attempts, latest.Id, latest.Time, latest.IsPassing,
+                StudentGrades.Sid, StudentGrades.Grade,
+            )
+            .select_from(ClassAssignments)
+            .join(Users, Users.Id == ClassAssignments.UserId)
+            .outerjoin(stats, stats.c.user_id == Users.Id)
+            .outerjoin(latest, and_(latest.User == Users.Id, latest.Time == stats.c.max_time, *latest_scope))
+            .outerjoin(StudentGrades, and_(StudentGrades.Sid == Users.Id, StudentGrades.Pid == project_id))
+            .filter(ClassAssignments.ClassId == class_id, Users.Role == 0)
+            .order_by(Users.Id)
+            .all()
+        )
+
+        grid: Dict[int, Dict[str, Any]] = {}
+        for (uid, last, first, number, locked,
+             attempts, sub_id, sub_time, passing, grade_sid, grade) in rows:
+            prev = grid.get(uid)
+            # Rows tied on the latest Time are broken by the higher Id, as in _latest_by.
+            if prev is not None and (sub_id is None or (prev["submission_id"] or 0) >= sub_id):
+                continue
+            grid[uid] = {
+                "user_id": uid,
+                "lastname": last,
+                "firstname": first,
+                "student_number": number,
+                "is_locked": locked,
+                "attempts": int(attempts or 0),
+                "submission_id": sub_id,
+                "time": sub_time,
+                "is_passing": passing,
+                "has_grade": grade_sid is not None,
+                "grade": grade,
+            }
+        return list(grid.values())
+
+    @staticmethod
+    def _latest_by(rows: List[Submissions], key: str) -> Dict[int, Submissions]:
+        # Rows tied on the latest Time are broken by the higher (later inserted) Id.
+        bucket: Dict[int, Submissions] = {}
+        for obj in rows:
+            k = getattr(obj, key)
+            if k not in bucket or bucket[k].Id < obj.Id:
+                bucket[k] = obj
         return bucket
 
     def get_project_by_submission_id(self, submission_id: int) -> int:
@@ -306,6 +440,86 @@ class SubmissionRepository():
         questions = q.order_by(desc(OHVisits.Sqid)).all()
         return questions
 
+    def get_OH_listing(self, history_cursor: Optional[str] = None, history_page_size: int = 5) -> Dict[str, Any]:
+        """
+        Admin office-hours listing: the whole active queue plus one keyset page of history
+        (dismissed questions, newest first, after history_cursor), with student name, class
+        id and latest graded submission id fetched in bulk. Questions whose project or
+        student no longer exists are left out.
+
+        Returns:
+            Dict[str, Any]: {
+                "queue": [(OHVisits, student name, class id, submission id or -1), ...],
+                "history": [...same shape, at most history_page_size entries...],
+                "history_total": int,
+                "history_next_cursor": cursor of the next (older) page, or None on the last page,
+            }
+        """
+        history_page_size = max(1, int(history_page_size))
+        base = (
+            db.session.query(OHVisits, Users.Firstname, Users.Lastname, Projects.ClassId)
+            .join(Projects, Projects.Id == OHVisits.projectId)
+            .join(Users, Users.Id == OHVisits.StudentId)
+        )
+        dismissed = func.coalesce(OHVisits.dismissed, 0)
+        queue = base.filter(dismissed == 0).order_by(desc(OHVisits.Sqid)).all()
+
+        history_q = base.filter(dismissed != 0)
+        history_total = history_q.count()
+        history, history_next_cursor = keyset_page(
+            history_q, [OHVisits.Sqid], lambda row: (row[0].Sqid,),
+            history_cursor, history_page_size, descending=True,
+        )
+
+        rows = queue + history
+        project_ids = {q.projectId for q, _, _, _ in rows}
+        user_ids = {q.StudentId for q, _, _, _ in rows}
+        latest_ids: Dict[Tuple[int, int], int] = {}
+        if rows:
+            # One groupwise max over every (project, student) pair on the page; a superset
+            # of the pairs is fine since the lookup below is by exact pair.
+            latest = (
+                db.session.query(
+                    Submissions.Project.label("project_id"),
+                    Submissions.User.label("user_id"),
+                    func.max(Submissions.Time).label("max_time"),
+                )
+                .filter(
+                    Submissions.Project.in_(project_ids),
+                    Submissions.User.in_(user_ids),
+                    Submissions.IsPractice == False,
+                )
+                .group_by(Submissions.Project, Submissions.User)
+                .subquery()
+            )
+            subs = (
+                db.session.query(Submissions.Project, Submissions.User, Submissions.Id)
+                .join(latest, and_(
+                    Submissions.Project == latest.c.project_id,
+                    Submissions.User == latest.c.user_id,
+                    Submissions.Time == latest.c.max_time,
+                ))
+                .filter(Submissions.IsPractice == False)
+                .all()
+            )
+            for project_id, user_id, sub_id in subs:
+                # Ties on the latest Time go to the higher Id, as in _latest_by.
+                key = (project_id, user_id)
+                if latest_ids.get(key, -1) < sub_id:
+                    latest_ids[key] = sub_id
+
+        def entry(row):
+            q, first, last, class_id = row
+            name = f"{first} {last}"
+            return (q, name, int(class_id or 0), latest_ids.get((q.projectId, q.StudentId), -1))
+
+        return {
+            "queue": [entry(r) for r in queue],
+            "history": [entry(r) for r in history],
+            "history_total": history_total,
+            "history_next_cursor": history_next_cursor,
+        }
+
     def Get_active_OH_questions_for_project(self, project_id: int):
         """
         Student-safe queue: only active (dismissed == 0) for one project, FIFO order.
@@ -430,6 +644,7 @@ class SubmissionRepository():
         submissions = Submissions.query.filter(Submissions.Project == project_id).all()
         return submissions
 
+    @read_replica()
     def get_all_submission_times(self, project_id):
         project = Projects.query.filter(Projects.Id == project_id).first()
         project_start_date = project.Start
@@ -513,45 +728,62 @@ class SubmissionRepository():
 
         return submission_heatmap, students_list
     
+    @read_replica()
     def day_to_day_visualizer(self, project_id, user_ids):
+        """
+        Per project day: how many of user_ids have passed by that day, have only failing
+        submissions so far, or have not submitted yet. Status is cumulative from the start
+        day; submissions outside those days are ignored. A user listed twice counts twice.
 
+        One grouped query yields each user's first submission and first passing submission
+        in the window; the per-day counts are prefix sums over those days.
+
+        Returns:
+            (dates as 'YYYY/MM/DD', passed, failed, no_submission), one entry per day.
+        """
         project = Projects.query.filter(Projects.Id == project_id).first()
         project_start_date = project.Start
         project_end_date = project.End
 
-        dates = []
-        date = project_start_date
-
         days_live = (project_end_date - project_start_date).days
-        for i in range(days_live + 1):
-            dates.append(date.strftime('%Y/%m/%d'))
-            date += timedelta(days=1)
-        
+        if days_live < 0:
+            return [], [], [], []
+        # Days are calendar days from the start date, whatever the start time.
+        first_day = project_start_date.date() if isinstance(project_start_date, datetime) else project_start_date
+        dates = [(first_day + timedelta(days=i)).strftime('%Y/%m/%d') for i in range(days_live + 1)]
+
+        firsts = (
+            db.session.query(
+                Submissions.User,
+                func.min(Submissions.Time),
+                func.min(case((Submissions.IsPassing == True, Submissions.Time))),
+            )
+            .filter(
+                Submissions.Project == project_id,
+                Submissions.Time >= first_day,
+                Submissions.Time < first_day + timedelta(days=days_live + 1),
+            )
+            .group_by(Submissions.User)
+            .all()
+        )
 
-        passed =[0 for i in range(days_live + 1)]
-        failed =[0 for i in range(days_live + 1)]
-        no_submission =[0 for i in range(days_live + 1)]
+        def day_index(value):
+            if value is None:
+                return days_live + 1  # never, within the window
+            day = value.date() if isinstance(value, datetime) else value
+            return (day - first_day).days
 
-        submissions = Submissions.query.filter(Submissions.Project == project_id).all()
-        
-        for user_Id in user_ids:
-            passed_flag = False # flag to check if the user has passed the project for a given date
-            submission_flag = False # flag to check if the user has submitted for a given date
-            for date in dates:
-                for submission in submissions:
-                    if submission.Time.strftime('%Y/%m/%d') == date and submission.User == user_Id:
-                        submission_flag = True
-                        if submission.IsPassing:
-                            passed_flag = True
-                            break
-                if not submission_flag:
-                    no_submission[dates.index(date)] += 1
-                else:
-                    if passed_flag:
-                        passed[dates.index(date)] += 1
-                    else:
-                        failed[dates.index(date)] += 1
-    
+        first_by_user = {user: (day_index(first), day_index(first_pass)) for user, first, first_pass in firsts}
+        never = (days_live + 1, days_live + 1)
+        firsts_of_listed = np.array([first_by_user.get(u, never) for u in user_ids], dtype=np.int64).reshape(-1, 2)
+
+        # Day d counts everyone whose first (passing) submission fell on or before d.
+        submitted_by = np.cumsum(np.bincount(firsts_of_listed[:, 0], minlength=days_live + 2))[: days_live + 1]
+        passed_by = np.cumsum(np.bincount(firsts_of_listed[:, 1], minlength=days_live + 2))[: days_live + 1]
+
+        passed = passed_by.tolist()
+        failed = (submitted_by - passed_by).tolist()
+        no_submission = (len(user_ids) - submitted_by).tolist()
         return dates, passed, failed, no_submission
     def get_all_submissions_for_user(self, user_id):
         submissions = Submissions.query.filter(Submissions.User == user_id).all()
@@ -778,12 +1010,6 @@ class SubmissionRepository():
         if not practice_problem_id:
             return False
 
-        # Ensure table exists without requiring a migration step.
-        try:
-            PracticeBonusAwards.__table__.create(db.engine, checkfirst=True)
-        except Exception:
-            return False
-
         try:
             exists = (
                 PracticeBonusAwards.query
@@ -993,6 +1219,7 @@ class SubmissionRepository():
 
         return student_ids
 
+    @read_replica()
     def get_project_grade_info(self, project_id: int):
         # Get all students grade info from a project (ID, grade, submission ID, error json)
         grade_rows = StudentGrades.query.filter(StudentGrades.Pid == project_id).all()
@@ -1,13 +1,55 @@
 import datetime
 import re
+import threading
+import time
 from operator import and_
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 from sqlalchemy import asc, desc
 
 from src.repositories.database import db
 from .models import ClassAssignments, LectureSections, Users, LoginAttempts, Labs
 from flask_jwt_extended import current_user
+from ..models.UserIdentity import UserIdentity
+
+# Per-class roster cache: class_id -> (loaded_at, {user_id: {"lecture": name, "lab": number}}).
+# Writes through ClassRepository invalidate their class immediately; the TTL bounds how long
+# another gunicorn worker can serve a roster that changed elsewhere.
+ROSTER_TTL_S = 60.0
+_roster_cache: Dict[int, Tuple[float, Dict[int, Dict[str, Any]]]] = {}
+_roster_lock = threading.Lock()
+
+
+def invalidate_class_roster(class_id: Optional[int] = None) -> None:
+    """Drop the cached roster of one class (all classes if class_id is None)."""
+    with _roster_lock:
+        if class_id is None:
+            _roster_cache.clear()
+        else:
+            _roster_cache.pop(int(class_id), None)
+
+
+# Per-process cache of JWT identities: user_id -> (loaded_at, UserIdentity). Any write to a
+# user's role or lock state must call invalidate_user_identity(); the TTL bounds how long
+# another gunicorn worker can keep serving the old state.
+IDENTITY_TTL_S = 30.0
+_identity_cache: Dict[int, Tuple[float, UserIdentity]] = {}
+_identity_lock = threading.Lock()
+
+
+def invalidate_user_identity(user_id: Optional[int] = None) -> None:
+    """Drop the cached identity of one user (all users if user_id is None)."""
+    with _identity_lock:
+        if user_id is None:
+            _identity_cache.clear()
+        else:
+            _identity_cache.pop(int(user_id), None)
+
+
+def lab_number(lab_name: Optional[str]) -> int:
+    # Labs are named like "Lab 3"; -1 when there is no lab or no number in its name.
+    m = re.search(r"\d+", str(lab_name or ""))
+    return int(m.group(0)) if m else -1
 
 
 class UserRepository():
@@ -15,6 +57,32 @@ class UserRepository():
     def get_user_status(self) -> str:
         return str(current_user.Role)
 
+    def get_identity(self, user_id: int) -> Optional[UserIdentity]:
+        """
+        Returns the cached identity (role, lock state, names) of a user, loading it on a miss.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            Optional[UserIdentity]: A frozen, session-free snapshot, or None if the user does not exist.
+        """
+        user_id = int(user_id)
+        now = time.monotonic()
+        with _identity_lock:
+            cached = _identity_cache.get(user_id)
+        if cached is not None and now - cached[0] < IDENTITY_TTL_S:
+            return cached[1]
+
+        user = Users.query.filter(Users.Id == user_id).one_or_none()
+        if user is None:
+            invalidate_user_identity(user_id)
+            return None
+        identity = UserIdentity.from_user(user)
+        with _identity_lock:
+            _identity_cache[user_id] = (now, identity)
+        return identity
+
     def getUserByName(self, username: str) -> Users:
         """
         Returns a user object from the database based on the given username.
@@ -28,6 +96,28 @@ class UserRepository():
         user = Users.query.filter(Users.Username==username).one_or_none()
         return user
     
+    def get_users_by_username(self, usernames: List[str]) -> Dict[str, Users]:
+        """
+        Batched getUserByName: {username: user} for the given usernames that exist.
+        """
+        names = {u for u in usernames if u}
+        if not names:
+            return {}
+        return {u.Username: u for u in Users.query.filter(Users.Username.in_(names)).all()}
+
+    def get_usernames_by_student_number(self, student_numbers: List[str]) -> Dict[str, List[str]]:
+        """
+        {student number: usernames of the accounts holding it} for the given numbers that exist.
+        """
+        numbers = {n for n in student_numbers if n}
+        if not numbers:
+            return {}
+        owners: Dict[str, List[str]] = {}
+        rows = db.session.query(Users.StudentNumber, Users.Username).filter(Users.StudentNumber.in_(numbers)).all()
+        for number, username in rows:
+            owners.setdefault(number, []).append(username)
+        return owners
+
     def get_user(self, user_id: int) -> Users:
         """
         Retrieves a user from the database by their ID.
@@ -160,25 +250,54 @@ class UserRepository():
         query = Users.query.filter(Users.Username==username).one()
         query.IsLocked=True
         db.session.commit()
+        invalidate_user_identity(query.Id)
     
-    def get_user_lectures(self, userIds: List[int], class_id) -> Dict[int, ClassAssignments]:
+    def get_class_roster(self, class_id: int) -> Dict[int, Dict[str, Any]]:
+        """Returns lecture name and lab number of every user assigned to a class.
+
+        One joined query per class, cached per class (see invalidate_class_roster).
+
+        Args:
+            class_id (int): The class to load.
+
+        Returns:
+            Dict[int, Dict[str, Any]]: { user_id: {"lecture": lecture name or None, "lab": lab number or -1} }
+        """
+        class_id = int(class_id)
+        now = time.monotonic()
+        with _roster_lock:
+            cached = _roster_cache.get(class_id)
+        if cached is not None and now - cached[0] < ROSTER_TTL_S:
+            return cached[1]
+
+        rows = (
+            db.session.query(ClassAssignments.UserId, LectureSections.Name, Labs.Name)
+            .outerjoin(LectureSections, LectureSections.Id == ClassAssignments.LectureId)
+            .outerjoin(Labs, Labs.Id == ClassAssignments.LabId)
+            .filter(ClassAssignments.ClassId == class_id)
+            .all()
+        )
+        roster = {
+            int(user_id): {"lecture": lecture_name, "lab": lab_number(lab_name)}
+            for user_id, lecture_name, lab_name in rows
+        }
+        with _roster_lock:
+            _roster_cache[class_id] = (now, roster)
+        return roster
+
+    def get_user_lectures(self, userIds: List[int], class_id) -> Dict[int, str]:
         """Returns a dictionary of lecture names for each user in the given list of user IDs.
         
         Args:
             userIds (List[int]): A list of user IDs for which to retrieve lecture names.
+            class_id (int): Class context for the assignments.
             
         Returns:
-            Dict[int, ClassAssignments]: A dictionary where the keys are user IDs and the values are the names of the lectures
-            assigned to each user.
+            Dict[int, str]: A dictionary where the keys are user IDs and the values are the names of the lectures
+            assigned to each user. Users without an assignment in the class are left out.
         """
-        #TODO: Do we still use this? seems to only work for single class submissions.
-        class_assignments = ClassAssignments.query.filter(and_(ClassAssignments.UserId.in_(userIds), ClassAssignments.ClassId == class_id)).all()
-        
-        user_lectures_dict={}
-        for class_assignment in class_assignments:
-            user_lectures_dict[class_assignment.UserId] = LectureSections.query.filter(LectureSections.Id == class_assignment.LectureId).one().Name
-
-        return user_lectures_dict
+        roster = self.get_class_roster(class_id)
+        return {uid: roster[uid]["lecture"] for uid in userIds if uid in roster}
 
     def get_user_labs(self, userIds: List[int], class_id) -> Dict[int, int]:
         """
@@ -192,37 +311,8 @@ class UserRepository():
         Returns:
             Dict[int, int]: { user_id: lab_number }
         """
-        # Start with all users defaulting to -1 to avoid KeyErrors in callers.
-        user_labs_dict: Dict[int, int] = {uid: -1 for uid in userIds}
-
-        # Fetch class assignments for these users within this class.
-        class_assignments = ClassAssignments.query.filter(
-            and_(ClassAssignments.UserId.in_(userIds), ClassAssignments.ClassId == class_id)
-        ).all()
-
-        for ca in class_assignments:
-            lab_number = -1
-
-            # Expecting ClassAssignments to have a LabId foreign key to Labs.Id.
-            lab_id = getattr(ca, "LabId", None)
-            if lab_id is not None:
-                lab = Labs.query.filter(Labs.Id == lab_id).one_or_none()
-                if lab is not None:
-                    # Prefer an explicit numeric column if it exists (e.g., Labs.Number).
-                    if hasattr(lab, "Number") and lab.Number is not None:
-                        try:
-                            lab_number = int(lab.Number)
-                        except (TypeError, ValueError):
-                            lab_number = -1
-                    # Fallback: try to parse a number from a name like "Lab 3"
-                    elif hasattr(lab, "Name") and lab.Name:
-                        m = re.search(r"\d+", str(lab.Name))
-                        if m:
-                            lab_number = int(m.group(0))
-
-            user_labs_dict[ca.UserId] = lab_number
-
-        return user_labs_dict
+        roster = self.get_class_roster(class_id)
+        return {uid: roster[uid]["lab"] if uid in roster else -1 for uid in userIds}
         
     def get_user_email(self, userId) -> str:
         """
@@ -264,6 +354,7 @@ class UserRepository():
         query = Users.query.filter(Users.Id==user_id).one()
         query.IsLocked = 0
         db.session.commit()
+        invalidate_user_identity(query.Id)
         query = LoginAttempts.query.filter(LoginAttempts.Username==query.Username).all()
         for attempt in query:
             db.session.delete(attempt)
@@ -1,9 +1,12 @@
+import json
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from src.repositories.database import read_replica
 from src.repositories.submission_repository import SubmissionRepository
 from src.repositories.user_repository import UserRepository
 from src.repositories.project_repository import ProjectRepository
-from src.plagiarism_detector import detect_plagiarism
+from src.plagiarism_detector import base_digest, build_base_fingerprint, detect_plagiarism, matched_regions, resolve_language
+from src.services import plagiarism_history, plagiarism_index, plagiarism_jobs
 
 def run_local_plagiarism(
     projectid: int,
@@ -20,6 +23,225 @@ def run_local_plagiarism(
         except Exception:
             language = None
 
+    entries = collect_plagiarism_entries(projectid, submission_repository, user_repository, project_repository)
+    base = project_plagiarism_base(projectid, project_repository, entries, language)
+    result = detect_plagiarism(entries, language=language, base=base)
+    return result
+
+
+def start_plagiarism_job(
+    projectid: int,
+    submission_repository: SubmissionRepository,
+    user_repository: UserRepository,
+    project_repository: ProjectRepository,
+    language: Optional[str] = None,
+    force: bool = False,
+    summary: bool = False,
+    time_budget: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Background version of run_local_plagiarism. Only the (cheap) DB lookups happen here.
+
+    Returns the stored report with status 'done' when the class's latest submissions and the
+    detector parameters are unchanged since the last run; otherwise the state of the
+    (new or already running) job, to be polled via plagiarism_jobs.get_job.
+    With summary=True a stored report comes back without its pairs (see plagiarism_jobs.summarize).
+
+    With a time_budget (seconds) the run stops fingerprinting or scoring when the budget is
+    spent and stores an incomplete report, keeping the fingerprints built so far; the next
+    call picks up where it stopped (unless force is set).
+    """
+    entries = collect_plagiarism_entries(projectid, submission_repository, user_repository, project_repository)
+    base = project_plagiarism_base(projectid, project_repository, entries, language)
+    params = {"language": (language or "").strip().lower(), "base": base_digest(base)}
+    key = plagiarism_jobs.report_key(projectid, entries, params)
+
+    resume = None
+    if not force:
+        if summary:
+            # The summary is stored on its own, so the pairs are not loaded just to be dropped.
+            stored = plagiarism_jobs.load_summary(key)
+            if stored is not None and stored.get("complete", True):
+                return dict(stored, job_id=key, status="done", stage="done", progress=1.0)
+        report = plagiarism_jobs.load_report(key)
+        if report is not None and report.get("complete", True):
+            report = plagiarism_jobs.summarize(report) if summary else plagiarism_jobs.public_report(report)
+            return dict(report, job_id=key, status="done", stage="done", progress=1.0)
+        if report is not None:
+            resume = report.get("resume")
+
+    def run(progress):
+        fingerprints = {} if force else plagiarism_jobs.load_fingerprints(key)
+        result = detect_plagiarism(
+            entries, language=language, progress=progress, base=base, time_budget=time_budget, resume=resume,
+            fingerprints=fingerprints,
+        )
+        if result.get("complete", True):
+            plagiarism_jobs.drop_fingerprints(key)
+        else:
+            plagiarism_jobs.save_fingerprints(key, fingerprints)
+        return result
+
+    return plagiarism_jobs.submit(key, projectid, run)
+
+
+def start_plagiarism_index_job(
+    projectid: int,
+    entries: List[Dict[str, Any]],
+    language: Optional[str] = None,
+    base: Optional[Dict[str, Any]] = None,
+    digest: str = "",
+) -> Dict[str, Any]:
+    """
+    (Re)build the project's incremental index (plagiarism_index.rebuild_index) as a background
+    job instead of inside the request. The job's report is the index report once it is built;
+    returns the state of the (new or already running) job, to be polled via plagiarism_jobs.get_job.
+    """
+    params = {"index": True, "language": (language or "").strip().lower(), "base": digest}
+    key = plagiarism_jobs.report_key(projectid, entries, params)
+
+    def run(progress):
+        progress("indexing", 0.0)
+        plagiarism_index.rebuild_index(projectid, entries, language=language, base=base)
+        return plagiarism_index.get_index_report(projectid)
+
+    return plagiarism_jobs.submit(key, projectid, run)
+
+
+def project_lineage(projectid: int, project_repository: ProjectRepository, lineage: Optional[str] = None) -> str:
+    if lineage:
+        return lineage
+    proj = project_repository.get_selected_project(int(projectid))
+    return plagiarism_history.lineage_for(proj.ClassId, proj.Name)
+
+
+def start_history_archive_job(
+    projectid: int,
+    submission_repository: SubmissionRepository,
+    user_repository: UserRepository,
+    project_repository: ProjectRepository,
+    lineage: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Archive a (past) project's latest submissions into its lineage's history index, in the background.
+    """
+    proj = project_repository.get_selected_project(int(projectid))
+    language = (getattr(proj, "Language", "") or "").strip().lower()
+    lineage = project_lineage(projectid, project_repository, lineage)
+    term = proj.Start.isoformat() if getattr(proj, "Start", None) else ""
+    entries = collect_plagiarism_entries(projectid, submission_repository, user_repository, project_repository)
+    base = project_plagiarism_base(projectid, project_repository, entries, language)
+    key = plagiarism_jobs.report_key(projectid, entries, {"kind": "archive", "lineage": lineage, "base": base_digest(base)})
+
+    def run(progress):
+        progress("archiving", 0.0)
+        return plagiarism_history.archive_project(lineage, projectid, entries, language, term=term, base=base)
+
+    return plagiarism_jobs.submit(key, projectid, run)
+
+
+def start_history_job(
+    projectid: int,
+    submission_repository: SubmissionRepository,
+    user_repository: UserRepository,
+    project_repository: ProjectRepository,
+    lineage: Optional[str] = None,
+    force: bool = False,
+) -> Dict[str, Any]:
+    """
+    Background comparison of the project's latest submissions against its archived lineage.
+    Same stored-report / job semantics as start_plagiarism_job.
+    """
+    proj = project_repository.get_selected_project(int(projectid))
+    language = (getattr(proj, "Language", "") or "").strip().lower()
+    lineage = project_lineage(projectid, project_repository, lineage)
+    entries = collect_plagiarism_entries(projectid, submission_repository, user_repository, project_repository)
+    base = project_plagiarism_base(projectid, project_repository, entries, language)
+    params = {
+        "kind": "history",
+        "lineage": lineage,
+        "language": language,
+        "base": base_digest(base),
+        "history": plagiarism_history.history_signature(lineage),
+    }
+    key = plagiarism_jobs.report_key(projectid, entries, params)
+
+    if not force:
+        report = plagiarism_jobs.load_report(key)
+        if report is not None:
+            return dict(report, job_id=key, status="done", stage="done", progress=1.0)
+
+    def run(progress):
+        return plagiarism_history.query_history(
+            lineage, entries, language, exclude_project_id=projectid, progress=progress, base=base
+        )
+
+    return plagiarism_jobs.submit(key, projectid, run)
+
+
+def project_plagiarism_base(
+    projectid: int,
+    project_repository: ProjectRepository,
+    entries: Optional[List[Dict[str, Any]]] = None,
+    language: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Fingerprint of the teacher solution and additional files, so code every student was
+    given does not count as shared between students.
+    """
+    return project_plagiarism_base_digest(projectid, project_repository, entries, language)[0]
+
+
+def project_plagiarism_base_digest(
+    projectid: int,
+    project_repository: ProjectRepository,
+    entries: Optional[List[Dict[str, Any]]] = None,
+    language: Optional[str] = None,
+) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    (base fingerprint, base_digest) of the project's teacher code. Both are stored per
+    solution version (see plagiarism_index.load_base), so the teacher's files are only
+    fingerprinted again after edit_project changes them. Without entries the language
+    falls back to the project's Language.
+    """
+    try:
+        proj = project_repository.get_selected_project(int(projectid))
+    except Exception:
+        return None, ""
+    if not proj:
+        return None, ""
+    root = getattr(proj, "solutionpath", "") or ""
+    additional = getattr(proj, "AdditionalFilePath", "") or ""
+    if entries is None:
+        language = language or getattr(proj, "Language", None)
+    lang = resolve_language(entries or [], language)
+    solution_version = (root, additional, lang)
+    stored = plagiarism_index.load_base(projectid, solution_version)
+    if stored is not None:
+        return stored
+
+    try:
+        extra = json.loads(project_repository.expand_additional_paths(additional, root))
+    except Exception:
+        extra = []
+    base = build_base_fingerprint([root] + list(extra or []), lang=lang)
+    try:
+        digest = plagiarism_index.store_base(projectid, solution_version, base)
+    except OSError:
+        digest = base_digest(base)
+    return base, digest
+
+
+@read_replica()
+def collect_plagiarism_entries(
+    projectid: int,
+    submission_repository: SubmissionRepository,
+    user_repository: UserRepository,
+    project_repository: ProjectRepository,
+) -> List[Dict[str, Any]]:
+    """
+    Latest main submission of every student in the project's class, as detector file entries.
+    """
     class_name = project_repository.get_className_by_projectId(projectid)
     class_id = project_repository.get_class_id_by_name(class_name)
     users = user_repository.get_all_users_by_cid(class_id)
@@ -28,32 +250,60 @@ def run_local_plagiarism(
 
     # Build a list of file entries with metadata for reporting/links
     entries: List[Dict[str, Any]] = []
-    # Build a quick lookup for user names
-    name_map: Dict[int, str] = {}
-    for u in users:
-        first = getattr(u, 'Firstname', None) or getattr(u, 'Fname', '')
-        last  = getattr(u, 'Lastname',  None) or getattr(u, 'Lname',  '')
-        name_map[u.Id] = (f"{first} {last}".strip() or f"User {u.Id}")
-
     for u in users:
         if u.Id in bucket:
-            sub = bucket[u.Id]
-            fp = sub.CodeFilepath
-            if os.path.isdir(fp):
-                files = [f for f in os.listdir(fp) if f.endswith((".py", ".java", ".c", ".cpp"))]
-                pick = "Main.java" if "Main.java" in files else (files[0] if files else None)
-                if pick:
-                    fp = os.path.join(fp, pick)
-            entries.append({
-                "user_id": u.Id,
-                "name": name_map.get(u.Id, f"User {u.Id}"),
-                "class_id": str(class_id),
-                "submission_id": getattr(sub, "Id", getattr(sub, "SubmissionId", -1)),
-                "filepath": fp,
-            })
-
-    result = detect_plagiarism(entries, language=language)
-    return result
+            entries.append(submission_entry(u, bucket[u.Id], class_id))
+    return entries
+
+
+def submission_entry(user: Any, sub: Any, class_id: Any) -> Dict[str, Any]:
+    """
+    Detector file entry for one submission. Shared by batch runs and the incremental index
+    so both fingerprint exactly the same file.
+    """
+    first = getattr(user, 'Firstname', None) or getattr(user, 'Fname', '')
+    last  = getattr(user, 'Lastname',  None) or getattr(user, 'Lname',  '')
+    return {
+        "user_id": user.Id,
+        "name": (f"{first} {last}".strip() or f"User {user.Id}"),
+        "class_id": str(class_id),
+        "submission_id": getattr(sub, "Id", getattr(sub, "SubmissionId", -1)),
+        "filepath": submission_source_path(sub),
+    }
+
+
+def submission_source_path(sub: Any) -> str:
+    fp = sub.CodeFilepath
+    if os.path.isdir(fp):
+        files = [f for f in os.listdir(fp) if f.endswith((".py", ".java", ".c", ".cpp"))]
+        pick = "Main.java" if "Main.java" in files else (files[0] if files else None)
+        if pick:
+            fp = os.path.join(fp, pick)
+    return fp
+
+
+def plagiarism_pair_detail(
+    submission_a: int,
+    submission_b: int,
+    submission_repository: SubmissionRepository,
+) -> Optional[Dict[str, Any]]:
+    """
+    All matched regions between two submissions (see matched_regions), cached per pair.
+    Submissions never change once stored, so cached entries stay valid until the detector changes.
+    """
+    cached = plagiarism_jobs.load_pair_detail(submission_a, submission_b)
+    if cached is not None:
+        return cached
+
+    sub_a = submission_repository.get_submission_by_submission_id(int(submission_a))
+    sub_b = submission_repository.get_submission_by_submission_id(int(submission_b))
+    if sub_a is None or sub_b is None:
+        return None
+
+    detail = matched_regions(submission_source_path(sub_a), submission_source_path(sub_b))
+    detail.update(a={"submission_id": int(submission_a)}, b={"submission_id": int(submission_b)})
+    plagiarism_jobs.save_pair_detail(submission_a, submission_b, detail)
+    return detail
 
 
 def all_submissions(
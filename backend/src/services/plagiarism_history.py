@@ -0,0 +1,259 @@
+"""
+Cross-term plagiarism checks against archived submissions.
+
+Submissions from past offerings of an assignment are archived into an on-disk, sharded
+fingerprint index per assignment lineage (same class + same assignment name, any term).
+Current submissions are compared against it one shard at a time, so memory stays bounded
+by SHARD_SIZE no matter how many terms have been archived.
+
+Layout on disk:
+  <HISTORY_ROOT>/<lineage>/
+    manifest.json        shard list + archived project/submission ids
+    shard-00000.pkl      up to SHARD_SIZE fingerprints + per-shard LSH tables
+    .lock                advisory lock shared by all gunicorn workers
+"""
+
+import fcntl
+import json
+import os
+import pickle
+import re
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from datasketch import LeanMinHash, MinHashLSH
+
+from src.plagiarism_detector import build_fingerprints, minhash_of, pair_sort_key, pick, resolve_language, score_pair
+
+HISTORY_ROOT = "/tabot-files/project-files/plagiarism-history"
+
+# Bump whenever fingerprint contents change; older lineages must then be re-archived.
+HISTORY_VERSION = 2
+
+SHARD_SIZE = 500
+TOKEN_SHINGLE_SIZE = 5
+MINHASH_PERM = 128
+REPORT_THRESHOLD = 0.60
+# Keep only the strongest historical matches per current submission.
+MAX_HITS_PER_SUBMISSION = 5
+
+LSH_CHANNELS = ("lex", "struct", "ast")
+
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+_LINEAGE_RE = re.compile(r"^[a-z0-9][a-z0-9-]{0,127}$")
+
+
+def lineage_for(class_id: Any, project_name: str) -> str:
+    """
+    Default lineage: the same class and the same assignment name in any term,
+    e.g. class 3 / "Lab 4 - Loops" -> "3-lab-4-loops".
+    """
+    slug = _SLUG_RE.sub("-", str(project_name or "").lower()).strip("-") or "project"
+    return f"{int(class_id)}-{slug}"[:128]
+
+
+def is_valid_lineage(lineage: str) -> bool:
+    return bool(_LINEAGE_RE.match(lineage or ""))
+
+
+def _lineage_dir(lineage: str) -> str:
+    if not is_valid_lineage(lineage):
+        raise ValueError(f"invalid lineage: {lineage!r}")
+    return os.path.join(HISTORY_ROOT, lineage)
+
+
+@contextmanager
+def _locked(root: str) -> Iterator[None]:
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".lock"), "a+") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _load_manifest(root: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(root, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == HISTORY_VERSION:
+            return manifest
+    except Exception:
+        pass
+    return {"version": HISTORY_VERSION, "shards": [], "projects": [], "submissions": []}
+
+
+def _save_manifest(root: str, manifest: Dict[str, Any]) -> None:
+    _write_atomic(os.path.join(root, "manifest.json"), json.dumps(manifest).encode("utf-8"))
+
+
+def _load_shard(root: str, name: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(root, name), "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def _channel_minhashes(fp: Dict[str, Any]) -> Dict[str, LeanMinHash]:
+    # Lean hashes are ~5x smaller on disk and are all the LSH query needs.
+    return {
+        "lex": LeanMinHash(fp["minhash"]),
+        "struct": LeanMinHash(minhash_of(fp["struct_shingles"], MINHASH_PERM)),
+        "ast": LeanMinHash(minhash_of(fp["ast"], MINHASH_PERM)),
+    }
+
+
+def _new_shard() -> Dict[str, Any]:
+    return {
+        "docs": [],
+        "lsh": {ch: MinHashLSH(threshold=REPORT_THRESHOLD, num_perm=MINHASH_PERM) for ch in LSH_CHANNELS},
+    }
+
+
+def history_signature(lineage: str) -> Dict[str, Any]:
+    """
+    Small summary of what is archived; part of the stored report key for history runs.
+    """
+    manifest = _load_manifest(_lineage_dir(lineage))
+    return {"projects": sorted(manifest["projects"]), "submissions": len(manifest["submissions"])}
+
+
+def archive_project(
+    lineage: str,
+    project_id: int,
+    entries: List[Dict[str, Any]],
+    language: Optional[str],
+    term: str = "",
+    base: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Add a (past) project's latest submissions to the lineage's history index.
+    Idempotent: submissions that were archived before are skipped.
+    `base` is that project's teacher-code fingerprint, removed before storing.
+    """
+    root = _lineage_dir(lineage)
+    with _locked(root):
+        manifest = _load_manifest(root)
+        known: Set[int] = set(manifest["submissions"])
+        todo = [e for e in entries if int(e["submission_id"]) not in known]
+
+        fps = build_fingerprints(
+            todo, lang=resolve_language(todo, language), token_shingle_size=TOKEN_SHINGLE_SIZE, minhash_perm=MINHASH_PERM, base=base
+        )
+
+        # Top up the last shard first, then start new ones.
+        shard_name: Optional[str] = None
+        shard: Optional[Dict[str, Any]] = None
+        if manifest["shards"] and manifest["shards"][-1]["count"] < SHARD_SIZE:
+            shard_name = manifest["shards"][-1]["file"]
+            shard = _load_shard(root, shard_name)
+
+        def flush() -> None:
+            if shard is None or shard_name is None:
+                return
+            _write_atomic(os.path.join(root, shard_name), pickle.dumps(shard, protocol=pickle.HIGHEST_PROTOCOL))
+            for s in manifest["shards"]:
+                if s["file"] == shard_name:
+                    s["count"] = len(shard["docs"])
+                    break
+            else:
+                manifest["shards"].append({"file": shard_name, "count": len(shard["docs"])})
+
+        for e, fp in zip(todo, fps):
+            if shard is None or len(shard["docs"]) >= SHARD_SIZE:
+                flush()
+                shard_name = f"shard-{len(manifest['shards']):05d}.pkl"
+                shard = _new_shard()
+            key = str(len(shard["docs"]))
+            meta = dict(pick(e, "user_id", "name", "class_id", "submission_id"), project_id=int(project_id), term=term)
+            shard["docs"].append({
+                "meta": meta,
+                "lex_tokens": fp["lex_tokens"],
+                "lex_shingles": fp["lex_shingles"],
+                "struct_shingles": fp["struct_shingles"],
+                "ast": fp["ast"],
+            })
+            for ch, mh in _channel_minhashes(fp).items():
+                shard["lsh"][ch].insert(key, mh)
+            known.add(int(e["submission_id"]))
+        flush()
+
+        if int(project_id) not in manifest["projects"]:
+            manifest["projects"].append(int(project_id))
+        manifest["submissions"] = sorted(known)
+        _save_manifest(root, manifest)
+
+    return {"lineage": lineage, "archived": len(todo), "total": len(known)}
+
+
+def query_history(
+    lineage: str,
+    entries: List[Dict[str, Any]],
+    language: Optional[str],
+    exclude_project_id: Optional[int] = None,
+    progress: Optional[Any] = None,
+    base: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Compare current submissions against every archived shard of the lineage, one shard in
+    memory at a time.
+
+    Returns:
+      {
+        'lineage': str,
+        'pairs': [{'a': current submission, 'b': archived submission (+project_id, term),
+                   'similarity_token': float, 'similarity_ast': float}, ...]
+      }
+    """
+    root = _lineage_dir(lineage)
+    manifest = _load_manifest(root)
+    fps = build_fingerprints(
+        entries, lang=resolve_language(entries, language), token_shingle_size=TOKEN_SHINGLE_SIZE, minhash_perm=MINHASH_PERM, base=base
+    )
+    mhs = [_channel_minhashes(fp) for fp in fps]
+
+    hits: List[List[Dict[str, Any]]] = [[] for _ in entries]
+    shards = manifest["shards"]
+    for s_idx, s in enumerate(shards):
+        if progress is not None:
+            progress("history", s_idx / max(1, len(shards)))
+        shard = _load_shard(root, s["file"])
+        if shard is None:
+            continue
+        for i, fp in enumerate(fps):
+            candidates: Set[str] = set()
+            for ch in LSH_CHANNELS:
+                candidates.update(shard["lsh"][ch].query(mhs[i][ch]))
+            for key in candidates:
+                doc = shard["docs"][int(key)]
+                meta = doc["meta"]
+                if exclude_project_id is not None and meta.get("project_id") == int(exclude_project_id):
+                    continue
+                token_sim, ast_sim = score_pair(fp, doc)
+                if max(token_sim, ast_sim) < REPORT_THRESHOLD:
+                    continue
+                hits[i].append({
+                    "a": pick(entries[i], "user_id", "name", "class_id", "submission_id"),
+                    "b": dict(meta),
+                    "similarity_token": float(token_sim),
+                    "similarity_ast": float(ast_sim),
+                })
+            # Bound memory per submission while streaming through shards.
+            hits[i].sort(key=pair_sort_key, reverse=True)
+            del hits[i][MAX_HITS_PER_SUBMISSION:]
+        del shard
+
+    pairs = [h for per_sub in hits for h in per_sub]
+    pairs.sort(key=pair_sort_key, reverse=True)
+    if progress is not None:
+        progress("history", 1.0)
+    return {"lineage": lineage, "pairs": pairs}
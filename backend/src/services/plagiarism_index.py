@@ -0,0 +1,374 @@
+"""
+Persistent, incrementally updated plagiarism index (one per project).
+
+Layout on disk:
+  <INDEX_ROOT>/<project_id>/
+    lsh.pkl       LSH tables (lexical, structural, AST) + metadata of indexed submissions
+    fp/<uid>.pkl  fingerprint of each student's latest submission
+    pairs.json    continuously updated pair table (what the admin report reads)
+    base.pkl      fingerprint + digest of the teacher's code, per solution version
+    .lock         advisory lock shared by all gunicorn workers
+
+Every new latest submission is fingerprinted once, queried against the LSH tables for
+candidates, scored against those candidates only, then inserted. Pairs involving that
+student are replaced, so the pair table always reflects everyone's latest submission.
+Uploads only queue the submission (queue_submission); the update runs on the plagiarism
+job executor, and uploads that arrive while one is pending are applied together.
+
+Candidate channels differ from a batch run (detect_plagiarism): the index finds candidates
+with MinHash LSH over lexical, structural and AST shingles only. The batch detector's
+winnowing and character TF-IDF channels are not used here, because TF-IDF weights depend
+on document frequencies across the whole class. A pair that only those channels would
+surface (e.g. heavily reformatted copies with low shingle overlap) shows up in a batch
+run but not in this table.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from datasketch import MinHashLSH
+
+from src.plagiarism_detector import (
+    base_digest,
+    build_fingerprint,
+    build_fingerprints,
+    collusion_groups,
+    minhash_of,
+    pair_record,
+    pair_sort_key,
+    resolve_language,
+    score_pair,
+)
+from src.services import plagiarism_jobs
+
+INDEX_ROOT = "/tabot-files/project-files/plagiarism-index"
+
+# Bump whenever fingerprint contents or scoring change so stale indexes are rebuilt instead of mixed.
+INDEX_VERSION = 4
+
+TOKEN_SHINGLE_SIZE = 5
+MINHASH_PERM = 128
+REPORT_THRESHOLD = 0.60
+# Same score the admin UI ranks by: mean of token and AST similarity.
+ALERT_THRESHOLD = 0.75
+
+LSH_CHANNELS = ("lex", "struct", "ast")
+
+# project id -> {user id: entry} queued by uploads and not yet applied (per process).
+_pending: Dict[int, Dict[str, Dict[str, Any]]] = {}
+_pending_lock = threading.Lock()
+
+
+def project_index_dir(project_id: int) -> str:
+    return os.path.join(INDEX_ROOT, str(int(project_id)))
+
+
+def index_exists(project_id: int, digest: str = "") -> bool:
+    """
+    True if a current index exists that was built with the base (teacher-code) fingerprint
+    of this digest (see base_digest).
+    """
+    state = _load_state(project_index_dir(project_id))
+    return state is not None and state.get("base_digest", "") == digest
+
+
+def load_base(project_id: int, solution_version: Tuple[Any, ...]) -> Optional[Tuple[Optional[Dict[str, Any]], str]]:
+    """
+    Stored (base fingerprint, digest) of the project's teacher code, or None when nothing
+    is stored for this solution version (solution path, additional files, language).
+    """
+    try:
+        with open(os.path.join(project_index_dir(project_id), "base.pkl"), "rb") as f:
+            stored = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(stored, dict) or stored.get("version") != INDEX_VERSION:
+        return None
+    if stored.get("solution_version") != tuple(solution_version):
+        return None
+    return stored["base"], stored["digest"]
+
+
+def store_base(project_id: int, solution_version: Tuple[Any, ...], base: Optional[Dict[str, Any]]) -> str:
+    """
+    Remember the base fingerprint of a solution version. Returns its digest.
+    """
+    digest = base_digest(base)
+    root = project_index_dir(project_id)
+    os.makedirs(root, exist_ok=True)
+    payload = {
+        "version": INDEX_VERSION,
+        "solution_version": tuple(solution_version),
+        "base": base,
+        "digest": digest,
+    }
+    _write_atomic(os.path.join(root, "base.pkl"), pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+    return digest
+
+
+def forget_base(project_id: int) -> None:
+    """
+    Drop the stored base fingerprint, e.g. after the teacher's files were edited in place.
+    """
+    try:
+        os.remove(os.path.join(project_index_dir(project_id), "base.pkl"))
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def _locked(root: str) -> Iterator[None]:
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".lock"), "a+") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _fresh_state(language: str, base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {
+        "version": INDEX_VERSION,
+        "language": language,
+        # Teacher-provided code removed from every fingerprint (see build_base_fingerprint)
+        "base": base,
+        "base_digest": base_digest(base),
+        "docs": {},
+        "lsh": {ch: MinHashLSH(threshold=REPORT_THRESHOLD, num_perm=MINHASH_PERM) for ch in LSH_CHANNELS},
+    }
+
+
+def _load_state(root: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(root, "lsh.pkl"), "rb") as f:
+            state = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(state, dict) or state.get("version") != INDEX_VERSION:
+        return None
+    return state
+
+
+def _save_state(root: str, state: Dict[str, Any]) -> None:
+    _write_atomic(os.path.join(root, "lsh.pkl"), pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _load_pairs(root: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(os.path.join(root, "pairs.json"), "r", encoding="utf-8") as f:
+            return (json.load(f) or {}).get("pairs", {}) or {}
+    except Exception:
+        return {}
+
+
+def _save_pairs(root: str, pairs: Dict[str, Dict[str, Any]]) -> None:
+    payload = {"updated_at": datetime.now().isoformat(timespec="seconds"), "pairs": pairs}
+    _write_atomic(os.path.join(root, "pairs.json"), json.dumps(payload).encode("utf-8"))
+
+
+def _fp_path(root: str, key: str) -> str:
+    return os.path.join(root, "fp", f"{key}.pkl")
+
+
+def _load_fingerprint(root: str, key: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_fp_path(root, key), "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def _save_fingerprint(root: str, key: str, fp: Dict[str, Any]) -> None:
+    os.makedirs(os.path.join(root, "fp"), exist_ok=True)
+    _write_atomic(_fp_path(root, key), pickle.dumps(fp, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _pair_key(a: str, b: str) -> str:
+    lo, hi = sorted((a, b), key=int)
+    return f"{lo}:{hi}"
+
+
+def _channel_minhashes(fp: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "lex": fp["minhash"],
+        "struct": minhash_of(fp["struct_shingles"], MINHASH_PERM),
+        "ast": minhash_of(fp["ast"], MINHASH_PERM),
+    }
+
+
+def _upsert(
+    root: str,
+    state: Dict[str, Any],
+    pairs: Dict[str, Dict[str, Any]],
+    entry: Dict[str, Any],
+    fp: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Insert (or replace) one student's latest submission. Returns pairs that newly crossed
+    ALERT_THRESHOLD with this insert.
+    """
+    key = str(int(entry["user_id"]))
+    if fp is None:
+        fp = build_fingerprint(
+            entry, lang=state["language"], token_shingle_size=TOKEN_SHINGLE_SIZE, minhash_perm=MINHASH_PERM, base=state["base"]
+        )
+    mhs = _channel_minhashes(fp)
+
+    # Drop the student's previous submission from every LSH table and the pair table.
+    previous: Dict[str, Dict[str, Any]] = {}
+    for ch in LSH_CHANNELS:
+        if key in state["lsh"][ch]:
+            state["lsh"][ch].remove(key)
+    for pk in [pk for pk in pairs if key in pk.split(":")]:
+        previous[pk] = pairs.pop(pk)
+
+    candidates: Set[str] = set()
+    for ch in LSH_CHANNELS:
+        candidates.update(state["lsh"][ch].query(mhs[ch]))
+    candidates.discard(key)
+
+    now = datetime.now().isoformat(timespec="seconds")
+    alerts: List[Dict[str, Any]] = []
+    for other in sorted(candidates, key=int):
+        other_meta = state["docs"].get(other)
+        other_fp = _load_fingerprint(root, other)
+        if other_meta is None or other_fp is None:
+            continue
+        token_sim, ast_sim = score_pair(fp, other_fp)
+        if max(token_sim, ast_sim) < REPORT_THRESHOLD:
+            continue
+        a_entry, b_entry = (entry, other_meta) if int(key) < int(other) else (other_meta, entry)
+        record = pair_record(a_entry, b_entry, token_sim, ast_sim)
+        record["updated_at"] = now
+        record["flagged_at"] = None
+        pk = _pair_key(key, other)
+        if (token_sim + ast_sim) / 2 >= ALERT_THRESHOLD:
+            record["flagged_at"] = (previous.get(pk) or {}).get("flagged_at") or now
+            if record["flagged_at"] == now:
+                alerts.append(record)
+        pairs[pk] = record
+
+    for ch in LSH_CHANNELS:
+        state["lsh"][ch].insert(key, mhs[ch])
+    state["docs"][key] = {k: entry.get(k) for k in ("user_id", "name", "class_id", "submission_id", "filepath")}
+    _save_fingerprint(root, key, fp)
+    return alerts
+
+
+def queue_submission(project_id: int, entry: Dict[str, Any], logger: Optional[logging.Logger] = None) -> None:
+    """
+    Upload-time hook: queue a new latest submission for the project's index and return
+    at once. The update runs in the background (see index_submissions); failures and newly
+    flagged pairs are reported to `logger`.
+    """
+    pid = int(project_id)
+    with _pending_lock:
+        scheduled = pid in _pending
+        _pending.setdefault(pid, {})[str(int(entry["user_id"]))] = entry
+    if not scheduled:
+        plagiarism_jobs.run_in_background(
+            lambda: _apply_pending(pid, logger), logger, f"index update of project {pid}"
+        )
+
+
+def _apply_pending(project_id: int, logger: Optional[logging.Logger]) -> None:
+    with _pending_lock:
+        entries = list(_pending.pop(project_id, {}).values())
+    if entries:
+        index_submissions(project_id, entries, logger=logger)
+
+
+def index_submissions(
+    project_id: int,
+    entries: List[Dict[str, Any]],
+    logger: Optional[logging.Logger] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Insert new latest submissions into the project's index and update the pair table,
+    saving both once. Returns newly flagged high-similarity pairs.
+
+    If the project has no index yet, nothing is done; the first report request bootstraps it.
+    """
+    root = project_index_dir(project_id)
+    if not os.path.exists(os.path.join(root, "lsh.pkl")):
+        return []
+    with _locked(root):
+        state = _load_state(root)
+        if state is None:
+            return []
+        pairs = _load_pairs(root)
+        alerts: List[Dict[str, Any]] = []
+        for entry in entries:
+            alerts.extend(_upsert(root, state, pairs, entry))
+        _save_state(root, state)
+        _save_pairs(root, pairs)
+    log = logger or logging.getLogger(__name__)
+    for a in alerts:
+        log.warning(
+            f"[plagiarism] project {project_id}: new high-similarity pair "
+            f"{a['a'].get('submission_id')} / {a['b'].get('submission_id')}"
+        )
+    return alerts
+
+
+def rebuild_index(
+    project_id: int,
+    entries: List[Dict[str, Any]],
+    language: Optional[str] = None,
+    base: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    (Re)build a project's index from scratch, e.g. on first use, after INDEX_VERSION changes
+    or when the teacher's solution/additional files changed.
+    """
+    root = project_index_dir(project_id)
+    with _locked(root):
+        old_pairs = _load_pairs(root)
+        state = _fresh_state(resolve_language(entries, language), base)
+        fps = build_fingerprints(
+            entries, lang=state["language"], token_shingle_size=TOKEN_SHINGLE_SIZE, minhash_perm=MINHASH_PERM, base=base
+        )
+        pairs: Dict[str, Dict[str, Any]] = {}
+        for e, fp in zip(entries, fps):
+            _upsert(root, state, pairs, e, fp)
+        # Keep the original flag time for pairs that were already flagged before the rebuild.
+        for pk, rec in pairs.items():
+            prev = (old_pairs.get(pk) or {}).get("flagged_at")
+            if prev and rec.get("flagged_at"):
+                rec["flagged_at"] = prev
+        _save_state(root, state)
+        _save_pairs(root, pairs)
+
+
+def get_index_report(project_id: int, since: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Cheap read of the pair table.
+
+    Returns:
+      {
+        'pairs': [...same shape as detect_plagiarism pairs, plus updated_at/flagged_at...],
+        'alerts': [...pairs flagged at or after `since` (all flagged pairs if omitted)...],
+        'groups': [...collusion groups over the pairs, see collusion_groups()...],
+      }
+    """
+    root = project_index_dir(project_id)
+    pairs = list(_load_pairs(root).values())
+    pairs.sort(key=pair_sort_key, reverse=True)
+    alerts = [p for p in pairs if p.get("flagged_at") and (not since or p["flagged_at"] >= since)]
+    alerts.sort(key=lambda p: p["flagged_at"], reverse=True)
+    return {"pairs": pairs, "alerts": alerts, "groups": collusion_groups(pairs)}
@@ -0,0 +1,328 @@
+"""
+Background plagiarism runs and persisted reports.
+
+A run is identified by a key hashed from (project, latest submission ids, detector parameters).
+The same key is used as the job id and as the stored report name, so:
+  - an unchanged class gets its stored report back without running anything, and
+  - two admins opening the same project share one job instead of starting two.
+
+Job state lives on disk (not in process memory) so any gunicorn worker can answer a poll.
+
+Layout on disk:
+  <JOBS_ROOT>/jobs/<key>.json      status / stage / progress / error of the latest run
+  <JOBS_ROOT>/reports/<key>.json   finished detector output
+  <JOBS_ROOT>/reports/<key>.ndjson the same report as summary + sorted pair lines (stream_report)
+  <JOBS_ROOT>/pairs/<a>-<b>-v<N>.json   matched regions of one pair, computed on demand
+  <JOBS_ROOT>/fingerprints/<key>.pkl   fingerprints of an incomplete (time-budgeted) run,
+                                       reused when it is resumed
+
+Large reports are read as a summary (everything but the pairs) plus an NDJSON stream of
+the pairs, strongest first (see stream_report).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from src.plagiarism_detector import DETECTOR_VERSION, pair_score
+
+JOBS_ROOT = "/tabot-files/project-files/plagiarism-jobs"
+
+# A queued/running job whose state has not been touched for this long is assumed dead
+# (e.g. the worker that owned it was restarted) and may be resubmitted.
+STALE_SECONDS = 15 * 60
+
+# Progress is written at most this often; polling does not need finer resolution.
+PROGRESS_WRITE_INTERVAL = 1.0
+
+# Runs use a process pool internally, so one or two at a time per worker is plenty.
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="plagiarism")
+
+_log = logging.getLogger(__name__)
+
+_KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def report_key(project_id: int, entries: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    payload = {
+        "project_id": int(project_id),
+        "submissions": sorted(int(e["submission_id"]) for e in entries),
+        "params": params,
+        "detector_version": DETECTOR_VERSION,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def is_valid_key(key: str) -> bool:
+    return bool(_KEY_RE.match(key or ""))
+
+
+def _path(kind: str, key: str) -> str:
+    return os.path.join(JOBS_ROOT, kind, f"{key}.json")
+
+
+def _read(kind: str, key: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_path(kind, key), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _write(kind: str, key: str, data: Dict[str, Any]) -> None:
+    path = _path(kind, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def load_report(key: str) -> Optional[Dict[str, Any]]:
+    return _read("reports", key)
+
+
+def public_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A report as returned to clients: without the anytime-mode resume state.
+    """
+    return {k: v for k, v in report.items() if k != "resume"}
+
+
+def summarize(report: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A report without its pair list (groups, lineage, ...), plus the number of pairs.
+    """
+    out = {k: v for k, v in public_report(report).items() if k != "pairs"}
+    out["pair_count"] = len(report.get("pairs") or [])
+    return out
+
+
+def _stream_path(key: str) -> str:
+    return os.path.join(JOBS_ROOT, "reports", f"{key}.ndjson")
+
+
+def _stream_order(pair: Dict[str, Any]) -> Any:
+    return (pair_score(pair), pair["similarity_ast"], pair["similarity_token"])
+
+
+def _write_stream(key: str, report: Dict[str, Any]) -> None:
+    """
+    Store the report as the NDJSON stream_report serves: the summary line, then the pairs
+    already sorted, so requests only copy lines from disk.
+    """
+    path = _stream_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps(dict(summarize(report), type="summary", job_id=key)) + "\n")
+        for pair in sorted(report.get("pairs") or [], key=_stream_order, reverse=True):
+            f.write(json.dumps(dict(pair, type="pair")) + "\n")
+    os.replace(tmp, path)
+
+
+def load_summary(key: str) -> Optional[Dict[str, Any]]:
+    """
+    summarize() of a stored report, read from the first line of its stream file so the
+    pairs are not loaded.
+    """
+    try:
+        with open(_stream_path(key), "r", encoding="utf-8") as f:
+            line = json.loads(f.readline())
+    except Exception:
+        report = load_report(key)
+        return summarize(report) if report is not None else None
+    return {k: v for k, v in line.items() if k not in ("type", "job_id")}
+
+
+def stream_report(key: str) -> Optional[Iterator[str]]:
+    """
+    NDJSON lines for a finished report: one {"type": "summary", ...} line, then one
+    {"type": "pair", ...} line per pair in descending pair_score (the order the admin UI
+    lists pairs in). The lines are written, sorted, when the job finishes (reports stored
+    before that are converted on first read) and are streamed from disk as they are read.
+    """
+    path = _stream_path(key)
+    if not os.path.exists(path):
+        report = load_report(key)
+        if report is None:
+            return None
+        _write_stream(key, report)
+    try:
+        fh = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+    def lines() -> Iterator[str]:
+        with fh:
+            yield from fh
+
+    return lines()
+
+
+def _pair_detail_key(submission_a: int, submission_b: int) -> str:
+    # One entry per unordered pair: it is stored with the lower submission id as side a.
+    lo, hi = sorted((int(submission_a), int(submission_b)))
+    return f"{lo}-{hi}-v{DETECTOR_VERSION}"
+
+
+def _swap_sides(detail: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The same pair detail seen from the other submission: 'a' and 'b' exchanged at the top
+    level and in every region / fingerprint.
+    """
+    def swap(d: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(d, a=d.get("b"), b=d.get("a"))
+
+    def where(side: Dict[str, Any]) -> Any:
+        return (side.get("file", ""), side.get("start_line", 0))
+
+    out = swap(detail)
+    # Keep matched_regions' orders: regions longest first, fingerprints in order of side a.
+    if "regions" in detail:
+        out["regions"] = sorted((swap(r) for r in detail["regions"]), key=lambda r: (-r["tokens"], where(r["a"])))
+    if "fingerprints" in detail:
+        out["fingerprints"] = sorted((swap(f) for f in detail["fingerprints"]), key=lambda f: where(f["a"]))
+    return out
+
+
+def load_pair_detail(submission_a: int, submission_b: int) -> Optional[Dict[str, Any]]:
+    detail = _read("pairs", _pair_detail_key(submission_a, submission_b))
+    if detail is not None and int(submission_a) > int(submission_b):
+        detail = _swap_sides(detail)
+    return detail
+
+
+def save_pair_detail(submission_a: int, submission_b: int, detail: Dict[str, Any]) -> None:
+    if int(submission_a) > int(submission_b):
+        detail = _swap_sides(detail)
+    _write("pairs", _pair_detail_key(submission_a, submission_b), detail)
+
+
+def _fingerprints_path(key: str) -> str:
+    return os.path.join(JOBS_ROOT, "fingerprints", f"{key}.pkl")
+
+
+def load_fingerprints(key: str) -> Dict[int, Dict[str, Any]]:
+    """
+    submission_id -> fingerprint kept from an incomplete run with this key (empty if none).
+    """
+    try:
+        with open(_fingerprints_path(key), "rb") as f:
+            fps = pickle.load(f)
+    except Exception:
+        return {}
+    return fps if isinstance(fps, dict) else {}
+
+
+def save_fingerprints(key: str, fingerprints: Dict[int, Dict[str, Any]]) -> None:
+    path = _fingerprints_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, "wb") as f:
+        pickle.dump(fingerprints, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def drop_fingerprints(key: str) -> None:
+    try:
+        os.remove(_fingerprints_path(key))
+    except FileNotFoundError:
+        pass
+
+
+def get_job(key: str, include_pairs: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Job state for polling. Finished jobs include the report itself (only its summary
+    if include_pairs is False; the pairs are then read via stream_report).
+    """
+    job = _read("jobs", key)
+    if job is None:
+        report = load_report(key)
+        if report is None:
+            return None
+        job = {"job_id": key, "status": "done", "stage": "done", "progress": 1.0}
+    if job.get("status") == "done":
+        if include_pairs:
+            job = dict(job, **public_report(load_report(key) or {"pairs": []}))
+        else:
+            job = dict(job, **(load_summary(key) or summarize({"pairs": []})))
+    return job
+
+
+def run_in_background(fn: Callable[[], Any], logger: Optional[logging.Logger] = None, what: str = "task") -> None:
+    """
+    Run `fn()` on the plagiarism executor, off the request path. Failures are logged to
+    `logger` (pass current_app.logger from a request; the app context is gone by then).
+    """
+    log = logger or _log
+
+    def task() -> None:
+        try:
+            fn()
+        except Exception:
+            log.exception(f"[plagiarism] {what} failed")
+
+    _executor.submit(task)
+
+
+def _is_active(job: Optional[Dict[str, Any]]) -> bool:
+    if not job or job.get("status") not in ("queued", "running"):
+        return False
+    return time.time() - float(job.get("heartbeat", 0)) < STALE_SECONDS
+
+
+def submit(key: str, project_id: int, run: Callable[[Callable[[str, float], None]], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Start `run(progress)` in the background unless a live job with this key already exists.
+    `run` must not touch the request context (collect DB data before submitting).
+    """
+    existing = _read("jobs", key)
+    if _is_active(existing):
+        return existing
+
+    job = {
+        "job_id": key,
+        "project_id": int(project_id),
+        "status": "queued",
+        "stage": "queued",
+        "progress": 0.0,
+        "error": None,
+        "submitted_at": datetime.now().isoformat(timespec="seconds"),
+        "heartbeat": time.time(),
+    }
+    _write("jobs", key, job)
+    _executor.submit(_run_job, key, dict(job), run)
+    return job
+
+
+def _run_job(key: str, job: Dict[str, Any], run: Callable[[Callable[[str, float], None]], Dict[str, Any]]) -> None:
+    last_write = [0.0]
+
+    def progress(stage: str, fraction: float) -> None:
+        now = time.time()
+        if now - last_write[0] < PROGRESS_WRITE_INTERVAL and fraction < 1.0:
+            return
+        last_write[0] = now
+        job.update(status="running", stage=stage, progress=round(float(fraction), 3), heartbeat=now)
+        _write("jobs", key, job)
+
+    try:
+        progress("starting", 0.0)
+        result = run(progress)
+        _write("reports", key, result)
+        _write_stream(key, result)
+        job.update(status="done", stage="done", progress=1.0, heartbeat=time.time(),
+                   finished_at=datetime.now().isoformat(timespec="seconds"))
+    except Exception as e:
+        _log.exception(f"[plagiarism] job {key} (project {job.get('project_id')}) failed")
+        job.update(status="failed", error=str(e), heartbeat=time.time())
+    _write("jobs", key, job)
@@ -0,0 +1,198 @@
+"""
+Bulk roster import: create or update many students of one class in a single request.
+
+Input is a CSV file (header row) or a JSON list of objects, one student each, using the
+same field names as /api/auth/create: username, fname, lname, email, id (student number),
+lecture and lab. Lecture and lab may be given by id or by name within the class. A few
+spelled-out aliases (first_name, student_number, lab_id, ...) are accepted as well.
+
+The whole batch is validated before anything is written; if any row fails, nothing is
+imported and the report lists the problems per row. A valid batch is written by
+ClassRepository.upsert_roster in one transaction with multi-row INSERTs. If another
+request creates one of the accounts between validation and the write, the transaction
+is rolled back and the report is flagged as a conflict.
+"""
+
+import csv
+import io
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from src.constants import STUDENT_ROLE
+from src.repositories.class_repository import ClassRepository
+from src.repositories.user_repository import UserRepository
+
+# Upper bound on one import; a section is a few hundred students.
+MAX_ROWS = 2000
+
+FIELDS = ("username", "fname", "lname", "email", "id", "lecture", "lab")
+
+FIELD_ALIASES = {
+    "first_name": "fname", "firstname": "fname",
+    "last_name": "lname", "lastname": "lname",
+    "student_number": "id", "studentnumber": "id", "student_id": "id",
+    "lecture_id": "lecture", "lecture_section": "lecture",
+    "lab_id": "lab",
+}
+
+
+def _normalize(raw: Dict[str, Any]) -> Dict[str, str]:
+    row: Dict[str, str] = {}
+    for key, value in (raw or {}).items():
+        name = str(key or "").strip().lower().replace(" ", "_")
+        name = FIELD_ALIASES.get(name, name)
+        if name in FIELDS:
+            row[name] = "" if value is None else str(value).strip()
+    return row
+
+
+def parse_csv(text: str) -> List[Dict[str, str]]:
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    return [_normalize(r) for r in reader if any((v or "").strip() for v in r.values() if isinstance(v, str))]
+
+
+def parse_json(students: Any) -> List[Dict[str, str]]:
+    if not isinstance(students, list):
+        raise ValueError("students must be a list")
+    return [_normalize(s) if isinstance(s, dict) else {} for s in students]
+
+
+def _resolver(sections: Iterable[Any]):
+    by_id = {int(s.Id): int(s.Id) for s in sections}
+    by_name = {str(s.Name or "").strip().lower(): int(s.Id) for s in sections}
+
+    def resolve(value: str) -> Optional[int]:
+        if value.isdigit() and int(value) in by_id:
+            return int(value)
+        return by_name.get(value.strip().lower())
+
+    return resolve
+
+
+def validate(
+    class_id: int,
+    rows: List[Dict[str, str]],
+    class_repo: ClassRepository,
+    user_repo: UserRepository,
+) -> Tuple[List[Dict[str, Any]], List[List[str]]]:
+    """
+    Check every row against the class's lectures/labs, the rest of the batch and existing
+    accounts.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], List[List[str]]]: The rows resolved for upsert_roster
+        (username, first_name, last_name, email, student_number, lecture_id, lab_id) and
+        each row's error messages, in input order.
+    """
+    resolve_lecture = _resolver(class_repo.get_lecture_sections().get(class_id, []))
+    resolve_lab = _resolver(class_repo.get_labs().get(class_id, []))
+    existing = user_repo.get_users_by_username([r.get("username", "") for r in rows])
+    number_owners = user_repo.get_usernames_by_student_number([r.get("id", "") for r in rows])
+
+    resolved: List[Dict[str, Any]] = []
+    errors: List[List[str]] = []
+    seen_usernames: Dict[str, int] = {}
+    seen_numbers: Dict[str, int] = {}
+    for n, row in enumerate(rows, start=1):
+        problems = [f"missing {f}" for f in FIELDS if not row.get(f)]
+        username = row.get("username", "")
+        number = row.get("id", "")
+
+        if username and any(c.isspace() for c in username):
+            problems.append("username contains whitespace")
+        if row.get("email") and "@" not in row["email"]:
+            problems.append("invalid email")
+        if username in seen_usernames:
+            problems.append(f"duplicate username (row {seen_usernames[username]})")
+        if number and number in seen_numbers:
+            problems.append(f"duplicate student number (row {seen_numbers[number]})")
+        others = [u for u in number_owners.get(number, []) if u != username]
+        if others:
+            problems.append(f"student number already used by {', '.join(sorted(others))}")
+        user = existing.get(username)
+        if user is not None and int(user.Role or 0) != STUDENT_ROLE:
+            problems.append("username belongs to a non-student account")
+
+        lecture_id = resolve_lecture(row["lecture"]) if row.get("lecture") else None
+        lab_id = resolve_lab(row["lab"]) if row.get("lab") else None
+        if row.get("lecture") and lecture_id is None:
+            problems.append(f"unknown lecture {row['lecture']!r} for this class")
+        if row.get("lab") and lab_id is None:
+            problems.append(f"unknown lab {row['lab']!r} for this class")
+
+        if username:
+            seen_usernames.setdefault(username, n)
+        if number:
+            seen_numbers.setdefault(number, n)
+        errors.append(problems)
+        resolved.append({
+            "username": username,
+            "first_name": row.get("fname", ""),
+            "last_name": row.get("lname", ""),
+            "email": row.get("email", ""),
+            "student_number": number,
+            "lecture_id": lecture_id,
+            "lab_id": lab_id,
+        })
+    return resolved, errors
+
+
+def import_roster(
+    class_id: int,
+    rows: List[Dict[str, str]],
+    class_repo: ClassRepository,
+    user_repo: UserRepository,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    Validate the batch and, unless it has errors or dry_run is set, upsert it.
+
+    Returns:
+        Dict[str, Any]: {
+            "ok": bool (False if any row failed validation; nothing was written),
+            "dry_run": bool,
+            "class_id": int,
+            "conflict": bool (True if a concurrent change made the write fail; nothing
+                        was written and the import can be retried),
+            "counts": {status: number of rows},
+            "rows": [{"row", "username", "statuses", "errors"}, ...] in input order (row is
+                    1-based, not counting a CSV header), where statuses is ["created"],
+                    ["enrolled"], ["updated"], ["enrolled", "updated"] or ["unchanged"], or
+                    ["error"] / ["skipped"] when the batch was rejected (would-be statuses on
+                    a dry run).
+        }
+    """
+    if len(rows) > MAX_ROWS:
+        raise ValueError(f"at most {MAX_ROWS} students per import")
+
+    resolved, errors = validate(class_id, rows, class_repo, user_repo)
+    ok = not any(errors)
+    conflict = False
+    outcomes: Dict[str, List[str]] = {}
+    if ok:
+        try:
+            outcomes = class_repo.upsert_roster(class_id, resolved, dry_run=dry_run)
+        except IntegrityError:
+            # Another request created one of these accounts after validate() looked.
+            ok, conflict = False, True
+
+    report_rows = []
+    counts: Dict[str, int] = {}
+    for n, (row, problems) in enumerate(zip(resolved, errors), start=1):
+        if problems:
+            statuses = ["error"]
+        else:
+            statuses = outcomes.get(row["username"], ["unchanged"] if ok else ["skipped"])
+        for status in statuses:
+            counts[status] = counts.get(status, 0) + 1
+        report_rows.append({"row": n, "username": row["username"], "statuses": statuses, "errors": problems})
+
+    return {
+        "ok": ok,
+        "dry_run": bool(dry_run),
+        "class_id": int(class_id),
+        "conflict": conflict,
+        "counts": counts,
+        "rows": report_rows,
+    }
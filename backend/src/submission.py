@@ -13,6 +13,7 @@ from flask_jwt_extended import jwt_required
 from flask_jwt_extended import current_user
 from src.repositories.submission_repository import SubmissionRepository
 from src.repositories.project_repository import ProjectRepository
+from src.repositories.pagination import InvalidCursor
 from src.constants import EMPTY, ADMIN_ROLE
 import json
 import zipfile
@@ -411,77 +412,46 @@ def recentsubproject(submission_repo: SubmissionRepository = Provide[Container.s
     
     class_name = project_repo.get_className_by_projectId(projectid)
     class_id = project_repo.get_class_id_by_name(class_name)
-    users = user_repo.get_all_users_by_cid(class_id)
-    studentattempts={}
-    userids=[]
-    for user in users:
-        userids.append(user.Id)
-
-    if practice and hasattr(Submissions, "IsPractice"):
-        bucket = {}
-        submission_counter_dict = {uid: 0 for uid in userids}
-        
-        q = (
-            Submissions.query
-            .filter(
-                Submissions.Project == projectid,
-                Submissions.User.in_(userids),
-                Submissions.IsPractice == True,
-            )
-        )
-        # If the UI requested a specific practice problem, scope to it.
-        if practice_problem_id is not None and hasattr(Submissions, "PracticeProblemId"):
-            q = q.filter(Submissions.PracticeProblemId == practice_problem_id)
-        subs = q.order_by(Submissions.User.asc(), Submissions.Time.desc()).all()
-
-        for s in subs:
-            uid = int(getattr(s, "User", 0) or 0)
-            if uid in submission_counter_dict:
-                submission_counter_dict[uid] += 1
-                if uid not in bucket:
-                    bucket[uid] = s
-    else:
-        bucket = submission_repo.get_most_recent_submission_by_project(projectid, userids)
-        submission_counter_dict = submission_repo.submission_counter(projectid, userids)
-
+    grid = submission_repo.get_project_grid(
+        projectid, class_id, practice=practice, practice_problem_id=practice_problem_id
+    )
+    userids = [row["user_id"] for row in grid]
     user_lectures_dict = user_repo.get_user_lectures(userids, class_id)
     user_labs_dict = user_repo.get_user_labs(userids, class_id)
-    for user in users:
-        if int(user.Role) == 0:
-            if user.Id in bucket:
-                student_grade = 0 if practice else project_repo.get_student_grade(projectid, user.Id)
-                student_id = user_repo.get_StudentNumber(user.Id)
-                studentattempts[user.Id]=[
-                    user.Lastname,
-                    user.Firstname,
-                    user_lectures_dict[user.Id],
-                    user_labs_dict[user.Id],
-                    submission_counter_dict[user.Id],
-                    bucket[user.Id].Time.isoformat(),
-                    bucket[user.Id].IsPassing,
-                    bucket[user.Id].Id,
-                    str(class_id),
-                    student_grade,
-                    student_id,
-                    user.IsLocked
-                ]
-            else:
-                student_id = user_repo.get_StudentNumber(user.Id)
-                studentattempts[user.Id] = [
-                    user.Lastname,
-                    user.Firstname,
-                    user_lectures_dict[user.Id],
-                    user_labs_dict[user.Id],
-                    "N/A",
-                    "N/A",
-                    "N/A",
-                    "N/A",
-                    -1,
-                    str(class_id),
-                    "0",
-                    student_id,
-                    user.IsLocked
-                ]
+    studentattempts={}
+    for row in grid:
+        if row["submission_id"] is not None:
+            student_grade = 0 if practice or not row["has_grade"] else row["grade"]
+            studentattempts[row["user_id"]]=[
+                row["lastname"],
+                row["firstname"],
+                user_lectures_dict.get(row["user_id"]),
+                user_labs_dict[row["user_id"]],
+                row["attempts"],
+                row["time"].isoformat(),
+                row["is_passing"],
+                row["submission_id"],
+                str(class_id),
+                student_grade,
+                row["student_number"],
+                row["is_locked"]
+            ]
+        else:
+            studentattempts[row["user_id"]] = [
+                row["lastname"],
+                row["firstname"],
+                user_lectures_dict.get(row["user_id"]),
+                user_labs_dict[row["user_id"]],
+                "N/A",
+                "N/A",
+                "N/A",
+                "N/A",
+                -1,
+                str(class_id),
+                "0",
+                row["student_number"],
+                row["is_locked"]
+            ]
     return make_response(json.dumps(studentattempts), HTTPStatus.OK)
 
 @submission_api.route('/submitOHquestion', methods=['GET'])
@@ -501,7 +471,7 @@ def Submit_OH_Question(submission_repo: SubmissionRepository = Provide[Container
 @submission_api.route('/getOHquestions', methods=['GET'])
 @jwt_required()
 @inject
-def Get_OH_Questions(submission_repo: SubmissionRepository = Provide[Container.submission_repo], user_repo: UserRepository = Provide[Container.user_repo], project_repo: ProjectRepository = Provide[Container.project_repo]):
+def Get_OH_Questions(submission_repo: SubmissionRepository = Provide[Container.submission_repo]):
     if current_user.Role != ADMIN_ROLE:
         return make_response("Not Authorized", HTTPStatus.UNAUTHORIZED)
 
@@ -513,52 +483,42 @@ def Get_OH_Questions(submission_repo: SubmissionRepository = Provide[Container.s
         except Exception:
             return str(dt_val)
 
-    # Admin view needs ALL OHVisits entries (active + dismissed) so the UI can split
-    # into Current Queue vs History.
-    questions = submission_repo.Get_all_OH_questions(include_dismissed=True)
-    question_list = []
-    #Need class ID and submission ID
-    for question in questions:
-        # If the project was deleted / missing, skip this OH entry so the admin page doesn't 500.
-        try:
-            proj = project_repo.get_selected_project(int(getattr(question, "projectId", 0) or 0))
-        except Exception:
-            proj = None
-        if not proj:
-            continue
-        user = user_repo.get_user(question.StudentId)
-        Student_name = user.Firstname + " " + user.Lastname
-        class_id = int(getattr(proj, "ClassId", 0) or 0)
-        subs = submission_repo.get_most_recent_submission_by_project(question.projectId, [question.StudentId])
-        try:
-            question_list.append([
-                question.Sqid,
-                question.StudentQuestionscol,
-                fmt_dt(question.TimeSubmitted),
-                Student_name,
-                question.ruling,
-                int(getattr(question, "dismissed", 0) or 0),
-                fmt_dt(getattr(question, "TimeAccepted", None)),
-                fmt_dt(getattr(question, "TimeCompleted", None)),
-                question.projectId,
-                class_id,
-                subs[question.StudentId].Id
-            ])
-        except:
-            question_list.append([
-                question.Sqid,
-                question.StudentQuestionscol,
-                fmt_dt(question.TimeSubmitted),
-                Student_name,
-                question.ruling,
-                int(getattr(question, "dismissed", 0) or 0),
-                fmt_dt(getattr(question, "TimeAccepted", None)),
-                fmt_dt(getattr(question, "TimeCompleted", None)),
-                question.projectId,
-                class_id,
-                -1
-            ])
-    return make_response(json.dumps(question_list), HTTPStatus.OK)
+    # Admin view: the whole active queue plus one keyset page of history (newest first).
+    history_cursor = request.args.get("history_cursor") or None
+    try:
+        history_page_size = int(request.args.get("history_page_size", 5))
+    except (TypeError, ValueError):
+        history_page_size = 5
+    history_page_size = min(max(1, history_page_size), 100)
+
+    try:
+        listing = submission_repo.get_OH_listing(history_cursor, history_page_size)
+    except InvalidCursor:
+        return make_response("Invalid history_cursor", HTTPStatus.BAD_REQUEST)
+
+    def row(entry):
+        question, student_name, class_id, submission_id = entry
+        return [
+            question.Sqid,
+            question.StudentQuestionscol,
+            fmt_dt(question.TimeSubmitted),
+            student_name,
+            question.ruling,
+            int(getattr(question, "dismissed", 0) or 0),
+            fmt_dt(getattr(question, "TimeAccepted", None)),
+            fmt_dt(getattr(question, "TimeCompleted", None)),
+            question.projectId,
+            class_id,
+            submission_id
+        ]
+
+    return make_response(json.dumps({
+        "queue": [row(e) for e in listing["queue"]],
+        "history": [row(e) for e in listing["history"]],
+        "history_total": listing["history_total"],
+        "history_next_cursor": listing["history_next_cursor"],
+        "history_page_size": history_page_size,
+    }), HTTPStatus.OK)
 
 @submission_api.route('/getOHqueue', methods=['GET'])
 @jwt_required()
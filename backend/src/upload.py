@@ -20,6 +20,8 @@ from src.repositories.project_repository import ProjectRepository
 from src.repositories.user_repository import UserRepository
 from src.repositories.class_repository import ClassRepository
 from src.services.timeout_service import on_timeout
+from src.services import plagiarism_index
+from src.services.dataService import submission_entry
 from tap.parser import Parser
 from dependency_injector.wiring import inject, Provide
 from container import Container
@@ -315,6 +317,21 @@ def file_upload(
         except Exception:
             pass
 
+        # Keep the project's incremental plagiarism index current (main submissions only).
+        # The update is queued and runs in the background; never let it fail an upload.
+        if not is_practice:
+            try:
+                student = user_repository.get_user(int(user_id))
+                sub = submission_repo.get_submission_by_submission_id(int(submissionId))
+                if student is not None and sub is not None:
+                    plagiarism_index.queue_submission(
+                        int(project.Id),
+                        submission_entry(student, sub, project.ClassId),
+                        logger=current_app.logger,
+                    )
+            except Exception as e:
+                current_app.logger.warning(f"[upload] plagiarism index update failed: {e}")
+
         # Admin uploads and practice submissions should not consume charges.
         if current_user.Role != ADMIN_ROLE and not is_practice:
             submission_repo.consume_charge(user_id, class_id, project.Id, submissionId)
@@ -0,0 +1,66 @@
+"""
+Greedy String Tiling (src/plagiarism_detector.py), the token-similarity channel.
+"""
+
+import random
+
+import pytest
+
+from src.plagiarism_detector import GST_MIN_MATCH, greedy_string_tiling, token_sequence_similarity
+
+
+def _covered(tiles, side: int):
+    out = []
+    for tile in tiles:
+        start, length = tile[side], tile[2]
+        out.extend(range(start, start + length))
+    return out
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_tiles_never_overlap(seed):
+    rng = random.Random(seed)
+    vocab = ["x", "=", "(", ")", "for", "in", "range", ":", "+", "1"]
+    a = [rng.choice(vocab) for _ in range(300)]
+    # b: shuffled chunks of a with some noise, so many tiles compete for the same tokens
+    chunks = [a[i:i + 25] for i in range(0, len(a), 25)]
+    rng.shuffle(chunks)
+    b = [t for c in chunks for t in c + [rng.choice(vocab)]]
+
+    tiles = greedy_string_tiling(a, b, 3)
+
+    assert tiles
+    for side in (0, 1):
+        covered = _covered(tiles, side)
+        assert len(covered) == len(set(covered))
+    for i, j, k in tiles:
+        assert k >= 3
+        assert a[i:i + k] == b[j:j + k]
+
+
+def test_reordered_block_is_fully_covered():
+    first = [f"f{n}" for n in range(20)]
+    second = [f"s{n}" for n in range(15)]
+    a = first + second
+    b = second + first
+
+    tiles = greedy_string_tiling(a, b, GST_MIN_MATCH)
+
+    assert sorted(tiles) == [(0, 15, 20), (20, 0, 15)]
+    assert token_sequence_similarity(a, b) == 1.0
+
+
+def test_inputs_shorter_than_min_match_give_no_tiles():
+    short = ["a", "b", "c"]
+    assert greedy_string_tiling(short, short, 4) == []
+    assert greedy_string_tiling(short + ["d"], short, 4) == []
+    assert greedy_string_tiling([], ["a"] * 10, 4) == []
+    assert token_sequence_similarity(short, short, 4) == 0.0
+
+
+def test_runs_shorter_than_min_match_are_not_tiles():
+    # Renaming every third token leaves runs of two: no tile at min_match 4.
+    a = [f"t{n}" for n in range(30)]
+    b = [f"r{n}" if n % 3 == 2 else t for n, t in enumerate(a)]
+    assert greedy_string_tiling(a, b, 4) == []
+    assert greedy_string_tiling(a, b, 2) != []
@@ -0,0 +1,224 @@
+"""
+EXPLAIN check for the queries the repositories run on every request.
+
+Calls the repository methods behind each hot path against a migrated MySQL database,
+captures the ORM statement they build (before it runs), compiles it with the MySQL dialect
+and EXPLAINs it. Fails when a base table is read with a full scan (access type ALL) or
+through any index other than the one the query was written for, i.e. when a migration or
+a query change stopped MySQL from using the index that backs it (see HOT_PATH_INDEXES in
+src/repositories/migrations.py).
+
+Point it at a database with realistic data (a staging copy, or production read-only).
+On near-empty tables MySQL may prefer a scan, so a case is skipped while any table it
+reads holds fewer than MIN_TABLE_ROWS rows. Skipped when no database is configured.
+Nothing is written: capture stops each method at the statement under test.
+
+Usage (from backend/):
+  EXPLAIN_DB_URI=mysql+pymysql://user:pw@host/db python -m pytest tests/test_hot_query_plans.py -v
+  (or with the app's DB_* environment variables set)
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Tuple
+
+import pytest
+from flask import Flask
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import mysql
+
+from src.repositories.database import db
+from src.repositories.models import (
+    OHVisits,
+    Projects,
+    SubmissionChargeRedeptions,
+    SubmissionCharges,
+    Submissions,
+    Testcases,
+)
+from src.repositories.project_repository import ProjectRepository
+from src.repositories.submission_repository import SubmissionRepository
+
+MIN_TABLE_ROWS = 1000
+
+SUBMISSIONS_IDX = "sub_project_practice_user_time_idx"
+
+# (label, table the captured statement targets, call(ids), {table or alias in the plan: index}).
+HOT_QUERIES: List[Tuple[str, str, Callable[[Dict[str, int]], Any], Dict[str, str]]] = [
+    (
+        "latest graded submission per student",
+        "Submissions",
+        lambda ids: SubmissionRepository().get_most_recent_submission_by_project(ids["project"], [ids["user"]]),
+        {"Submissions": SUBMISSIONS_IDX},
+    ),
+    (
+        "submitter counts per project",
+        "Submissions",
+        lambda ids: SubmissionRepository().get_submitter_counts_by_project([ids["project"]]),
+        {"Submissions": SUBMISSIONS_IDX},
+    ),
+    (
+        "student's latest submission for a project",
+        "Submissions",
+        lambda ids: SubmissionRepository().get_submission_by_user_and_projectid(ids["user"], ids["project"]),
+        {"Submissions": SUBMISSIONS_IDX},
+    ),
+    (
+        "office-hours queue for a project",
+        "OHVisits",
+        lambda ids: SubmissionRepository().Get_active_OH_questions_for_project(ids["oh_project"]),
+        {"OHVisits": "oh_project_dismissed_idx"},
+    ),
+    (
+        "student's office-hours questions",
+        "OHVisits",
+        lambda ids: SubmissionRepository().get_student_questions_asked(ids["oh_user"], ids["oh_project"]),
+        {"OHVisits": "oh_student_project_idx"},
+    ),
+    (
+        "FastPass balance",
+        "SubmissionCharges",
+        lambda ids: SubmissionRepository().get_charges(ids["charge_user"], ids["charge_class"], ids["project"]),
+        {"SubmissionCharges": "charges_user_class_idx"},
+    ),
+    (
+        "open FastPass redemptions",
+        "SubmissionChargeRedeptions",
+        lambda ids: SubmissionRepository().get_time_until_recharge(ids["redeem_user"], ids["redeem_class"], ids["redeem_project"]),
+        {"SubmissionChargeRedeptions": "redeem_user_class_project_idx"},
+    ),
+    (
+        "testcases of a practice problem",
+        "Testcases",
+        lambda ids: ProjectRepository().get_testcases(ids["tc_project"], ids["tc_problem"]),
+        {"Testcases": "tc_project_practice_idx"},
+    ),
+]
+
+
+def _db_uri() -> str:
+    uri = os.getenv("EXPLAIN_DB_URI", "")
+    if uri:
+        return uri
+    if os.getenv("DB_HOST"):
+        return f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
+    return ""
+
+
+@pytest.fixture(scope="module")
+def app():
+    uri = _db_uri()
+    if not uri:
+        pytest.skip("no MySQL database configured (EXPLAIN_DB_URI or DB_* variables)")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+def _first(stmt) -> Tuple[Any, ...]:
+    row = db.session.execute(stmt.limit(1)).first()
+    return tuple(row) if row else ()
+
+
+@pytest.fixture(scope="module")
+def ids(app) -> Dict[str, int]:
+    """Real ids from the busiest rows, so each plan is costed against data that exists."""
+    project, user = _first(
+        select(Submissions.Project, Submissions.User)
+        .group_by(Submissions.Project, Submissions.User)
+        .order_by(func.count().desc())
+    ) or (1, 1)
+    oh_project, oh_user = _first(
+        select(OHVisits.projectId, OHVisits.StudentId)
+        .group_by(OHVisits.projectId, OHVisits.StudentId)
+        .order_by(func.count().desc())
+    ) or (1, 1)
+    charge_user, charge_class = _first(select(SubmissionCharges.UserId, SubmissionCharges.ClassId)) or (user, 1)
+    redeem_user, redeem_class, redeem_project = _first(
+        select(SubmissionChargeRedeptions.UserId, SubmissionChargeRedeptions.ClassId, SubmissionChargeRedeptions.projectId)
+        .where(SubmissionChargeRedeptions.projectId.in_(select(Projects.Id)))
+    ) or (user, charge_class, project)
+    tc_project, tc_problem = _first(
+        select(Testcases.ProjectId, Testcases.PracticeProblemId).where(Testcases.PracticeProblemId.isnot(None))
+    ) or (project, 1)
+    return {
+        "project": int(project), "user": int(user),
+        "oh_project": int(oh_project), "oh_user": int(oh_user),
+        "charge_user": int(charge_user), "charge_class": int(charge_class),
+        "redeem_user": int(redeem_user), "redeem_class": int(redeem_class), "redeem_project": int(redeem_project),
+        "tc_project": int(tc_project), "tc_problem": int(tc_problem),
+    }
+
+
+class _Captured(BaseException):
+    # BaseException so repository code that catches Exception can't swallow the stop.
+    def __init__(self, statement):
+        super().__init__()
+        self.statement = statement
+
+
+@contextmanager
+def _stop_at(table: str):
+    """Raise _Captured with the first ORM statement that reads `table`, instead of running it."""
+
+    def on_execute(state):
+        if state.is_select and any(m.local_table.name == table for m in state.all_mappers):
+            raise _Captured(state.statement)
+
+    event.listen(db.session, "do_orm_execute", on_execute)
+    try:
+        yield
+    finally:
+        event.remove(db.session, "do_orm_execute", on_execute)
+
+
+def capture(table: str, call: Callable[[], Any]) -> str:
+    """MySQL SQL, with literal values, of the statement `call` issues against `table`."""
+    try:
+        with _stop_at(table):
+            call()
+    except _Captured as c:
+        return str(c.statement.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+    finally:
+        db.session.rollback()
+    pytest.fail(f"no statement against {table} was issued")
+
+
+def explain(sql: str) -> List[Dict[str, Any]]:
+    rows = db.session.connection().exec_driver_sql(f"EXPLAIN {sql}").mappings().all()
+    return [{str(k).lower(): v for k, v in row.items()} for row in rows]
+
+
+def base_table_rows(plan: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Plan rows that read a base table. Derived tables (<derivedN>) are materialized
+    subqueries whose own reads appear as separate rows, so they are skipped.
+    """
+    return [r for r in plan if r.get("table") and not str(r["table"]).startswith("<")]
+
+
+def _skip_if_small(table: str) -> None:
+    model = db.Model.metadata.tables[table]
+    rows = db.session.execute(select(func.count()).select_from(model)).scalar() or 0
+    if rows < MIN_TABLE_ROWS:
+        pytest.skip(f"{table} has {rows} rows (< {MIN_TABLE_ROWS}); MySQL may rightly prefer a scan")
+
+
+@pytest.mark.parametrize(
+    "table, call, expected", [q[1:] for q in HOT_QUERIES], ids=[q[0] for q in HOT_QUERIES]
+)
+def test_hot_query_uses_its_index(ids, table, call, expected):
+    _skip_if_small(table)
+    sql = capture(table, lambda: call(ids))
+    plan = explain(sql)
+    rows = base_table_rows(plan)
+    assert rows, f"EXPLAIN returned no table access: {plan}"
+    for r in rows:
+        name = str(r["table"])
+        assert (r.get("type") or "").upper() != "ALL", f"full scan of {name}: {r}\n{sql}"
+        assert name in expected, f"unexpected table {name} in plan: {r}\n{sql}"
+        assert r.get("key") == expected[name], f"{name} uses {r.get('key')!r}, expected {expected[name]!r}: {r}\n{sql}"
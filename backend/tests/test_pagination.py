@@ -0,0 +1,64 @@
+"""
+Keyset pagination (src/repositories/pagination.py) over a nullable leading key, on
+SQLite, which orders NULLs like MySQL (first ascending, last descending).
+"""
+
+from datetime import date
+
+import pytest
+from flask import Flask
+
+from src.repositories.database import db
+from src.repositories.models import Projects
+from src.repositories.pagination import decode_cursor, encode_cursor, keyset_page
+
+STARTS = {
+    1: date(2024, 1, 10),
+    2: None,
+    3: date(2024, 1, 10),
+    4: date(2023, 9, 1),
+    5: None,
+    6: date(2024, 3, 5),
+}
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'pages.db'}"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[Projects.__table__])
+        with db.engine.begin() as conn:
+            conn.execute(Projects.__table__.insert(), [{"Id": i, "Name": f"p{i}", "Start": s} for i, s in STARTS.items()])
+        yield app
+        db.session.remove()
+
+
+def _all_pages(limit: int, descending: bool):
+    ids, cursor, pages = [], None, 0
+    while True:
+        rows, cursor = keyset_page(
+            Projects.query, [Projects.Start, Projects.Id], lambda p: (p.Start, p.Id), cursor, limit, descending
+        )
+        ids.extend(p.Id for p in rows)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+
+def test_cursor_round_trips_null():
+    assert decode_cursor(encode_cursor([None, 7]), 2) == (None, 7)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4])
+def test_pages_cover_null_keys_ascending(app, limit):
+    ids, _ = _all_pages(limit, descending=False)
+    assert ids == [2, 5, 4, 1, 3, 6]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4])
+def test_pages_cover_null_keys_descending(app, limit):
+    ids, _ = _all_pages(limit, descending=True)
+    assert ids == [6, 3, 1, 4, 5, 2]
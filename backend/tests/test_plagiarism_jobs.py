@@ -0,0 +1,48 @@
+"""
+Pair-detail cache (src/services/plagiarism_jobs.py): one entry per unordered pair of
+submissions, returned from the side that was asked for.
+"""
+
+import pytest
+
+from src.services import plagiarism_jobs
+
+
+@pytest.fixture(autouse=True)
+def jobs_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(plagiarism_jobs, "JOBS_ROOT", str(tmp_path))
+
+
+def _side(file: str, start: int, end: int):
+    return {"file": file, "start_line": start, "end_line": end}
+
+
+DETAIL_7_3 = {
+    "similarity_token": 0.5,
+    "a": {"submission_id": 7},
+    "b": {"submission_id": 3},
+    "regions": [
+        {"tokens": 20, "a": _side("x.py", 1, 5), "b": _side("y.py", 10, 14)},
+        {"tokens": 12, "a": _side("x.py", 8, 9), "b": _side("y.py", 2, 3)},
+    ],
+    "fingerprints": [
+        {"a": _side("x.py", 1, 2), "b": _side("y.py", 12, 13)},
+        {"a": _side("x.py", 8, 8), "b": _side("y.py", 2, 2)},
+    ],
+}
+
+
+def test_pair_detail_key_ignores_order():
+    assert plagiarism_jobs._pair_detail_key(3, 7) == plagiarism_jobs._pair_detail_key(7, 3)
+
+
+def test_pair_detail_saved_one_way_is_found_the_other():
+    plagiarism_jobs.save_pair_detail(7, 3, DETAIL_7_3)
+
+    assert plagiarism_jobs.load_pair_detail(7, 3) == DETAIL_7_3
+    flipped = plagiarism_jobs.load_pair_detail(3, 7)
+    assert flipped["a"] == {"submission_id": 3} and flipped["b"] == {"submission_id": 7}
+    assert [r["a"]["file"] for r in flipped["regions"]] == ["y.py", "y.py"]
+    assert [r["tokens"] for r in flipped["regions"]] == [20, 12]
+    # Fingerprints stay ordered by side a, which is now the other submission.
+    assert [f["a"]["start_line"] for f in flipped["fingerprints"]] == [2, 12]
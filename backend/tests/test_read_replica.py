@@ -0,0 +1,90 @@
+"""
+Read-replica routing (src/repositories/database.py), with two SQLite files standing in
+for the primary and the replica. Each holds one Classes row naming its database, so a
+query shows which engine it ran on.
+"""
+
+from typing import Optional
+
+import pytest
+from flask import Flask
+from sqlalchemy import update
+
+from src.repositories.database import REPLICA_BIND, db, read_primary, read_replica
+from src.repositories.models import Classes
+
+
+def _make_app(primary_uri: str, replica_uri: Optional[str]) -> Flask:
+    # Same bind setup as create_app: the replica is only configured when DB_REPLICA_URI is set.
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = primary_uri
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    if replica_uri:
+        app.config["SQLALCHEMY_BINDS"] = {REPLICA_BIND: replica_uri}
+    db.init_app(app)
+    return app
+
+
+def _seed(engine, name: str) -> None:
+    db.metadata.create_all(engine, tables=[Classes.__table__])
+    with engine.begin() as conn:
+        conn.execute(Classes.__table__.insert(), [{"Id": 1, "Name": name, "Tid": ""}])
+
+
+def _name() -> str:
+    return Classes.query.filter(Classes.Id == 1).one().Name
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = _make_app(f"sqlite:///{tmp_path / 'primary.db'}", f"sqlite:///{tmp_path / 'replica.db'}")
+    with app.app_context():
+        _seed(db.engines[None], "primary")
+        _seed(db.engines[REPLICA_BIND], "replica")
+        yield app
+        db.session.remove()
+
+
+def test_reads_use_primary_by_default(app):
+    assert _name() == "primary"
+
+
+def test_reads_inside_read_replica_use_replica(app):
+    with read_replica():
+        assert _name() == "replica"
+    assert _name() == "primary"
+
+
+def test_read_primary_overrides_read_replica(app):
+    with read_replica():
+        with read_primary():
+            assert _name() == "primary"
+        assert _name() == "replica"
+
+
+def test_writes_inside_read_replica_go_to_primary(app):
+    with read_replica():
+        db.session.add(Classes(Id=2, Name="added", Tid=""))
+        db.session.commit()
+        db.session.execute(update(Classes).where(Classes.Id == 1).values(Name="renamed"))
+        db.session.commit()
+
+    with db.engines[None].connect() as conn:
+        primary = dict(conn.execute(Classes.__table__.select().with_only_columns(Classes.Id, Classes.Name)).all())
+    with db.engines[REPLICA_BIND].connect() as conn:
+        replica = dict(conn.execute(Classes.__table__.select().with_only_columns(Classes.Id, Classes.Name)).all())
+    assert primary == {1: "renamed", 2: "added"}
+    assert replica == {1: "replica"}
+
+
+def test_everything_uses_primary_without_replica_uri(tmp_path):
+    app = _make_app(f"sqlite:///{tmp_path / 'primary.db'}", None)
+    with app.app_context():
+        assert REPLICA_BIND not in db.engines
+        _seed(db.engines[None], "primary")
+        with read_replica():
+            assert _name() == "primary"
+            db.session.add(Classes(Id=2, Name="added", Tid=""))
+            db.session.commit()
+            assert Classes.query.count() == 2
+        db.session.remove()
@@ -0,0 +1,49 @@
+"""
+Winnowing candidate generation (WinnowIndex in src/plagiarism_detector.py).
+"""
+
+import numpy as np
+
+from src.plagiarism_detector import WinnowIndex
+
+
+def _doc(hashes):
+    hashes = np.asarray(sorted(hashes), dtype=np.uint64)
+    return {"winnow": hashes, "winnow_pos": np.arange(hashes.size, dtype=np.int64)}
+
+
+def _unique(doc: int, count: int):
+    return [1_000_000 * (doc + 1) + k for k in range(count)]
+
+
+def test_copied_pair_with_common_fingerprints_is_a_candidate():
+    # Docs 0 and 1 are copies. Each of their 20 fingerprints also appears in 38 honest
+    # solutions (40 of 100 documents: above a fixed 32-document cap, below half the class),
+    # which share too little else with the copies to be candidates themselves.
+    copied = list(range(1, 21))
+    docs = [_doc(copied), _doc(copied)]
+    docs += [_doc(copied + _unique(d, 60)) for d in range(2, 40)]
+    docs += [_doc(_unique(d, 80)) for d in range(40, 100)]
+
+    candidates = WinnowIndex(docs).candidates()
+
+    assert candidates.get((0, 1)) == 1.0
+    assert (0, 2) not in candidates
+
+
+def test_fingerprints_in_most_of_the_class_are_ignored():
+    boilerplate = list(range(1, 21))
+    docs = [_doc(boilerplate + _unique(d, 5)) for d in range(60)]
+    docs += [_doc(_unique(d, 25)) for d in range(60, 100)]
+
+    assert WinnowIndex(docs).candidates() == {}
+
+
+def test_pairs_per_document_are_bounded():
+    # 50 identical documents: 1225 pairs, each document keeps its 4 best.
+    docs = [_doc(range(1, 31)) for _ in range(50)]
+
+    candidates = WinnowIndex(docs, min_df_cap=50, pairs_per_doc=4).candidates()
+
+    assert 0 < len(candidates) <= 50 * 4
+    assert {d for ij in candidates for d in ij} == set(range(50))
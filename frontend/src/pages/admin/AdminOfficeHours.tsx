@@ -15,10 +15,16 @@ import {
 
 interface OfficeHoursState {
     question: string
-    Student_questions: Array<OHQuestion>
-    historyPage: number
+    queueQuestions: Array<OHQuestion>
+    historyQuestions: Array<OHQuestion>
+    historyTotal: number
+    // Cursor of each history page visited so far; the last one is the current page.
+    historyCursors: Array<string | null>
+    historyNextCursor: string | null
 }
 
+const HISTORY_PAGE_SIZE = 5
+
 interface OHQuestion {
     question: string
     question_time: string
@@ -41,33 +47,26 @@ class AdminOfficeHours extends Component<{}, OfficeHoursState> {
         super(props)
         this.state = {
             question: '',
-            Student_questions: [],
-            historyPage: 1,
+            queueQuestions: [],
+            historyQuestions: [],
+            historyTotal: 0,
+            historyCursors: [null],
+            historyNextCursor: null,
         }
         this.handleComplete = this.handleComplete.bind(this)
         this.handleRuling = this.handleRuling.bind(this)
         this.fetchOHQuestions = this.fetchOHQuestions.bind(this)
         this.startFetchingInterval = this.startFetchingInterval.bind(this)
         this.downloadAssignment = this.downloadAssignment.bind(this)
-        this.setHistoryPage = this.setHistoryPage.bind(this)
+        this.setHistoryCursors = this.setHistoryCursors.bind(this)
+        this.nextHistoryPage = this.nextHistoryPage.bind(this)
+        this.prevHistoryPage = this.prevHistoryPage.bind(this)
     }
 
     componentDidMount() {
         this.startFetchingInterval()
     }
 
-    componentDidUpdate(_prevProps: {}, prevState: OfficeHoursState) {
-        // Clamp history page if the history size shrinks (after completing/rejecting, etc.)
-        if (prevState.Student_questions !== this.state.Student_questions) {
-            const history = this.state.Student_questions.filter((q) => (q.dismissed ?? 0) === 1)
-            const totalPages = Math.max(1, Math.ceil(history.length / 5))
-            if (this.state.historyPage > totalPages) {
-                // eslint-disable-next-line react/no-did-update-set-state
-                this.setState({ historyPage: totalPages })
-            }
-        }
-    }
-
     componentWillUnmount() {
         if (this.fetchIntervalId) {
             window.clearInterval(this.fetchIntervalId)
@@ -120,15 +119,18 @@ class AdminOfficeHours extends Component<{}, OfficeHoursState> {
             .catch((err) => console.error('Download failed:', err))
     }
 
-    fetchOHQuestions = () => {
+    fetchOHQuestions = (historyCursors: Array<string | null> = this.state.historyCursors) => {
+        const historyCursor = historyCursors[historyCursors.length - 1]
         axios
             .get(import.meta.env.VITE_API_URL + '/submissions/getOHquestions', {
                 headers: {
                     Authorization: `Bearer ${localStorage.getItem('AUTOTA_AUTH_TOKEN')}`,
                 },
+                // Only the active queue and one page of history are sent.
+                params: { history_cursor: historyCursor ?? undefined, history_page_size: HISTORY_PAGE_SIZE },
             })
             .then((res) => {
-                const formattedQuestions: OHQuestion[] = res.data.map((item: any[]) => ({
+                const format = (rows: any[][]): OHQuestion[] => rows.map((item: any[]) => ({
                     Question_id: item[0],
                     question: item[1],
                     question_time: item[2],
@@ -141,7 +143,13 @@ class AdminOfficeHours extends Component<{}, OfficeHoursState> {
                     class_id: item[9],
                     submission_id: item[10],
                 }))
-                this.setState({ Student_questions: formattedQuestions })
+                this.setState({
+                    queueQuestions: format(res.data.queue || []),
+                    historyQuestions: format(res.data.history || []),
+                    historyTotal: res.data.history_total ?? 0,
+                    historyCursors,
+                    historyNextCursor: res.data.history_next_cursor ?? null,
+                })
             })
             .catch((err) => {
                 console.log(err)
@@ -189,27 +197,36 @@ class AdminOfficeHours extends Component<{}, OfficeHoursState> {
 
     startFetchingInterval() {
         this.fetchOHQuestions()
-        this.fetchIntervalId = window.setInterval(this.fetchOHQuestions, 300000) // 5 minutes
+        this.fetchIntervalId = window.setInterval(() => this.fetchOHQuestions(), 300000) // 5 minutes
     }
 
-    setHistoryPage(nextPage: number) {
-        this.setState({ historyPage: nextPage })
+    setHistoryCursors(historyCursors: Array<string | null>) {
+        this.setState({ historyCursors })
+        this.fetchOHQuestions(historyCursors)
     }
 
-    render() {
-        const { Student_questions } = this.state
+    nextHistoryPage() {
+        const { historyCursors, historyNextCursor } = this.state
+        if (historyNextCursor) {
+            this.setHistoryCursors([...historyCursors, historyNextCursor])
+        }
+    }
+
+    prevHistoryPage() {
+        const { historyCursors } = this.state
+        if (historyCursors.length > 1) {
+            this.setHistoryCursors(historyCursors.slice(0, -1))
+        }
+    }
 
-        const queueQuestions = Student_questions.filter((q) => (q.dismissed ?? 0) === 0)
-        const historyQuestions = Student_questions
-            .filter((q) => (q.dismissed ?? 0) === 1)
-            // newest first (higher id first)
-            .sort((a, b) => (b.Question_id ?? 0) - (a.Question_id ?? 0))
+    render() {
+        // History arrives already paged and newest first.
+        const { queueQuestions, historyQuestions, historyTotal, historyNextCursor } = this.state
 
-        const pageSize = 5
-        const totalHistoryPages = Math.max(1, Math.ceil(historyQuestions.length / pageSize))
-        const historyPage = Math.min(this.state.historyPage, totalHistoryPages)
+        const pageSize = HISTORY_PAGE_SIZE
+        const totalHistoryPages = Math.max(1, Math.ceil(historyTotal / pageSize))
+        const historyPage = this.state.historyCursors.length
         const historyStart = (historyPage - 1) * pageSize
-        const historySlice = historyQuestions.slice(historyStart, historyStart + pageSize)
 
         return (
             <div className="oh-page">
@@ -417,7 +434,7 @@ class AdminOfficeHours extends Component<{}, OfficeHoursState> {
                                         </td>
                                     </tr>
                                 ) : (
-                                    historySlice.map((item: OHQuestion, index) => (
+                                    historyQuestions.map((item: OHQuestion, index) => (
                                         <tr key={`hist-${item.Question_id}`} className="data-row is-history">
                                             <td className="cell-status" aria-label="Outcome">
                                                 {item.ruled === 1 ? (
@@ -474,11 +491,11 @@ class AdminOfficeHours extends Component<{}, OfficeHoursState> {
                             </tbody>
                         </table>
 
-                        {historyQuestions.length > pageSize && (
+                        {historyTotal > pageSize && (
                             <div className="pagination-controls" aria-label="History pagination">
                                 <button
                                     className="button"
-                                    onClick={() => this.setHistoryPage(Math.max(1, historyPage - 1))}
+                                    onClick={this.prevHistoryPage}
                                     disabled={historyPage <= 1}
                                 >
                                     Prev
@@ -488,8 +505,8 @@ class AdminOfficeHours extends Component<{}, OfficeHoursState> {
                                 </div>
                                 <button
                                     className="button"
-                                    onClick={() => this.setHistoryPage(Math.min(totalHistoryPages, historyPage + 1))}
-                                    disabled={historyPage >= totalHistoryPages}
+                                    onClick={this.nextHistoryPage}
+                                    disabled={!historyNextCursor}
                                 >
                                     Next
                                 </button>
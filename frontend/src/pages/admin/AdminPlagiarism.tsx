@@ -3,7 +3,6 @@ import { useLocation, Link } from "react-router-dom";
 import axios from "axios";
 import "../../styling/AdminPlagiarism.scss";
 import { FaColumns, FaList } from "react-icons/fa";
-import { diffChars } from "diff";
 import MenuComponent from "../components/MenuComponent";
 import { Helmet } from "react-helmet";
 import { Highlight, themes, Prism } from "prism-react-renderer";
@@ -35,6 +34,14 @@ function useQuery() {
 
 type Seg = { text: string; similar: boolean };
 
+// /projects/plagiarism-pair: matched regions as 1-based line ranges per file on each side.
+type PairSide = { file: string; start_line: number; end_line: number };
+type PairRegion = { tokens: number; a: PairSide; b: PairSide };
+type PairDetail = { similarity_token: number; regions: PairRegion[] };
+
+// Same marker the backend uses when it combines a multi-file submission.
+const FILE_MARKER_RE = /^\s*\/\/\s*=====\s*(.+?)\s*=====\s*$/;
+
 export default function AdminPlagiarism() {
     const q = useQuery();
     const ac = q.get("ac");
@@ -53,6 +60,8 @@ export default function AdminPlagiarism() {
     const [error, setError] = useState<string | null>(null);
     const [simEnabled, setSimEnabled] = useState<boolean>(false);
     const [stacked, setStacked] = useState<boolean>(false); // false = side-by-side, true = top/bottom
+    const [pair, setPair] = useState<PairDetail | null>(null);
+    const [pairError, setPairError] = useState<string | null>(null);
 
     // Force a rerender after Prism languages load so Highlight can use the grammar.
     const [, forcePrismRefresh] = useState(0);
@@ -108,6 +117,30 @@ export default function AdminPlagiarism() {
         })();
     }, [ac, asid, bc, bsid, initialALabel, initialBLabel]);
 
+    // Matched regions are computed by the server on first open, so only fetch them once asked for.
+    useEffect(() => {
+        setPair(null);
+        setPairError(null);
+    }, [asid, bsid]);
+
+    useEffect(() => {
+        if (!simEnabled || pair || !asid || !bsid) return;
+        let cancelled = false;
+        axios
+            .get<PairDetail>(`${import.meta.env.VITE_API_URL}/projects/plagiarism-pair?as=${asid}&bs=${bsid}`, {
+                headers: { Authorization: `Bearer ${localStorage.getItem("AUTOTA_AUTH_TOKEN")}` },
+            })
+            .then((res) => {
+                if (!cancelled) setPair({ similarity_token: res.data?.similarity_token ?? 0, regions: res.data?.regions ?? [] });
+            })
+            .catch(() => {
+                if (!cancelled) setPairError("Failed to load matched regions.");
+            });
+        return () => {
+            cancelled = true;
+        };
+    }, [simEnabled, pair, asid, bsid]);
+
     const toLines = (s: string) => (s || "").replace(/\r\n/g, "\n").split("\n");
 
     function detectLanguageFromCombinedCode(code: string): "python" | "java" | "clike" {
@@ -139,40 +172,46 @@ export default function AdminPlagiarism() {
         );
     }
 
-    // Similarity Finder (highlights common substrings on both sides)
-    function wrapPlainLines(s: string): Seg[][] {
-        return toLines(s).map((line) => [{ text: line, similar: false }]);
+    // Similarity Finder (highlights the lines of the server's matched regions on both sides)
+    function wrapPlainLines(s: string, similar?: Set<number>): Seg[][] {
+        return toLines(s).map((line, i) => [{ text: line, similar: !!similar?.has(i) }]);
     }
 
-    function buildSimilarityLines(a: string, b: string): { left: Seg[][]; right: Seg[][] } {
-        const parts = diffChars(a || "", b || "");
-        const leftArr: Seg[][] = [];
-        const rightArr: Seg[][] = [];
-
-        const push = (arr: Seg[][], text: string, similar: boolean) => {
-            const chunks = (text ?? "").split("\n");
-            if (arr.length === 0) arr.push([]);
-            for (let i = 0; i < chunks.length; i++) {
-                if (i > 0) arr.push([]);
-                arr[arr.length - 1].push({ text: chunks[i], similar });
+    // Display line indexes covered by one side of the regions. Multi-file code carries
+    // "// ===== name =====" markers; single-file code has none, so only line numbers count.
+    function regionLines(code: string, sides: PairSide[]): Set<number> {
+        const lines = toLines(code);
+        const byFileLine = new Map<string, number>();
+        let file = "";
+        let fileLine = 0;
+        lines.forEach((ln, i) => {
+            const m = ln.match(FILE_MARKER_RE);
+            if (m) {
+                file = m[1];
+                fileLine = 0;
+                return;
             }
-        };
-
-        for (const p of parts) {
-            if ((p as any).added) {
-                push(rightArr, (p as any).value, false);
-            } else if ((p as any).removed) {
-                push(leftArr, (p as any).value, false);
-            } else {
-                // common segment -> highlight on both sides
-                push(leftArr, (p as any).value, true);
-                push(rightArr, (p as any).value, true);
+            fileLine += 1;
+            byFileLine.set(`${file}\n${fileLine}`, i);
+        });
+        const hasMarkers = lines.some((ln) => FILE_MARKER_RE.test(ln));
+        const out = new Set<number>();
+        for (const side of sides) {
+            for (let n = side.start_line; n <= side.end_line; n++) {
+                const idx = byFileLine.get(`${hasMarkers ? side.file : ""}\n${n}`);
+                if (idx !== undefined) out.add(idx);
             }
         }
-        return { left: leftArr, right: rightArr };
+        return out;
     }
 
-    const simData = useMemo(() => (simEnabled ? buildSimilarityLines(left.code, right.code) : null), [simEnabled, left.code, right.code]);
+    const simData = useMemo(() => {
+        if (!simEnabled || !pair) return null;
+        return {
+            left: wrapPlainLines(left.code, regionLines(left.code, pair.regions.map((r) => r.a))),
+            right: wrapPlainLines(right.code, regionLines(right.code, pair.regions.map((r) => r.b))),
+        };
+    }, [simEnabled, pair, left.code, right.code]);
 
     const leftLines: Seg[][] = simData ? simData.left : wrapPlainLines(left.code);
     const rightLines: Seg[][] = simData ? simData.right : wrapPlainLines(right.code);
@@ -230,6 +269,27 @@ export default function AdminPlagiarism() {
 
             {loading && <div className="no-data-message">Loading code…</div>}
             {error && <div className="no-data-message">{error}</div>}
+            {simEnabled && !pair && !pairError && !loading && <div className="no-data-message">Finding matched regions…</div>}
+            {simEnabled && pairError && <div className="no-data-message">{pairError}</div>}
+
+            {simEnabled && pair && !loading && !error && (
+                <div className="region-list">
+                    {pair.regions.length === 0 ? (
+                        <div className="no-data-message">No matched regions.</div>
+                    ) : (
+                        <ol>
+                            {pair.regions.map((r, i) => (
+                                <li key={i}>
+                                    {left.label}: {r.a.file} lines {r.a.start_line}–{r.a.end_line}
+                                    {" ↔ "}
+                                    {right.label}: {r.b.file} lines {r.b.start_line}–{r.b.end_line}
+                                    {` (${r.tokens} tokens)`}
+                                </li>
+                            ))}
+                        </ol>
+                    )}
+                </div>
+            )}
 
             {!loading && !error && (
                 <div className={`panels ${stacked ? "stacked" : "side"}`}>
@@ -9,6 +9,9 @@ import '../../styling/AdminStudentRoster.scss'
 
 import { FaClone, FaFileExport, FaDownload, FaEye, FaHandPaper } from 'react-icons/fa'
 
+// Time budget for the plagiarism "Quick Check" (server returns best-so-far pairs)
+const QUICK_CHECK_SECONDS = 60
+
 const AdminStudentRoster = () => {
     const { class_id, id } = useParams<{ class_id: string; id: string }>()
     const { search } = useLocation()
@@ -118,13 +121,21 @@ interface StudentListState {
         b: { user_id: number; name: string; class_id: string; submission_id: number }
         similarity_token: number
         similarity_ast: number
-        overlap_snippet_a?: string
-        overlap_snippet_b?: string
     }>
     // Marks Code//
     plagiarismPage: number
     plagiarismPageSize: number
     // End of Change //
+    plagiarismStatus: string
+    plagiarismGroups: Array<{
+        members: Array<{ user_id: number; name: string; class_id: string; submission_id: number }>
+        pairs: number
+        max_score: number
+        mean_score: number
+    }>
+    plagiarismStreaming: boolean
+    // Set when a time-budgeted run stopped before scoring every candidate pair
+    plagiarismPartial: { scored: number; candidates: number } | null
 }
 
 class StudentListInternal extends Component<StudentListProps, StudentListState> {
@@ -159,6 +170,10 @@ class StudentListInternal extends Component<StudentListProps, StudentListState>
             plagiarismPage: 1,
             /* End Of Change */
             plagiarismPageSize: 10,
+            plagiarismStatus: '',
+            plagiarismGroups: [],
+            plagiarismStreaming: false,
+            plagiarismPartial: null,
         }
 
         this.handleClick = this.handleClick.bind(this)
@@ -174,6 +189,9 @@ class StudentListInternal extends Component<StudentListProps, StudentListState>
         this.downloadProjectGrades = this.downloadProjectGrades.bind(this)
     }
 
+    private plagiarismPollTimer: number | null = null
+    private plagiarismStreamAbort: AbortController | null = null
+
     private formatDate12h(value: string): string {
         if (!value || value === 'N/A') return 'N/A'
         const d = new Date(value)
@@ -363,35 +381,113 @@ class StudentListInternal extends Component<StudentListProps, StudentListState>
             })
     }
 
-    // Run plagiarism detector
-    handleClick = () => {
-        this.setState({ isLoading: true })
+    // Run plagiarism detector (server runs it as a background job; poll until done).
+    // With a time budget (seconds) the server returns best-so-far pairs; running again refines them.
+    handleClick = (timeBudget?: number) => {
+        this.setState({ isLoading: true, plagiarismStatus: 'Starting...' })
         axios
             .post(
                 import.meta.env.VITE_API_URL + `/projects/run-plagiarism`,
-                { project_id: this.props.project_id },
+                { project_id: this.props.project_id, summary: true, time_budget: timeBudget },
                 {
                     headers: {
                         Authorization: `Bearer ${localStorage.getItem('AUTOTA_AUTH_TOKEN')}`,
                     },
                 }
             )
-            .then((res) => {
-                const data = res.data || {}
-                const pairs = Array.isArray(data.pairs) ? data.pairs : []
-                this.setState({
-                    plagiarismResults: pairs,
-                    plagiarismModalIsOpen: true,
-                    /* Marks Code */
-                    plagiarismPage: 1,
-                    /* End Of Code */
-                    isLoading: false,
-                })
-            })
-            .catch((_exc) => {
-                window.alert('Error running plagiarism detector. Please try again.')
-                this.setState({ isLoading: false })
+            .then((res) => this.handlePlagiarismJob(res.data || {}))
+            .catch((_exc) => this.plagiarismFailed())
+    }
+
+    private handlePlagiarismJob(data: any) {
+        if (data.status === 'done') {
+            this.setState({
+                plagiarismResults: [],
+                plagiarismGroups: Array.isArray(data.groups) ? data.groups : [],
+                plagiarismPartial:
+                    data.complete === false ? { scored: Number(data.scored) || 0, candidates: Number(data.candidates) || 0 } : null,
+                plagiarismModalIsOpen: true,
+                /* Marks Code */
+                plagiarismPage: 1,
+                /* End Of Code */
+                isLoading: false,
+                plagiarismStatus: '',
             })
+            this.streamPlagiarismPairs(data.job_id)
+            return
+        }
+        if (data.status === 'failed' || !data.job_id) {
+            this.plagiarismFailed()
+            return
+        }
+
+        const pct = Math.round((Number(data.progress) || 0) * 100)
+        this.setState({ plagiarismStatus: `${data.stage || data.status}... ${pct}%` })
+        this.plagiarismPollTimer = window.setTimeout(() => {
+            axios
+                .get(import.meta.env.VITE_API_URL + `/projects/plagiarism-job`, {
+                    params: { job_id: data.job_id, summary: true },
+                    headers: {
+                        Authorization: `Bearer ${localStorage.getItem('AUTOTA_AUTH_TOKEN')}`,
+                    },
+                })
+                .then((res) => this.handlePlagiarismJob(res.data || {}))
+                .catch((_exc) => this.plagiarismFailed())
+        }, 2000)
+    }
+
+    // Pairs arrive as NDJSON, strongest first; show each chunk as soon as it is read
+    private async streamPlagiarismPairs(jobId: string) {
+        this.plagiarismStreamAbort?.abort()
+        const abort = new AbortController()
+        this.plagiarismStreamAbort = abort
+        this.setState({ plagiarismStreaming: true })
+        try {
+            const res = await fetch(
+                import.meta.env.VITE_API_URL + `/projects/plagiarism-report-stream?job_id=${encodeURIComponent(jobId)}`,
+                {
+                    headers: { Authorization: `Bearer ${localStorage.getItem('AUTOTA_AUTH_TOKEN')}` },
+                    signal: abort.signal,
+                }
+            )
+            if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`)
+
+            const reader = res.body.getReader()
+            const decoder = new TextDecoder()
+            let buffered = ''
+            for (;;) {
+                const { done, value } = await reader.read()
+                buffered += decoder.decode(value, { stream: !done })
+                const lines = buffered.split('\n')
+                buffered = done ? '' : lines.pop() ?? ''
+
+                const batch = lines
+                    .filter((line) => line.trim() !== '')
+                    .map((line) => JSON.parse(line))
+                    .filter((row) => row.type === 'pair')
+                if (batch.length > 0) {
+                    this.setState((prev) => ({ plagiarismResults: [...prev.plagiarismResults, ...batch] }))
+                }
+                if (done) break
+            }
+            this.setState({ plagiarismStreaming: false })
+        } catch (_exc) {
+            if (abort.signal.aborted) return
+            this.setState({ plagiarismStreaming: false })
+            this.plagiarismFailed()
+        }
+    }
+
+    private plagiarismFailed() {
+        window.alert('Error running plagiarism detector. Please try again.')
+        this.setState({ isLoading: false, plagiarismStatus: '' })
+    }
+
+    componentWillUnmount() {
+        if (this.plagiarismPollTimer !== null) {
+            window.clearTimeout(this.plagiarismPollTimer)
+        }
+        this.plagiarismStreamAbort?.abort()
     }
 
     handleLectureChange(ev: React.ChangeEvent<HTMLSelectElement>) {
@@ -604,22 +700,12 @@ class StudentListInternal extends Component<StudentListProps, StudentListState>
 
         // --- Thresholds (easy to tune) ---
         const SIM_THRESHOLD = 0.75
-        const MIN_OVERLAP_CHARS = 150
 
         const raw = this.state.plagiarismResults ?? []
 
         const score = (r: any) => ((r.similarity_token ?? 0) + (r.similarity_ast ?? 0)) / 2
 
-        const filteredPlagiarismResults = raw.filter((p) => {
-            const overlapA = (p.overlap_snippet_a ?? '').trim()
-            const overlapB = (p.overlap_snippet_b ?? '').trim()
-            const overlapChars = overlapA.length + overlapB.length
-
-            const hasOverlapSnippets = overlapChars > 0
-            const overlapOk = !hasOverlapSnippets || overlapChars >= MIN_OVERLAP_CHARS
-
-            return score(p) >= SIM_THRESHOLD && overlapOk
-        })
+        const filteredPlagiarismResults = raw.filter((p) => score(p) >= SIM_THRESHOLD)
 
         const sortedPlagiarismResults = [...filteredPlagiarismResults].sort((x, y) => {
             const xScore = score(x)
@@ -643,6 +729,9 @@ class StudentListInternal extends Component<StudentListProps, StudentListState>
             const clamped = Math.max(1, Math.min(p, totalPages))
             this.setState({ plagiarismPage: clamped })
         }
+
+        // Two-student groups are just a single pair; list rings of three or more
+        const collusionRings = this.state.plagiarismGroups.filter((g) => g.members.length >= 3)
         // End of Changes
 
         function parseOutputs(raw: string): { expected: string; actual: string; hadDiff: boolean } {
@@ -901,13 +990,24 @@ class StudentListInternal extends Component<StudentListProps, StudentListState>
                                             <button
                                                 type="button"
                                                 className="btn plagiarism-btn"
-                                                onClick={this.handleClick}
+                                                onClick={() => this.handleClick()}
                                                 disabled={this.state.isLoading}
                                                 aria-label="Run Plagiarism Detector"
                                                 title="Run Plagiarism Detector"
                                             >
                                                 <FaClone aria-hidden="true" />
-                                                Run Plagiarism Detector
+                                                {this.state.plagiarismStatus || 'Run Plagiarism Detector'}
+                                            </button>
+
+                                            <button
+                                                type="button"
+                                                className="btn plagiarism-btn"
+                                                onClick={() => this.handleClick(QUICK_CHECK_SECONDS)}
+                                                disabled={this.state.isLoading}
+                                                aria-label="Quick Plagiarism Check"
+                                                title={`Best results found within ${QUICK_CHECK_SECONDS} seconds`}
+                                            >
+                                                Quick Check
                                             </button>
 
                                             <button
@@ -1092,13 +1192,40 @@ class StudentListInternal extends Component<StudentListProps, StudentListState>
                                         <div className="modal-header">
                                             {/* Marks Code */}
                                             <div className="modal-title" id="plagiarism-modal-title">
-                                                Potentially Similar Submissions ({totalResults} pairs)
+                                                Potentially Similar Submissions ({totalResults} pairs
+                                                {this.state.plagiarismStreaming ? ', loading more...' : ''})
                                             </div>
                                             {/* End of Marks Code */}
                                         </div>
 
                                         <div className="tab-content">
                                             <section className="tests-section">
+                                                {this.state.plagiarismPartial && (
+                                                    <div className="plagiarism-partial">
+                                                        Partial results: {this.state.plagiarismPartial.scored} of{' '}
+                                                        {this.state.plagiarismPartial.candidates} candidate pairs checked (most similar first).{' '}
+                                                        <button
+                                                            type="button"
+                                                            className="page-btn"
+                                                            onClick={() => this.setState({ plagiarismModalIsOpen: false }, () => this.handleClick())}
+                                                        >
+                                                            Finish check
+                                                        </button>
+                                                    </div>
+                                                )}
+                                                {collusionRings.length > 0 && (
+                                                    <div className="plagiarism-groups">
+                                                        <strong>Groups sharing code ({collusionRings.length}):</strong>
+                                                        <ul>
+                                                            {collusionRings.map((g, i) => (
+                                                                <li key={`group-${i}`}>
+                                                                    {g.members.map((m) => m.name).join(', ')} ({g.members.length} students,{' '}
+                                                                    {g.pairs} pairs, max {(Math.round(g.max_score * 1000) / 10).toFixed(1)}%)
+                                                                </li>
+                                                            ))}
+                                                        </ul>
+                                                    </div>
+                                                )}
                                                 <div className="similar-modal-scroll">
                                                     <table className="results-table">
 
@@ -1112,7 +1239,7 @@ class StudentListInternal extends Component<StudentListProps, StudentListState>
                                                             </tr>
                                                         </thead>
                                                         <tbody>
-                                                            {this.state.plagiarismResults.length === 0 && (
+                                                            {this.state.plagiarismResults.length === 0 && !this.state.plagiarismStreaming && (
                                                                 <tr>
                                                                     <td className="no-data-message" colSpan={5}>
                                                                         No similar pairs found (above threshold).
@@ -38,9 +38,12 @@ export function StudentOutputDiff() {
         const token = localStorage.getItem('AUTOTA_AUTH_TOKEN')
         if (!token || submissionId <= 0) return
 
+        // ?id= returns only the project with this id or the project of this submission,
+        // so the names resolve from one small response instead of every page.
         axios
             .get(import.meta.env.VITE_API_URL + `/projects/past-submissions`, {
                 headers: { Authorization: `Bearer ${token}` },
+                params: { id: submissionId },
             })
             .then((res) => {
                 const data: ApiPastSubmissionsProject[] =
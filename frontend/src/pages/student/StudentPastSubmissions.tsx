@@ -40,12 +40,15 @@ type PastRow = {
 
 interface ProjectsState {
     rows: Array<PastRow>
+    projects: Array<ApiPastSubmissionsProject>
+    nextCursor: string | null
+    loadingMore: boolean
 }
 
 class StudentPastSubmissions extends Component<{}, ProjectsState> {
     constructor(props: {}) {
         super(props)
-        this.state = { rows: [] }
+        this.state = { rows: [], projects: [], nextCursor: null, loadingMore: false }
     }
 
     private formatDate12h(value: string): string {
@@ -71,73 +74,94 @@ class StudentPastSubmissions extends Component<{}, ProjectsState> {
     }
 
     componentDidMount() {
+        this.fetchPage(null)
+    }
+
+    // Projects come in keyset pages: load the first one, then one more per "Load more"
+    // click, sending back the X-Next-Cursor of the last page (absent once all are loaded).
+    private fetchPage(cursor: string | null) {
+        this.setState({ loadingMore: true })
         axios
             .get(import.meta.env.VITE_API_URL + `/projects/past-submissions`, {
                 headers: { Authorization: `Bearer ${localStorage.getItem('AUTOTA_AUTH_TOKEN')}` },
+                params: cursor ? { cursor } : {},
             })
             .then((res) => {
-                const data: ApiPastSubmissionsProject[] =
+                const page: ApiPastSubmissionsProject[] =
                     typeof res.data === 'string' ? JSON.parse(res.data) : (res.data ?? [])
+                const projects = this.state.projects.concat(page || [])
 
-                // Sort projects by start date ascending, like AdminProjectList
-                const projectsSorted = [...(data || [])].sort((a, b) => {
-                    const da = Date.parse(a.start)
-                    const db = Date.parse(b.start)
-                    const aBad = Number.isNaN(da)
-                    const bBad = Number.isNaN(db)
-                    if (aBad && bBad) return 0
-                    if (aBad) return 1
-                    if (bBad) return -1
-                    return da - db
+                this.setState({
+                    projects,
+                    rows: this.buildRows(projects),
+                    nextCursor: res.headers['x-next-cursor'] || null,
+                    loadingMore: false,
                 })
+            })
+            .catch((err) => {
+                console.log(err)
+                this.setState({ loadingMore: false })
+            })
+    }
+
+    private buildRows(data: ApiPastSubmissionsProject[]): PastRow[] {
+        // Sort projects by start date ascending, like AdminProjectList
+        const projectsSorted = [...(data || [])].sort((a, b) => {
+            const da = Date.parse(a.start)
+            const db = Date.parse(b.start)
+            const aBad = Number.isNaN(da)
+            const bBad = Number.isNaN(db)
+            if (aBad && bBad) return 0
+            if (aBad) return 1
+            if (bBad) return -1
+            return da - db
+        })
+
+        const rows: PastRow[] = []
 
-                const rows: PastRow[] = []
-
-                projectsSorted.forEach((p) => {
-                    const active = this.isProjectActive(p.start, p.end)
-
-                    // Main row (if any)
-                    if (p.main) {
-                        rows.push({
-                            key: `proj-${p.projectId}`,
-                            projectId: p.projectId,
-                            projectName: p.projectName,
-                            classId: p.classId,
-                            className: p.className,
-                            submissionDate: p.main.time,
-                            passed: !!p.main.passed,
-                            isPractice: false,
-                            isActiveRow: active,
-                        })
-                    }
-
-                    // Practice rows under the project (grey + arrow)
-                    const practices = Array.isArray(p.practices) ? [...p.practices] : []
-                    practices.sort((x, y) => (x.number ?? 0) - (y.number ?? 0))
-
-                    // If there is no main row but the project is active, highlight the first practice row
-                    const highlightFirstPractice = active && !p.main && practices.length > 0
-
-                    practices.forEach((pp, idx) => {
-                        rows.push({
-                            key: `pp-${p.projectId}-${pp.practiceProblemId}`,
-                            projectId: p.projectId,
-                            projectName: p.projectName,
-                            classId: p.classId,
-                            className: p.className,
-                            submissionDate: pp.time,
-                            passed: !!pp.passed,
-                            isPractice: true,
-                            practiceProblemId: pp.practiceProblemId,
-                            practiceName: pp.name,
-                            isActiveRow: highlightFirstPractice && idx === 0,
-                        })
-                    })
+        projectsSorted.forEach((p) => {
+            const active = this.isProjectActive(p.start, p.end)
+
+            // Main row (if any)
+            if (p.main) {
+                rows.push({
+                    key: `proj-${p.projectId}`,
+                    projectId: p.projectId,
+                    projectName: p.projectName,
+                    classId: p.classId,
+                    className: p.className,
+                    submissionDate: p.main.time,
+                    passed: !!p.main.passed,
+                    isPractice: false,
+                    isActiveRow: active,
                 })
+            }
+
+            // Practice rows under the project (grey + arrow)
+            const practices = Array.isArray(p.practices) ? [...p.practices] : []
+            practices.sort((x, y) => (x.number ?? 0) - (y.number ?? 0))
+
+            // If there is no main row but the project is active, highlight the first practice row
+            const highlightFirstPractice = active && !p.main && practices.length > 0
 
-                this.setState({ rows })
+            practices.forEach((pp, idx) => {
+                rows.push({
+                    key: `pp-${p.projectId}-${pp.practiceProblemId}`,
+                    projectId: p.projectId,
+                    projectName: p.projectName,
+                    classId: p.classId,
+                    className: p.className,
+                    submissionDate: pp.time,
+                    passed: !!pp.passed,
+                    isPractice: true,
+                    practiceProblemId: pp.practiceProblemId,
+                    practiceName: pp.name,
+                    isActiveRow: highlightFirstPractice && idx === 0,
+                })
             })
-            .catch((err) => console.log(err))
+        })
+
+        return rows
     }
 
     render() {
@@ -238,6 +262,19 @@ class StudentPastSubmissions extends Component<{}, ProjectsState> {
                                 </tbody>
                             </table>
                         </div>
+
+                        {this.state.nextCursor && (
+                            <div className="load-more">
+                                <button
+                                    type="button"
+                                    className="load-more-button"
+                                    disabled={this.state.loadingMore}
+                                    onClick={() => this.fetchPage(this.state.nextCursor)}
+                                >
+                                    {this.state.loadingMore ? 'Loading…' : 'Load more'}
+                                </button>
+                            </div>
+                        )}
                     </div>
                 </div>
             </div>
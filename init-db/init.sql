@@ -180,7 +180,9 @@ CREATE TABLE `OHVisits` (
   `ProjectId` int DEFAULT NULL,
   `TimeAccepted` datetime DEFAULT NULL,
   `TimeCompleted` datetime DEFAULT NULL,
-  PRIMARY KEY (`Sqid`)
+  PRIMARY KEY (`Sqid`),
+  KEY `oh_project_dismissed_idx` (`ProjectId`,`dismissed`),
+  KEY `oh_student_project_idx` (`StudentId`,`ProjectId`)
 ) ENGINE=InnoDB AUTO_INCREMENT=25 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -217,7 +219,8 @@ CREATE TABLE `SubmissionChargeRedeptions` (
   `RedeemedTime` datetime DEFAULT NULL,
   `SubmissionId` int DEFAULT NULL,
   `Recouped` varchar(45) DEFAULT NULL,
-  PRIMARY KEY (`Id`)
+  PRIMARY KEY (`Id`),
+  KEY `redeem_user_class_project_idx` (`UserId`,`ClassId`,`ProjectId`,`Type`)
 ) ENGINE=InnoDB AUTO_INCREMENT=191 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -234,7 +237,8 @@ CREATE TABLE `SubmissionCharges` (
   `ClassId` int DEFAULT NULL,
   `BaseCharge` int DEFAULT NULL,
   `RewardCharge` int DEFAULT NULL,
-  PRIMARY KEY (`Id`)
+  PRIMARY KEY (`Id`),
+  KEY `charges_user_class_idx` (`UserId`,`ClassId`)
 ) ENGINE=InnoDB AUTO_INCREMENT=17 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -260,6 +264,7 @@ CREATE TABLE `Submissions` (
   UNIQUE KEY `idSubmissions_UNIQUE` (`Id`),
   KEY `iduser_idx` (`User`),
   KEY `projectmap_idx` (`Project`),
+  KEY `sub_project_practice_user_time_idx` (`Project`,`IsPractice`,`User`,`Time`),
   CONSTRAINT `iduser` FOREIGN KEY (`User`) REFERENCES `Users` (`Id`),
   CONSTRAINT `proect` FOREIGN KEY (`Project`) REFERENCES `Projects` (`Id`)
   ,CONSTRAINT `sub_pp_fk` FOREIGN KEY (`PracticeProblemId`) REFERENCES `PracticeProblems` (`Id`) ON DELETE SET NULL
@@ -287,6 +292,7 @@ CREATE TABLE `Testcases` (
   UNIQUE KEY `Id_UNIQUE` (`Id`),
   KEY `tc_fk_idx` (`ProjectId`),
   KEY `tc_pp_fk_idx` (`PracticeProblemId`),
+  KEY `tc_project_practice_idx` (`ProjectId`,`PracticeProblemId`),
   CONSTRAINT `tc_fk` FOREIGN KEY (`ProjectId`) REFERENCES `Projects` (`Id`)
   ,CONSTRAINT `tc_pp_fk` FOREIGN KEY (`PracticeProblemId`) REFERENCES `PracticeProblems` (`Id`) ON DELETE CASCADE
 ) ENGINE=InnoDB AUTO_INCREMENT=192 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;